@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Blog Builder Benchmark
+Generates synthetic post corpora and times each build stage on them, cold
+and warm, reporting throughput and peak memory against a stored baseline.
+Each corpus size runs in its own process so caches and peak RSS start fresh.
+The dev server's re-render after a single-post edit is held to a latency
+budget, since it grows with the blog rather than with the edit.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import build_blog
+import dev_server
+
+DEFAULT_SIZES = [100, 1000, 10000, 50000]
+# Tracked next to this script, unlike the build cache, so it can be committed
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark-baseline.json')
+# Stages faster than this in the baseline are too noisy to compare
+MIN_COMPARED_SECONDS = 0.01
+STAGES = ['load', 'generate_blog_post', 'generate_blog_index', 'generate_sitemap', 'generate_rss_feed',
+          'dev_server']
+# Single-post edits timed in the dev server, and the slowest one allowed
+DEV_SERVER_EDITS = 3
+DEV_SERVER_EDIT_BUDGET_MS = 200
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor '
+         'incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud '
+         'exercitation ullamco laboris nisi aliquip ex ea commodo consequat').split()
+
+def make_paragraph(rng, words):
+    """Return a Markdown paragraph of about `words` words with some inline markup"""
+    parts = []
+    for i in range(words):
+        word = rng.choice(WORDS)
+        if i % 23 == 5:
+            word = f'**{word}**'
+        elif i % 37 == 11:
+            word = f'[{word}](https://example.com/{word}/{i})'
+        parts.append(word)
+    return ' '.join(parts).capitalize() + '.'
+
+def make_code_block(rng, number):
+    """Return a fenced Python code block that differs between posts"""
+    lines = [f'def step_{number}(items):']
+    for i in range(rng.randint(4, 12)):
+        lines.append(f'    items.append({rng.randint(0, 10 ** 6)})  # {rng.choice(WORDS)}')
+    lines.append('    return items')
+    return '```python\n' + '\n'.join(lines) + '\n```'
+
+def make_post_source(rng, index, words=600, code_blocks=2, tag_count=50, tags_per_post=3,
+                     start_date=datetime(2020, 1, 1)):
+    """Return the Markdown source, frontmatter included, of one synthetic post"""
+    tags = ', '.join(f'"tag-{rng.randrange(tag_count)}"' for _ in range(tags_per_post))
+    date = (start_date + timedelta(hours=index)).isoformat()
+    sections = [f'# Synthetic Post {index}']
+    paragraphs = max(1, words // 60)
+    for i in range(paragraphs):
+        if i and i % 3 == 0:
+            sections.append(f'## Section {i // 3}')
+        sections.append(make_paragraph(rng, words // paragraphs))
+        # Spread the code blocks evenly between the paragraphs
+        for block in range(code_blocks * i // paragraphs, code_blocks * (i + 1) // paragraphs):
+            sections.append(make_code_block(rng, block))
+    sections.append('- ' + '\n- '.join(rng.sample(WORDS, 4)))
+    return (f'---\ntitle: "Synthetic Post {index}"\ndate: "{date}"\ntags: [{tags}]\n---\n\n'
+            + '\n\n'.join(sections) + '\n')
+
+def generate_corpus(posts_dir, count, words=600, code_blocks=2, tag_count=50, tags_per_post=3, seed=1):
+    """Write `count` synthetic posts to posts_dir; the same seed gives the same corpus"""
+    rng = random.Random(seed)
+    os.makedirs(posts_dir, exist_ok=True)
+    for i in range(count):
+        source = make_post_source(rng, i, words, code_blocks, tag_count, tags_per_post)
+        with open(os.path.join(posts_dir, f'synthetic-post-{i:05d}.md'), 'w', encoding='utf-8') as f:
+            f.write(source)
+
+def edit_post(path, rng):
+    """Append a paragraph to a post, as an author editing it would"""
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('\n' + make_paragraph(rng, 40) + '\n')
+
+def timed(func, *args, **kwargs):
+    """Return (seconds, result) of one call"""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+def run_stages(work_dir, jobs=1):
+    """Time every stage twice on the corpus in work_dir/posts; return {stage: {cold, warm}}
+
+    Cold runs start with empty caches and no build manifest. Warm runs repeat
+    the stage straight after, with the manifest, render cache and
+    templates the cold run left behind.
+    """
+    posts_dir = os.path.join(work_dir, 'posts')
+    output_dir = os.path.join(work_dir, 'output')
+    os.makedirs(output_dir, exist_ok=True)
+    build_blog.configure_render_cache(work_dir)
+    build_blog.load_template_text.cache_clear()
+    build_blog.load_template.cache_clear()
+    timings = {stage: {} for stage in STAGES}
+
+    timings['load']['cold'], posts = timed(build_blog.load_blog_posts, posts_dir, jobs=jobs)
+    manifest = build_blog.new_build_manifest()
+    for post in posts:
+        manifest['posts'][post.slug] = {'source_hash': post.source_hash, 'modified': None}
+    timings['load']['warm'], _ = timed(build_blog.load_blog_posts, posts_dir, manifest, jobs=jobs)
+
+    def render_posts():
+        context = build_blog.build_site_context(posts)
+        for post in posts:
+            build_blog.generate_blog_post(output_dir, post, posts, context=context)
+
+    for state in ['cold', 'warm']:
+        timings['generate_blog_post'][state], _ = timed(render_posts)
+        timings['generate_blog_index'][state], _ = timed(build_blog.generate_blog_index, output_dir, posts)
+        timings['generate_sitemap'][state], _ = timed(build_blog.generate_sitemap, posts)
+        timings['generate_rss_feed'][state], _ = timed(build_blog.generate_rss_feed, posts)
+    timings['dev_server'] = run_dev_server(posts_dir)
+    return timings
+
+def run_dev_server(posts_dir, edits=DEV_SERVER_EDITS):
+    """Time the dev server on the corpus in posts_dir; return {cold, warm}
+
+    Cold is the first in-memory render of the whole site; warm is the
+    slowest of `edits` re-renders, each after one post's body was edited.
+    """
+    site = dev_server.create_memory_site(build_blog.DEFAULT_PAGE_SIZE)
+    paths = sorted(os.path.join(posts_dir, name) for name in os.listdir(posts_dir))
+    cold, _ = timed(dev_server.refresh_memory_site, build_blog, site, changed_posts=paths)
+    rng = random.Random(0)
+    warm = 0.0
+    for i in range(edits):
+        path = paths[(i + 1) * len(paths) // (edits + 1)]
+        edit_post(path, rng)
+        seconds, _ = timed(dev_server.refresh_memory_site, build_blog, site, changed_posts=[path])
+        warm = max(warm, seconds)
+    return {'cold': cold, 'warm': warm}
+
+def run_size(args):
+    """Generate one corpus, time it and write the results to args.result"""
+    with tempfile.TemporaryDirectory(prefix='blog-benchmark-') as work_dir:
+        generate_corpus(os.path.join(work_dir, 'posts'), args.run_size, args.words, args.code_blocks,
+                        args.tags, args.tags_per_post, args.seed)
+        timings = run_stages(work_dir, args.jobs)
+    result = {'posts': args.run_size, 'stages': timings, 'peak_rss_kb': build_blog.peak_rss_kb()}
+    with open(args.result, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+def benchmark_size(size, args):
+    """Run one corpus size in a fresh process and return its results"""
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        result_path = f.name
+    try:
+        command = [sys.executable, os.path.abspath(__file__), '--run-size', str(size), '--result', result_path,
+                   '--words', str(args.words), '--code-blocks', str(args.code_blocks), '--tags', str(args.tags),
+                   '--tags-per-post', str(args.tags_per_post), '--seed', str(args.seed), '--jobs', str(args.jobs)]
+        # The builder prints a line per generated page; keep only errors
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        with open(result_path, encoding='utf-8') as f:
+            return json.load(f)
+    finally:
+        os.remove(result_path)
+
+def corpus_settings(args):
+    """Return the options that must match for two benchmark runs to be comparable"""
+    return {'words': args.words, 'code_blocks': args.code_blocks, 'tags': args.tags,
+            'tags_per_post': args.tags_per_post, 'seed': args.seed, 'jobs': args.jobs}
+
+def load_baseline(path, settings):
+    """Return {size: result} from a saved baseline, or {} if missing or not comparable"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if baseline.get('settings') != settings:
+        print(f"Ignoring baseline {path}: it was recorded with different corpus settings")
+        return {}
+    return {int(size): result for size, result in baseline['results'].items()}
+
+def print_results(result, baseline=None):
+    """Print one corpus size's timings; return the worst slowdown against baseline"""
+    size = result['posts']
+    peak = result['peak_rss_kb']
+    print(f"{size} posts (peak RSS {peak / 1024:.1f} MiB)" if peak is not None else f"{size} posts")
+    print(f"  {'stage':<20} {'cold s':>9} {'warm s':>9} {'cold posts/s':>13} {'warm posts/s':>13}  vs baseline")
+    worst = 1.0
+    for stage in STAGES:
+        times = result['stages'][stage]
+        line = (f"  {stage:<20} {times['cold']:>9.3f} {times['warm']:>9.3f} "
+                f"{size / max(times['cold'], 1e-9):>13.0f} {size / max(times['warm'], 1e-9):>13.0f}")
+        if baseline:
+            compared = []
+            for state in ['cold', 'warm']:
+                # Baselines saved before a stage was added have no time for it
+                before = baseline['stages'].get(stage, {}).get(state, 0)
+                if before < MIN_COMPARED_SECONDS:
+                    compared.append('-')
+                    continue
+                ratio = times[state] / before
+                worst = max(worst, ratio)
+                compared.append(f'x{ratio:.2f}')
+            line += '  ' + ' / '.join(compared)
+        print(line)
+    print(f"  dev server edit: {result['stages']['dev_server']['warm'] * 1000:.0f} ms")
+    return worst
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Benchmark the blog builder on synthetic posts.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='post counts to benchmark (default: %(default)s)')
+    parser.add_argument('--words', type=int, default=600,
+                        help='approximate words per post (default: %(default)s)')
+    parser.add_argument('--code-blocks', type=int, default=2,
+                        help='fenced code blocks per post (default: %(default)s)')
+    parser.add_argument('--tags', type=int, default=50,
+                        help='number of distinct tags in the corpus (default: %(default)s)')
+    parser.add_argument('--tags-per-post', type=int, default=3,
+                        help='tags on each post (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1,
+                        help='random seed for the corpus (default: %(default)s)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='worker processes for loading posts (default: %(default)s)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='baseline results to compare against (default: %(default)s)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store this run as the new baseline')
+    parser.add_argument('--max-regression', type=float, default=None,
+                        help='exit with status 1 if any stage is more than this many times '
+                             'slower than the baseline')
+    parser.add_argument('--max-edit-ms', type=float, default=DEV_SERVER_EDIT_BUDGET_MS,
+                        help='exit with status 1 if a single-post edit takes the dev server longer '
+                             'than this (default: %(default)s)')
+    parser.add_argument('--generate', metavar='DIR',
+                        help='only write a corpus of the first --sizes value to DIR and exit')
+    # Used by benchmark_size() to run one size in a child process
+    parser.add_argument('--run-size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.run_size is not None:
+        run_size(args)
+        return
+    if args.generate:
+        generate_corpus(args.generate, args.sizes[0], args.words, args.code_blocks,
+                        args.tags, args.tags_per_post, args.seed)
+        print(f"Wrote {args.sizes[0]} synthetic posts to {args.generate}")
+        return
+
+    settings = corpus_settings(args)
+    baseline = load_baseline(args.baseline, settings)
+    results = {}
+    worst = 1.0
+    slowest_edit = 0.0
+    for size in args.sizes:
+        results[size] = benchmark_size(size, args)
+        worst = max(worst, print_results(results[size], baseline.get(size)))
+        slowest_edit = max(slowest_edit, results[size]['stages']['dev_server']['warm'] * 1000)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'settings': settings, 'results': results}, f, indent=1)
+        print(f"Saved baseline to {args.baseline}")
+    if args.max_regression is not None and worst > args.max_regression:
+        print(f"Slowest stage is x{worst:.2f} the baseline (limit x{args.max_regression})")
+        sys.exit(1)
+    if slowest_edit > args.max_edit_ms:
+        print(f"Slowest dev server edit took {slowest_edit:.0f} ms (limit {args.max_edit_ms:.0f} ms)")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
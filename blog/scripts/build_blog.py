@@ -6,387 +6,908 @@ Converts Markdown files to HTML with the same theme as the main portfolio site
 
 import os
 import re
+import sys
+import io
+import gzip
 import json
+import html
+import email.utils
+import itertools
+import argparse
+import functools
+import contextlib
+import hashlib
+import heapq
+import math
+import time
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from pathlib import Path
+from urllib.parse import unquote, urlsplit
+from xml.sax.saxutils import XMLGenerator
 import markdown
-from bs4 import BeautifulSoup
+from markdown.extensions import codehilite, fenced_code
+
+import critical_css
+import frontmatter
+import images
+import minify
+
+try:
+    import pygments
+    PYGMENTS_VERSION = pygments.__version__
+except ImportError:
+    PYGMENTS_VERSION = ''
+
+try:
+    import brotli
+except ImportError:
+    # Optional: without it only gzip variants are precompressed
+    brotli = None
+
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:
+    # Optional: without them related posts are scored in pure Python
+    numpy = sparse = None
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; profiles then omit peak memory
+    resource = None
+
+# Bump whenever a change to this script alters generated output, so that
+# pages recorded in an older build manifest are re-rendered.
+BUILDER_VERSION = '9'
+
+def hash_text(*parts):
+    """Return a stable sha256 hex digest for the given string parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+# Output files written and left untouched by write_output() in this build
+_OUTPUT_STATS = {'written': 0, 'unchanged': 0}
+
+def reset_output_stats():
+    """Start counting written and unchanged output files from zero"""
+    _OUTPUT_STATS['written'] = 0
+    _OUTPUT_STATS['unchanged'] = 0
+
+def write_output(path, content):
+    """Write a generated file, leaving it untouched if its content is unchanged
+    
+    Unchanged files keep their mtime, so caches and git see no difference.
+    Changed files are written to a temporary file and renamed into place,
+    so readers never see a partial page. Returns True if the file was written.
+    """
+    data = content.encode('utf-8') if isinstance(content, str) else content
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    _OUTPUT_STATS['unchanged'] += 1
+                    return False
+    except OSError:
+        pass
+    
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _OUTPUT_STATS['written'] += 1
+    return True
+
+def remove_output(path):
+    """Remove a generated file together with its precompressed variants"""
+    for file_path in [path] + [path + extension for extension in PRECOMPRESSED_EXTENSIONS]:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+def imap_in_pool(func, items, jobs=1, initializer=None, initargs=()):
+    """Map func over items across a process pool, yielding results in input order
+    
+    Runs serially in this process when jobs <= 1, when there is at most one
+    item, or when the platform cannot start worker processes; if the pool
+    breaks part way, the remaining items are run serially. func and the
+    initializer must be module-level functions so they can be pickled.
+    """
+    items = list(items)
+    done = 0
+    if jobs > 1 and len(items) > 1:
+        workers = min(jobs, len(items))
+        chunksize = max(1, len(items) // (workers * 4))
+        profiled = _PROFILE is not None
+        executor = results = None
+        # Only failures to start the pool fall back to running serially;
+        # errors raised by func itself propagate
+        try:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                           initargs=(worker_settings(), initializer, initargs))
+            # Workers hand back what they recorded alongside each result
+            results = executor.map(functools.partial(_run_profiled, func) if profiled else func, items,
+                                   chunksize=chunksize)
+        except (OSError, NotImplementedError) as e:
+            if executor is not None:
+                executor.shutdown(wait=False)
+            print(f"Process pool unavailable ({e}), building serially")
+        if results is not None:
+            with executor:
+                try:
+                    for result in results:
+                        if profiled:
+                            result, recorded = result
+                            merge_profile(recorded)
+                        done += 1
+                        yield result
+                    return
+                except BrokenProcessPool as e:
+                    print(f"Process pool broke ({e}), building the remaining items serially")
+    
+    if initializer is not None:
+        initializer(*initargs)
+    for item in items[done:]:
+        yield func(item)
+
+def map_in_pool(func, items, jobs=1, initializer=None, initargs=()):
+    """Like imap_in_pool(), but return the results as a list"""
+    return list(imap_in_pool(func, items, jobs, initializer, initargs))
+
+def worker_settings():
+    """Return the module-level settings that pool workers must inherit"""
+    return {'render_cache_dir': _RENDER_CACHE_DIR, 'profile': _PROFILE is not None, 'assets': _ASSETS,
+            'images': _IMAGES['records']}
+
+def _init_worker(settings, initializer, initargs):
+    """Process pool initializer: apply the parent's settings, then initializer"""
+    configure_render_cache(settings['render_cache_dir'])
+    configure_assets(settings['assets']['urls'], settings['assets']['minify'], settings['assets']['critical'])
+    configure_images(settings['images'])
+    if settings['profile']:
+        enable_profiling()
+    if initializer is not None:
+        initializer(*initargs)
+
+# Stage and per-post timings collected with --profile; None when disabled
+_PROFILE = None
+
+def new_profile():
+    """Return an empty profile"""
+    return {'stages': {}, 'posts': {}}
+
+def enable_profiling():
+    """Start recording stage timings in this process"""
+    global _PROFILE
+    _PROFILE = new_profile()
+
+def peak_rss_kb():
+    """Return this process's peak resident set size in KiB, if known"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+@contextlib.contextmanager
+def profile_stage(stage, slug=None):
+    """Record wall time, CPU time and peak memory of a block under stage
+    
+    With a slug, the wall time is also attributed to that post. Does nothing
+    unless profiling is enabled.
+    """
+    if _PROFILE is None:
+        yield
+        return
+    
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall_started
+        totals = _PROFILE['stages'].setdefault(stage, {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'peak_rss_kb': None})
+        totals['calls'] += 1
+        totals['wall'] += wall
+        totals['cpu'] += time.process_time() - cpu_started
+        peak = peak_rss_kb()
+        if peak is not None:
+            totals['peak_rss_kb'] = max(totals['peak_rss_kb'] or 0, peak)
+        if slug is not None:
+            post_stages = _PROFILE['posts'].setdefault(slug, {})
+            post_stages[stage] = post_stages.get(stage, 0.0) + wall
+
+def merge_profile(recorded):
+    """Add timings recorded in a worker process into this process's profile"""
+    for stage, totals in recorded['stages'].items():
+        merged = _PROFILE['stages'].setdefault(stage, {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'peak_rss_kb': None})
+        merged['calls'] += totals['calls']
+        merged['wall'] += totals['wall']
+        merged['cpu'] += totals['cpu']
+        if totals['peak_rss_kb'] is not None:
+            merged['peak_rss_kb'] = max(merged['peak_rss_kb'] or 0, totals['peak_rss_kb'])
+    for slug, post_stages in recorded['posts'].items():
+        merged = _PROFILE['posts'].setdefault(slug, {})
+        for stage, wall in post_stages.items():
+            merged[stage] = merged.get(stage, 0.0) + wall
+
+def _run_profiled(func, item):
+    """Run one pool task and return its result with the timings it recorded"""
+    global _PROFILE
+    _PROFILE = new_profile()
+    result = func(item)
+    return result, _PROFILE
+
+def slowest_posts(profile, count=10):
+    """Return [(slug, total_wall, stages)] for the posts that took longest"""
+    totals = [(slug, sum(stages.values()), stages) for slug, stages in profile['posts'].items()]
+    totals.sort(key=lambda item: item[1], reverse=True)
+    return totals[:count]
+
+def print_profile_report(profile, total_wall, slowest_count=10):
+    """Print per-stage totals and the slowest posts"""
+    print()
+    print(f"Build profile ({total_wall:.3f}s wall; stage times are summed across workers)")
+    print(f"  {'stage':<18} {'calls':>7} {'wall s':>9} {'cpu s':>9} {'peak MiB':>9}")
+    for stage, totals in sorted(profile['stages'].items(), key=lambda item: item[1]['wall'], reverse=True):
+        peak = f"{totals['peak_rss_kb'] / 1024:.1f}" if totals['peak_rss_kb'] is not None else '-'
+        print(f"  {stage:<18} {totals['calls']:>7} {totals['wall']:>9.3f} {totals['cpu']:>9.3f} {peak:>9}")
+    
+    slowest = slowest_posts(profile, slowest_count)
+    if slowest:
+        print("  Slowest posts:")
+        for slug, wall, stages in slowest:
+            breakdown = ', '.join(f'{stage} {seconds * 1000:.1f}ms' for stage, seconds in
+                                  sorted(stages.items(), key=lambda item: item[1], reverse=True))
+            print(f"    {wall * 1000:8.1f}ms  {slug}  ({breakdown})")
+
+def write_profile_json(path, profile, total_wall, jobs):
+    """Write the profile as JSON, for tracking build performance in CI"""
+    trace = {
+        'builder_version': BUILDER_VERSION,
+        'jobs': jobs,
+        'total_wall': total_wall,
+        'peak_rss_kb': peak_rss_kb(),
+        'stages': profile['stages'],
+        'posts': profile['posts'],
+        'slowest_posts': [{'slug': slug, 'wall': wall} for slug, wall, _ in slowest_posts(profile)]
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(trace, f, indent=1, sort_keys=True)
 
 def extract_frontmatter(content):
-    """Extract frontmatter from markdown content"""
-    if content.startswith('---'):
-        end_pos = content.find('---', 3)
-        if end_pos != -1:
-            frontmatter = content[3:end_pos].strip()
-            content = content[end_pos + 3:].strip()
-            
-            # Parse frontmatter
-            metadata = {}
-            for line in frontmatter.split('\n'):
-                if ':' in line:
-                    key, value = line.split(':', 1)
-                    key = key.strip()
-                    value = value.strip()
-                    
-                    # Handle list values like tags: ["tag1", "tag2"]
-                    if value.startswith('[') and value.endswith(']'):
-                        # Remove brackets and split by comma
-                        list_content = value[1:-1]  # Remove [ and ]
-                        if list_content.strip():  # Check if not empty
-                            # Split by comma and clean up each item
-                            items = [item.strip().strip('"\'') for item in list_content.split(',')]
-                            metadata[key] = items
-                        else:
-                            metadata[key] = []
-                    else:
-                        # Remove quotes if present
-                        value = value.strip('"\'')
-                        
-                        # Handle boolean values
-                        if value.lower() in ('true', 'false'):
-                            value = value.lower() == 'true'
-                        
-                        # Handle date values
-                        if key == 'date':
-                            try:
-                                value = datetime.fromisoformat(value.replace('Z', '+00:00'))
-                            except ValueError:
-                                try:
-                                    value = datetime.strptime(value[:19], '%Y-%m-%dT%H:%M:%S')
-                                except ValueError:
-                                    value = datetime.now()
-                        
-                        metadata[key] = value
-            
-            return metadata, content
-    
-    return {}, content
+    """Split a post into (metadata, Markdown body); see frontmatter.py for the syntax"""
+    metadata, md_content = frontmatter.split_frontmatter(content)
+    if metadata is None:
+        return {}, content
+    return metadata, md_content.strip()
 
-def convert_markdown_to_html(md_content):
-    """Convert markdown content to HTML"""
-    # Configure markdown extensions
-    md = markdown.Markdown(
-        extensions=[
-            'markdown.extensions.extra',
-            'markdown.extensions.codehilite',
-            'markdown.extensions.toc',
-            'markdown.extensions.tables',
-            'markdown.extensions.fenced_code'
-        ],
-        extension_configs={
-            'markdown.extensions.codehilite': {
-                'css_class': 'highlight',
-                'linenums': True
-            }
-        }
-    )
+# Content-addressed cache of rendering results: highlighted code blocks,
+# converted Markdown, excerpts and whole pages, each keyed by hash_text() of
+# every input including the builder version. Shared by pool workers, later
+# builds and, when its directory is restored, CI runs from a clean checkout.
+# Reads touch an entry's mtime so evict_render_cache() drops the least
+# recently used entries first.
+_RENDER_CACHE_DIR = None
+RENDER_CACHE_NAMESPACES = ['highlight', 'markdown', 'excerpt', 'page']
+DEFAULT_CACHE_SIZE_MB = 512
+
+def configure_render_cache(cache_dir):
+    """Set the directory that persists rendering results (None to disable)"""
+    global _RENDER_CACHE_DIR
+    _RENDER_CACHE_DIR = cache_dir
+
+def _render_cache_path(namespace, key):
+    return os.path.join(_RENDER_CACHE_DIR, namespace, key[:2], key)
+
+def read_render_cache(namespace, key):
+    """Return the text cached under key, or None"""
+    if _RENDER_CACHE_DIR is None:
+        return None
+    path = _render_cache_path(namespace, key)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        os.utime(path)
+    except OSError:
+        return None
+    return text
+
+def write_render_cache(namespace, key, text):
+    """Store text under key; failures only cost a cache miss later"""
+    if _RENDER_CACHE_DIR is None:
+        return
+    path = _render_cache_path(namespace, key)
+    # Workers may race on the same entry; each writes its own temp file
+    # and the rename makes whichever finishes last win with identical bytes
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+def evict_render_cache(max_bytes):
+    """Delete the least recently used cache entries until the rest fit in max_bytes
     
-    return md.convert(md_content)
+    Returns (entries removed, entries kept, bytes kept).
+    """
+    entries = []
+    for namespace in RENDER_CACHE_NAMESPACES:
+        namespace_dir = os.path.join(_RENDER_CACHE_DIR, namespace)
+        try:
+            buckets = [entry.path for entry in os.scandir(namespace_dir) if entry.is_dir()]
+        except OSError:
+            continue
+        for bucket in buckets:
+            with os.scandir(bucket) as scanned:
+                for entry in scanned:
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    if total > max_bytes:
+        entries.sort()
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+    return removed, len(entries) - removed, total
+
+def trim_render_cache(size_mb):
+    """Evict least recently used render cache entries beyond size_mb and report the cache's size"""
+    with profile_stage('cache'):
+        removed, kept, size = evict_render_cache(size_mb * 1024 * 1024)
+    evicted = f", evicted {removed} least recently used" if removed else ''
+    print(f"- Render cache holds {kept} entries ({size / (1024 * 1024):.1f} MiB of {size_mb} MiB{evicted})")
+
+# Highlighted code blocks also have an in-memory layer that lives for one
+# process and keeps the most recently added blocks
+_HIGHLIGHT_CACHE = {}
+HIGHLIGHT_MEMORY_CACHE_SIZE = 2048
 
-def load_blog_posts(posts_dir):
-    """Load all blog posts from the posts directory"""
-    posts = []
+def _remember_highlight(key, html_block):
+    _HIGHLIGHT_CACHE[key] = html_block
+    if len(_HIGHLIGHT_CACHE) > HIGHLIGHT_MEMORY_CACHE_SIZE:
+        del _HIGHLIGHT_CACHE[next(iter(_HIGHLIGHT_CACHE))]
+
+def _read_highlight_cache(key):
+    if key in _HIGHLIGHT_CACHE:
+        return _HIGHLIGHT_CACHE[key]
+    html_block = read_render_cache('highlight', key)
+    if html_block is not None:
+        _remember_highlight(key, html_block)
+    return html_block
+
+def _write_highlight_cache(key, html_block):
+    _remember_highlight(key, html_block)
+    write_render_cache('highlight', key, html_block)
+
+class CachedCodeHilite(codehilite.CodeHilite):
+    """CodeHilite that reuses previously highlighted code blocks
     
-    for file_path in Path(posts_dir).rglob('*.md'):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        metadata, md_content = extract_frontmatter(content)
-        
-        # Extract slug from filename
-        slug = file_path.stem
-        
-        # Generate HTML content
-        html_content = convert_markdown_to_html(md_content)
-        
-        # Set default values if not in frontmatter
-        if 'title' not in metadata:
-            metadata['title'] = slug.replace('-', ' ').title()
-        
-        if 'date' not in metadata:
-            metadata['date'] = datetime.fromtimestamp(file_path.stat().st_mtime)
-        
-        if 'description' not in metadata:
-            # Extract first 150 chars of content as description
-            plain_text = BeautifulSoup(html_content, 'html.parser').get_text()
-            metadata['description'] = plain_text[:150] + "..." if len(plain_text) > 150 else plain_text
+    The key covers the language, the code, every highlighting option and the
+    Markdown/Pygments versions, so a snippet only goes through Pygments the
+    first time it is seen by any post or build.
+    """
+    def hilite(self, shebang=True):
+        key = hash_text(
+            markdown.__version__, PYGMENTS_VERSION, str(self.lang), self.src.strip('\n'),
+            str(shebang), str(self.use_pygments), str(self.guess_lang), self.lang_prefix,
+            str(self.pygments_formatter), json.dumps(self.options, sort_keys=True, default=str)
+        )
+        html_block = _read_highlight_cache(key)
+        if html_block is None:
+            html_block = super().hilite(shebang)
+            _write_highlight_cache(key, html_block)
+        return html_block
+
+MARKDOWN_EXTENSIONS = [
+    'markdown.extensions.extra',
+    'markdown.extensions.codehilite',
+    'markdown.extensions.toc',
+    'markdown.extensions.tables',
+    'markdown.extensions.fenced_code'
+]
+MARKDOWN_EXTENSION_CONFIGS = {
+    'markdown.extensions.codehilite': {
+        'css_class': 'highlight',
+        'linenums': True
+    }
+}
+# Everything besides the source that converted Markdown depends on
+MARKDOWN_CACHE_KEY = json.dumps([BUILDER_VERSION, markdown.__version__, PYGMENTS_VERSION, MARKDOWN_EXTENSIONS,
+                                 MARKDOWN_EXTENSION_CONFIGS], sort_keys=True)
+
+# One Markdown engine per process, reset between documents
+_MARKDOWN_ENGINE = None
+
+def get_markdown_engine():
+    """Return this process's Markdown engine, creating it on first use"""
+    global _MARKDOWN_ENGINE
+    if _MARKDOWN_ENGINE is None:
+        # fenced_code and codehilite look CodeHilite up as a module global,
+        # so this is the hook that routes every code block through the cache
+        fenced_code.CodeHilite = CachedCodeHilite
+        codehilite.CodeHilite = CachedCodeHilite
         
-        if 'tags' not in metadata:
-            metadata['tags'] = []
+        # Configure markdown extensions
+        _MARKDOWN_ENGINE = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS,
+                                             extension_configs=MARKDOWN_EXTENSION_CONFIGS)
+    return _MARKDOWN_ENGINE
+
+def convert_markdown_to_html(md_content):
+    """Convert markdown content to HTML, reusing the render cache's copy if there is one"""
+    key = None
+    if _RENDER_CACHE_DIR is not None:
+        key = hash_text(MARKDOWN_CACHE_KEY, md_content)
+        html_content = read_render_cache('markdown', key)
+        if html_content is not None:
+            return html_content
+    md = get_markdown_engine()
+    md.reset()
+    html_content = md.convert(md_content)
+    if key is not None:
+        write_render_cache('markdown', key, html_content)
+    return html_content
+
+EXCERPT_LENGTH = 150
+WORDS_PER_MINUTE = 200
+
+# Markdown syntax stripped from each line before it is used as plain text
+MARKDOWN_BLOCK_PREFIX_RE = re.compile(r'^\s{0,3}(?:#{1,6}\s+|(?:>\s?)+|[-*+]\s+|\d+[.)]\s+)')
+MARKDOWN_SKIP_LINE_RE = re.compile(r'^\s{0,3}(?:[-*_=]\s*){3,}$|^\s*\|?\s*:?-+:?\s*(?:\|\s*:?-+:?\s*)*\|?\s*$|^\s{0,3}\[[^\]]+\]:\s')
+MARKDOWN_INLINE_RES = [
+    (re.compile(r'!\[([^\]]*)\]\([^)]*\)'), r'\1'),    # images -> alt text
+    (re.compile(r'\[([^\]]*)\]\([^)]*\)'), r'\1'),     # links -> link text
+    (re.compile(r'<[^>]+>'), ''),                        # inline HTML tags
+    (re.compile(r'`+|~~|(?<!\w)[*_]+|[*_]+(?!\w)'), ''),  # code and emphasis marks
+    (re.compile(r'\s*\|\s*'), ' ')                      # table cell separators
+]
+
+def extract_excerpt(md_content, length=EXCERPT_LENGTH):
+    """Return (excerpt, word_count) for a post's Markdown source
+    
+    A single pass over the lines: Markdown syntax is stripped from each line
+    until the excerpt has `length` characters, after which lines are only
+    split to count words. Fenced code counts towards the word count but is
+    left out of the excerpt.
+    """
+    pieces = []
+    excerpt_size = 0
+    word_count = 0
+    fence = None
+    
+    for line in md_content.splitlines():
+        stripped = line.strip()
+        if fence:
+            if stripped.startswith(fence):
+                fence = None
+            else:
+                word_count += len(line.split())
+            continue
+        if stripped.startswith('```') or stripped.startswith('~~~'):
+            fence = stripped[:3]
+            continue
         
-        post_data = {
-            'slug': slug,
-            'filename': str(file_path),
-            'metadata': metadata,
-            'content': html_content,
-            'raw_content': md_content
-        }
+        word_count += len(line.split())
+        if excerpt_size > length or not stripped or MARKDOWN_SKIP_LINE_RE.match(line):
+            continue
         
-        posts.append(post_data)
+        text = MARKDOWN_BLOCK_PREFIX_RE.sub('', line)
+        for pattern, replacement in MARKDOWN_INLINE_RES:
+            text = pattern.sub(replacement, text)
+        text = text.strip()
+        if text:
+            pieces.append(text)
+            excerpt_size += len(text) + 1
+    
+    plain_text = ' '.join(pieces)
+    excerpt = plain_text[:length] + "..." if len(plain_text) > length else plain_text
+    return excerpt, word_count
+
+def cached_excerpt(md_content, source_hash):
+    """extract_excerpt() through the render cache, keyed by the post's source hash"""
+    key = hash_text(BUILDER_VERSION, str(EXCERPT_LENGTH), source_hash)
+    cached = read_render_cache('excerpt', key)
+    if cached is not None:
+        excerpt, word_count = json.loads(cached)
+        return excerpt, word_count
+    excerpt, word_count = extract_excerpt(md_content)
+    write_render_cache('excerpt', key, json.dumps([excerpt, word_count]))
+    return excerpt, word_count
+
+def reading_time_minutes(word_count):
+    """Estimated reading time in whole minutes, at least one"""
+    return max(1, round(word_count / WORDS_PER_MINUTE))
+
+class BlogPost:
+    """A post's metadata, small enough to keep for every post of a build
+    
+    The Markdown body is read again from `filename` when the post is indexed
+    or rendered; raw_content and content only hold it (and its HTML) while
+    that happens, or for the lifetime of the post when it was loaded with
+    keep_body, as the dev server does.
+    """
+    __slots__ = ('slug', 'filename', 'metadata', 'source_hash', 'word_count', 'reading_time', 'modified',
+                 'stat', 'image_refs', 'raw_content', 'content', 'fingerprint')
+    
+    def __init__(self, slug, filename, metadata, source_hash, word_count, modified=None, stat=None,
+                 raw_content=None, image_refs=None):
+        self.slug = slug
+        self.filename = filename
+        self.metadata = metadata
+        self.source_hash = source_hash
+        self.word_count = word_count
+        self.reading_time = reading_time_minutes(word_count)
+        self.modified = modified
+        self.stat = stat
+        # Image URLs the body refers to, for the responsive image stage
+        self.image_refs = image_refs or []
+        self.raw_content = raw_content
+        self.content = None
+        self.fingerprint = None
+
+def load_blog_post(file_path, cached=None, keep_body=False):
+    """Load a single blog post's metadata
+    
+    cached is the post's entry in the build manifest, if any. When the file's
+    modification time and size still match it, the post is rebuilt from the
+    entry without opening the file; when only its source hash matches, the
+    post keeps the date the manifest recorded as its last modification. The
+    body is dropped once the excerpt and word count are taken from it,
+    unless keep_body is set.
+    """
+    file_path = Path(file_path)
+    # Extract slug from filename
+    slug = file_path.stem
+    file_stat = file_path.stat()
+    stat = [file_stat.st_mtime_ns, file_stat.st_size]
+    
+    if cached and cached.get('stat') == stat and 'metadata' in cached and not keep_body:
+        return BlogPost(slug, str(file_path), frontmatter.load_metadata(cached['metadata']), cached['source_hash'],
+                        cached['word_count'], cached.get('modified'), stat, image_refs=cached.get('image_refs'))
+    
+    # Parse the frontmatter as it is read, then take the rest as the body
+    with open(file_path, 'r', encoding='utf-8') as f:
+        with profile_stage('frontmatter', slug):
+            metadata, header = frontmatter.read_frontmatter(f)
+        with profile_stage('read', slug):
+            rest = f.read()
+            source_hash = hash_text(header + rest)
+    if metadata is None:
+        metadata, md_content = {}, header + rest
+    else:
+        md_content = rest.strip()
+    
+    if cached and cached.get('source_hash') == source_hash:
+        modified = cached.get('modified')
+    else:
+        # A post seen for the first time has not changed since it was published
+        modified = datetime.now().strftime('%Y-%m-%d') if cached else None
+    
+    # Fields shown as text are strings, whatever type their YAML value had
+    for key in ['title', 'description']:
+        if metadata.get(key) is None:
+            metadata.pop(key, None)
+        else:
+            metadata[key] = str(metadata[key])
+    
+    # Set default values if not in frontmatter
+    if 'title' not in metadata:
+        metadata['title'] = slug.replace('-', ' ').title()
+    
+    if metadata.get('date') is None:
+        metadata['date'] = datetime.fromtimestamp(file_stat.st_mtime)
+    elif not isinstance(metadata['date'], datetime):
+        metadata['date'] = parse_date(str(metadata['date'])) or datetime.now()
+    
+    with profile_stage('excerpt', slug):
+        excerpt, word_count = cached_excerpt(md_content, source_hash)
+    if 'description' not in metadata:
+        metadata['description'] = excerpt
+    
+    tags = metadata.get('tags')
+    if tags is None:
+        tags = []
+    metadata['tags'] = [str(tag) for tag in (tags if isinstance(tags, list) else [tags])]
+    
+    return BlogPost(slug, str(file_path), metadata, source_hash, word_count, modified, stat,
+                    md_content if keep_body else None, images.find_image_references(md_content))
+
+def _load_blog_post_task(task):
+    """Process pool entry point for load_blog_post()"""
+    file_path, cached = task
+    return load_blog_post(file_path, cached)
+
+def load_blog_posts(posts_dir, manifest=None, jobs=1):
+    """Load the metadata of all blog posts in the posts directory
+    
+    This is the first of the build's two passes: it keeps one small
+    BlogPost per post, enough to order posts and build navigation, listings
+    and feeds, and leaves the bodies to be read back one at a time by
+    read_post_body() when pages are rendered.
+    
+    Posts are parsed across `jobs` worker processes. Files are visited in
+    sorted path order so the result is the same for any number of jobs, and
+    posts with equal dates keep that order after sorting.
+    """
+    cached_posts = manifest['posts'] if manifest else {}
+    tasks = [(str(file_path), cached_posts.get(file_path.stem))
+             for file_path in sorted(Path(posts_dir).rglob('*.md'))]
+    
+    posts = map_in_pool(_load_blog_post_task, tasks, jobs)
     
     # Sort by date (newest first)
-    posts.sort(key=lambda x: x['metadata']['date'], reverse=True)
+    posts.sort(key=lambda x: x.metadata['date'], reverse=True)
     return posts
 
-def generate_blog_html_template():
-    """Generate the HTML template for blog posts"""
-    return '''<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{{TITLE}} | Blog - Thamilselven</title>
-    <meta name="description" content="{{DESCRIPTION}}">
-    <!-- Open Graph Meta Tags -->
-    <meta property="og:title" content="{{TITLE}} - Thamilselven">
-    <meta property="og:description" content="{{DESCRIPTION}}">
-    <meta property="og:type" content="article">
-    <meta property="og:url" content="https://tselven.com/blog/{{SLUG}}.html">
-    <meta property="og:image" content="{{OG_IMAGE}}">
-    <meta property="og:site_name" content="Thamilselven's Blog">
-    <!-- Twitter Card Meta Tags -->
-    <meta name="twitter:card" content="summary_large_image">
-    <meta name="twitter:title" content="{{TITLE}} - Thamilselven">
-    <meta name="twitter:description" content="{{DESCRIPTION}}">
-    <meta name="twitter:image" content="{{OG_IMAGE}}">
-    <link rel="stylesheet" href="../style.css">
-    <link rel="stylesheet" href="./blog.css">
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
-    <link href="https://fonts.googleapis.com/css2?family=JetBrains+Mono:wght@400;700&family=Outfit:wght@300;500;700&display=swap" rel="stylesheet">
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.7.0/styles/default.min.css">
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.7.0/highlight.min.js"></script>
-    <script>hljs.highlightAll();</script>
-</head>
-<body>
-    <button class="theme-toggle" id="themeToggle" aria-label="Toggle theme">
-        <i class="fas fa-moon" id="themeIcon"></i>
-    </button>
-
-    <div class="bg-animation">
-        <div class="floating-shape shape-1"></div>
-        <div class="floating-shape shape-2"></div>
-        <div class="floating-shape shape-3"></div>
-        <div class="floating-shape shape-4"></div>
-    </div>
+def read_post_body(post_data):
+    """Return a post's Markdown body, reading it back from disk if it was dropped"""
+    if post_data.raw_content is not None:
+        return post_data.raw_content
+    with profile_stage('read', post_data.slug):
+        with open(post_data.filename, 'r', encoding='utf-8') as f:
+            return extract_frontmatter(f.read())[1]
 
-    <div class="card blog-card">
-        <!-- Blog Header -->
-        <header class="blog-header">
-            <div class="blog-title-section">
-                <h1 class="blog-post-title">{{TITLE}}</h1>
-                <div class="blog-meta">
-                    <span class="blog-date"><i class="far fa-calendar"></i> {{DATE}}</span>
-                    <!-- TAGS_PLACEHOLDER -->
-                </div>
-            </div>
-        </header>
-
-        <!-- Main Content Area -->
-        <div class="blog-content-wrapper">
-            <!-- Sidebar -->
-            <aside class="blog-sidebar">
-                <div class="sidebar-content">
-                    <div class="blog-profile">
-                        <img src="../thamilselven.jpg" alt="Thamilselven" class="blog-profile-img">
-                        <h3 class="blog-author-name">Thamilselven</h3>
-                        <p class="blog-author-title">Software Engineer | Backend & DevOps</p>
-                    </div>
-
-                    <div class="sidebar-section">
-                        <h3 class="sidebar-title">Recent Posts</h3>
-                        <ul class="recent-posts-list">
-                            <!-- RECENT_POSTS_PLACEHOLDER -->
-                        </ul>
-                    </div>
-
-                    <div class="sidebar-section">
-                        <h3 class="sidebar-title">Categories</h3>
-                        <div class="categories-list">
-                            <!-- CATEGORIES_PLACEHOLDER -->
-                        </div>
-                    </div>
-
-                    <div class="sidebar-section">
-                        <h3 class="sidebar-title">Subscribe</h3>
-                        <p class="sidebar-text">Stay updated with our latest posts.</p>
-                        <a href="./rss.xml" class="rss-subscribe-link" target="_blank">
-                            <i class="fas fa-rss"></i> Subscribe via RSS
-                        </a>
-                    </div>
-                </div>
-            </aside>
-
-            <!-- Blog Article -->
-            <main class="blog-main-content">
-                <article class="blog-article">
-                    {{{CONTENT}}}
-                </article>
-
-                <!-- Post Navigation -->
-                <div class="post-navigation">
-                    <!-- PREVIOUS_POST_PLACEHOLDER -->
-                    <!-- NEXT_POST_PLACEHOLDER -->
-                </div>
-            </main>
-        </div>
-    </div>
+def ensure_post_content(post_data):
+    """Convert a post's Markdown to HTML, unless that was already done"""
+    if post_data.content is None:
+        md_content = read_post_body(post_data)
+        with profile_stage('markdown', post_data.slug):
+            post_data.content = convert_markdown_to_html(md_content)
+        if _IMAGES['records']:
+            with profile_stage('images', post_data.slug):
+                post_data.content = images.rewrite_images(post_data.content, _IMAGES['records'],
+                                                          posixpath.normpath(OUTPUT_DIR), "https://tselven.com")
+    return post_data.content
+
+# Page templates live in blog/templates. {{NAME}} slots are HTML-escaped
+# when rendered, {{{NAME}}} slots are inserted as-is.
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / 'templates'
+TEMPLATE_SLOT_RE = re.compile(r'\{\{\{([A-Z_]+)\}\}\}|\{\{([A-Z_]+)\}\}')
+
+def escape_html(value):
+    """Escape text for use in HTML content and double-quoted attributes"""
+    return html.escape(str(value), quote=False).replace('"', '&quot;')
+
+def compile_template(text):
+    """Split template text into literal chunks and the slots between them
+    
+    Returns (literals, slots) where slots[i] is a (name, escape) pair that
+    goes between literals[i] and literals[i + 1].
+    """
+    literals = []
+    slots = []
+    position = 0
+    for match in TEMPLATE_SLOT_RE.finditer(text):
+        literals.append(text[position:match.start()])
+        if match.group(1):
+            slots.append((match.group(1), False))
+        else:
+            slots.append((match.group(2), True))
+        position = match.end()
+    literals.append(text[position:])
+    return literals, slots
+
+def render_template(template, values):
+    """Fill a compiled template's slots from values in a single join"""
+    literals, slots = template
+    parts = [literals[0]]
+    for (name, escape), literal in zip(slots, literals[1:]):
+        value = values[name]
+        parts.append(escape_html(value) if escape else value)
+        parts.append(literal)
+    return ''.join(parts)
+
+@functools.lru_cache(maxsize=None)
+def load_template_text(name):
+    """Read a template file from TEMPLATES_DIR, once per process"""
+    with open(TEMPLATES_DIR / name, 'r', encoding='utf-8') as f:
+        return f.read()
 
-    <!-- Back to Home Button -->
-    <a href="../index.html" class="back-to-home">
-        <i class="fas fa-arrow-left"></i> Back to Portfolio
-    </a>
-
-    <script>
-        // Theme switching functionality (same as main site)
-        const themeToggle = document.getElementById('themeToggle');
-        const themeIcon = document.getElementById('themeIcon');
-        const htmlElement = document.documentElement;
-
-        const currentTheme = localStorage.getItem('theme') || 'light';
-        htmlElement.setAttribute('data-theme', currentTheme);
-        updateThemeIcon(currentTheme);
-
-        themeToggle.addEventListener('click', () => {
-            const currentTheme = htmlElement.getAttribute('data-theme');
-            const newTheme = currentTheme === 'light' ? 'dark' : 'light';
-
-            htmlElement.setAttribute('data-theme', newTheme);
-            localStorage.setItem('theme', newTheme);
-            updateThemeIcon(newTheme);
-        });
-
-        function updateThemeIcon(theme) {
-            themeIcon.className = theme === 'dark' ? 'fas fa-sun' : 'fas fa-moon';
-        }
-
-        // Format date helper for JavaScript
-        function formatDate(dateString) {
-            const options = { year: 'numeric', month: 'long', day: 'numeric' };
-            return new Date(dateString).toLocaleDateString(undefined, options);
-        }
-    </script>
-</body>
-</html>'''
+@functools.lru_cache(maxsize=None)
+def load_template(name):
+    """Return the compiled form of a template file, once per process"""
+    return compile_template(load_template_text(name))
+
+def generate_blog_html_template():
+    """Return the HTML template for blog posts"""
+    return load_template_text('post.html')
 
 def generate_blog_index_template():
-    """Generate the HTML template for blog index/main page"""
-    return '''<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Blog - Thamilselven</title>
-    <meta name="description" content="Latest articles and insights from Thamilselven's software engineering journey">
-    <!-- Open Graph Meta Tags -->
-    <meta property="og:title" content="Blog - Thamilselven">
-    <meta property="og:description" content="Latest articles and insights from Thamilselven's software engineering journey">
-    <meta property="og:type" content="website">
-    <meta property="og:url" content="https://tselven.com/blog/index.html">
-    <meta property="og:image" content="https://tselven.com/thamilselven.jpg">
-    <meta property="og:site_name" content="Thamilselven's Blog">
-    <!-- Twitter Card Meta Tags -->
-    <meta name="twitter:card" content="summary_large_image">
-    <meta name="twitter:title" content="Blog - Thamilselven">
-    <meta name="twitter:description" content="Latest articles and insights from Thamilselven's software engineering journey">
-    <meta name="twitter:image" content="https://tselven.com/thamilselven.jpg">
-    <link rel="stylesheet" href="../style.css">
-    <link rel="stylesheet" href="../blog/blog.css">
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
-    <link href="https://fonts.googleapis.com/css2?family=JetBrains+Mono:wght@400;700&family=Outfit:wght@300;500;700&display=swap" rel="stylesheet">
-</head>
-<body>
-    <button class="theme-toggle" id="themeToggle" aria-label="Toggle theme">
-        <i class="fas fa-moon" id="themeIcon"></i>
-    </button>
-
-    <div class="bg-animation">
-        <div class="floating-shape shape-1"></div>
-        <div class="floating-shape shape-2"></div>
-        <div class="floating-shape shape-3"></div>
-        <div class="floating-shape shape-4"></div>
-    </div>
+    """Return the HTML template for blog index/main page"""
+    return load_template_text('index.html')
 
-    <div class="card blog-index-card">
-        <header class="blog-index-header">
-            <h1 class="blog-index-title">My Blog</h1>
-            <p class="blog-index-subtitle">Sharing insights, tutorials, and thoughts on software engineering</p>
-        </header>
-
-        <div class="blog-content-wrapper">
-            <aside class="blog-sidebar">
-                <div class="sidebar-content">
-                    <div class="blog-profile">
-                        <img src="../thamilselven.jpg" alt="Thamilselven" class="blog-profile-img">
-                        <h3 class="blog-author-name">Thamilselven</h3>
-                        <p class="blog-author-title">Software Engineer | Backend & DevOps</p>
-                    </div>
-
-                    <div class="sidebar-section">
-                        <h3 class="sidebar-title">About This Blog</h3>
-                        <p class="sidebar-text">Welcome to my personal blog where I share my experiences, learnings, and insights about software engineering, backend development, and DevOps.</p>
-                    </div>
-
-                    <div class="sidebar-section">
-                        <h3 class="sidebar-title">Categories</h3>
-                        <div class="categories-list">
-                            <!-- CATEGORIES_PLACEHOLDER -->
-                        </div>
-                    </div>
-
-                    <div class="sidebar-section">
-                        <h3 class="sidebar-title">Subscribe</h3>
-                        <p class="sidebar-text">Stay updated with our latest posts.</p>
-                        <a href="./rss.xml" class="rss-subscribe-link" target="_blank">
-                            <i class="fas fa-rss"></i> Subscribe via RSS
-                        </a>
-                    </div>
-                </div>
-            </aside>
-
-            <main class="blog-main-content">
-                <div class="blog-posts-grid">
-                    <!-- POSTS_PLACEHOLDER -->
-                </div>
-            </main>
-        </div>
-    </div>
+# Stylesheets and scripts the page templates link to, by template slot.
+# With --minify they are minified and written under content-hashed names.
+ASSET_SOURCES = {'STYLE_CSS': 'style.css', 'BLOG_CSS': 'blog/blog.css', 'SEARCH_JS': 'blog/search.js'}
+ASSET_MINIFIERS = {'.css': minify.minify_css, '.js': minify.minify_js}
+
+# Slot values (file names, relative to the asset's own directory), whether
+# pages are minified and, with --critical-css, a hash of the stylesheets
+# whose critical rules are inlined; set by configure_assets()
+_ASSETS = {'urls': {slot: os.path.basename(path) for slot, path in ASSET_SOURCES.items()}, 'minify': False,
+           'critical': None}
+
+# Critical CSS matchers by template name, each memoizing the selector
+# matches of the elements its pages contain
+_CRITICAL_CSS_MATCHERS = {}
+
+def configure_assets(urls, minify_pages, critical=None):
+    """Set the asset file names filled into templates and how pages are finished"""
+    _ASSETS['urls'] = dict(urls)
+    _ASSETS['minify'] = minify_pages
+    if critical != _ASSETS['critical']:
+        _CRITICAL_CSS_MATCHERS.clear()
+    _ASSETS['critical'] = critical
+
+def stylesheet_sources():
+    """Return the text of the ASSET_SOURCES stylesheets, in the order templates link them"""
+    sources = []
+    for path in ASSET_SOURCES.values():
+        if path.endswith('.css'):
+            with open(path, 'r', encoding='utf-8') as f:
+                sources.append(f.read())
+    return sources
+
+def critical_css_matcher(template):
+    """Return the critical CSS matcher of a template, parsing the stylesheets on first use"""
+    matcher = _CRITICAL_CSS_MATCHERS.get(template)
+    if matcher is None:
+        matcher = _CRITICAL_CSS_MATCHERS[template] = critical_css.new_matcher(stylesheet_sources())
+    return matcher
+
+def asset_settings_key():
+    """Serialize the asset settings, which every rendered page depends on"""
+    return json.dumps(_ASSETS, sort_keys=True)
+
+def finish_page(html_content, template):
+    """Apply the final output transforms to a page rendered from template"""
+    if _ASSETS['critical']:
+        with profile_stage('critical_css'):
+            html_content = critical_css.inline_critical_css(html_content, critical_css_matcher(template))
+    return minify.minify_html(html_content) if _ASSETS['minify'] else html_content
+
+def build_fingerprinted_assets(previous):
+    """Minify the ASSET_SOURCES into content-hashed files next to them
+    
+    A changed stylesheet or script gets a new name, so the files can be served with
+    immutable cache headers. Files from the previous build (previous maps
+    slot to path) that are no longer current are removed. Returns
+    {slot: path}.
+    """
+    assets = {}
+    for slot, path in ASSET_SOURCES.items():
+        stem, extension = os.path.splitext(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            content = ASSET_MINIFIERS[extension](f.read())
+        assets[slot] = f'{stem}.{hash_text(content)[:10]}{extension}'
+        write_output(assets[slot], content)
+    remove_fingerprinted_assets(previous, keep=assets.values())
+    return assets
 
-    <!-- Back to Home Button -->
-    <a href="../index.html" class="back-to-home">
-        <i class="fas fa-arrow-left"></i> Back to Portfolio
-    </a>
-
-    <script>
-        // Theme switching functionality (same as main site)
-        const themeToggle = document.getElementById('themeToggle');
-        const themeIcon = document.getElementById('themeIcon');
-        const htmlElement = document.documentElement;
-
-        const currentTheme = localStorage.getItem('theme') || 'light';
-        htmlElement.setAttribute('data-theme', currentTheme);
-        updateThemeIcon(currentTheme);
-
-        themeToggle.addEventListener('click', () => {
-            const currentTheme = htmlElement.getAttribute('data-theme');
-            const newTheme = currentTheme === 'light' ? 'dark' : 'light';
-
-            htmlElement.setAttribute('data-theme', newTheme);
-            localStorage.setItem('theme', newTheme);
-            updateThemeIcon(newTheme);
-        });
-
-        function updateThemeIcon(theme) {
-            themeIcon.className = theme === 'dark' ? 'fas fa-sun' : 'fas fa-moon';
-        }
-
-        // Format date helper for JavaScript
-        function formatDate(dateString) {
-            const options = { year: 'numeric', month: 'long', day: 'numeric' };
-            return new Date(dateString).toLocaleDateString(undefined, options);
-        }
-    </script>
-</body>
-</html>'''
+def remove_fingerprinted_assets(previous, keep=()):
+    """Remove content-hashed asset files recorded in a build manifest"""
+    for path in previous.values():
+        if path not in keep and os.path.exists(path):
+            remove_output(path)
+
+# Image posts fall back to for og:image
+DEFAULT_OG_IMAGE = 'https://tselven.com/thamilselven.jpg'
+# Resized derivatives of post images, from --images
+IMAGE_DERIVATIVES_DIR = 'blog/images'
+
+# Derivative records by source path, set by configure_images(); empty
+# unless --images is on, in which case post images are rewritten to use them
+_IMAGES = {'records': {}}
+
+def configure_images(records):
+    """Set the image derivative records that pages are rendered with"""
+    _IMAGES['records'] = records
+
+def post_image_sources(post, base_url="https://tselven.com"):
+    """Return the local image files a post's page shows: its body's images and its og:image"""
+    page_dir = posixpath.normpath(OUTPUT_DIR)
+    sources = []
+    for url in post.image_refs + [str(post.metadata.get('image', DEFAULT_OG_IMAGE))]:
+        source = images.resolve_image_source(url, page_dir, base_url)
+        if source is not None and source not in sources:
+            sources.append(source)
+    return sources
+
+def post_images_key(post):
+    """Serialize the derivatives a post's page links to, for its page key"""
+    records = _IMAGES['records']
+    if not records:
+        return ''
+    return json.dumps([records.get(source) for source in post_image_sources(post)], sort_keys=True)
+
+def og_image_url(url, base_url="https://tselven.com"):
+    """Return the og:image URL for an image, preferring its largest JPEG derivative"""
+    if not _IMAGES['records']:
+        return url
+    source = images.resolve_image_source(str(url), posixpath.normpath(OUTPUT_DIR), base_url)
+    record = _IMAGES['records'].get(source)
+    if record is None or 'JPEG' not in record['variants']:
+        return url
+    return f"{base_url}/{record['variants']['JPEG'][-1][1]}"
+
+def _image_derivatives_task(task):
+    """Process pool entry point: hash one source image and write its derivatives"""
+    source, formats = task
+    with profile_stage('image'):
+        digest = images.file_digest(source)
+        record = images.generate_derivatives(source, digest, IMAGE_DERIVATIVES_DIR, formats)
+    record['digest'] = digest
+    return record
+
+def build_image_derivatives(posts, previous, jobs=1, remove_unused=True):
+    """Generate the responsive derivatives of every local image that posts use
+    
+    previous is the 'images' section of the last build manifest. A source
+    whose modification time, size and output formats match its record there,
+    and whose derivatives are all on disk, is not even read; the others are
+    hashed and encoded across the pool, skipping derivatives that already
+    exist under their content-hashed names. Derivatives of images no longer
+    used are removed, unless remove_unused is off because posts only holds
+    one shard's posts. Returns {source path: record}.
+    """
+    formats = images.image_formats()
+    if 'JPEG' not in formats:
+        print("Pillow is not installed; images are left as they are")
+        remove_image_derivatives(previous)
+        return {}
+    
+    sources = sorted({source for post in posts for source in post_image_sources(post)})
+    records = {}
+    tasks = []
+    for source in sources:
+        stat = os.stat(source)
+        signature = [stat.st_mtime_ns, stat.st_size]
+        record = previous.get(source)
+        if (record and record.get('stat') == signature and record.get('formats') == formats and
+                all(os.path.exists(path) for variants in record['variants'].values() for _, path in variants)):
+            records[source] = record
+        else:
+            tasks.append((source, signature))
+    
+    results = map_in_pool(_image_derivatives_task, [(source, formats) for source, _ in tasks], jobs)
+    for (source, signature), record in zip(tasks, results):
+        record['stat'] = signature
+        record['formats'] = formats
+        records[source] = record
+    if remove_unused:
+        remove_image_derivatives(previous, keep=records)
+    print(f"Generated derivatives of {len(tasks)} images ({len(records) - len(tasks)} unchanged)")
+    return records
+
+def remove_image_derivatives(previous, keep=None):
+    """Remove the derivative files of a manifest's image records that keep does not use"""
+    kept = {path for record in (keep or {}).values() for variants in record['variants'].values()
+            for _, path in variants}
+    for record in previous.values():
+        for variants in record['variants'].values():
+            for _, path in variants:
+                if path not in kept and os.path.exists(path):
+                    os.remove(path)
 
 def simple_format_date(date_obj):
     """Simple date formatting function"""
@@ -405,221 +926,1922 @@ def simple_format_date(date_obj):
     
     return date_obj.strftime('%B %d, %Y')
 
-def generate_blog_post(output_dir, post_data, all_posts, recent_count=5):
-    """Generate HTML for a single blog post"""
-    # Find previous and next posts
-    current_index = all_posts.index(post_data)
-    previous_post = all_posts[current_index + 1] if current_index + 1 < len(all_posts) else None
-    next_post = all_posts[current_index - 1] if current_index > 0 else None
+def render_recent_post_item(post):
+    """Render one entry of the recent posts sidebar"""
+    post_date = simple_format_date(post.metadata['date'])
+    return f'''
+        <li class="recent-post-item">
+            <a href="{escape_html(post.slug)}.html" class="recent-post-link">{escape_html(post.metadata['title'])}</a>
+            <span class="recent-post-date">{post_date}</span>
+        </li>'''
+
+def collect_categories(posts):
+    """Return the sorted list of unique tags across all posts"""
+    all_categories = set()
+    for post in posts:
+        if 'tags' in post.metadata:
+            all_categories.update(post.metadata['tags'])
+    return sorted(all_categories)
+
+# Related posts: cosine similarity between TF-IDF vectors of the posts'
+# search term weights. With NumPy and SciPy the whole corpus is scored as
+# sparse matrix products, a block of rows at a time; without them an
+# inverted index keeps the pure-Python scorer away from comparing every
+# pair of posts.
+RELATED_POST_COUNT = 3
+# Terms kept per post, by TF-IDF weight
+RELATED_TERMS_PER_POST = 40
+# Terms in more than this share of posts are too common to relate posts
+RELATED_MAX_DOC_FREQUENCY = 0.5
+# Posts scored per sparse matrix product by the vectorized ranking
+RELATED_BLOCK_ROWS = 1024
+
+def related_idf(doc_freq, post_count):
+    """Return {term: IDF} of the terms that can relate posts, from their document frequencies"""
+    max_doc_freq = max(2, RELATED_MAX_DOC_FREQUENCY * post_count)
+    # Terms in a single post cannot relate it to another one
+    return {term: math.log(post_count / count) for term, count in doc_freq.items() if 1 < count <= max_doc_freq}
+
+def related_post_vector(weights, idf, log_tf):
+    """Return one post's L2-normalized TF-IDF vector, {term: weight}
+    
+    log_tf memoizes 1 + log(weight) between calls.
+    """
+    vector = []
+    for term, weight in weights.items():
+        if term in idf:
+            if weight not in log_tf:
+                log_tf[weight] = 1 + math.log(weight)
+            vector.append((log_tf[weight] * idf[term], term))
+    # Like the rows of related_post_matrix(): the norm sums the heaviest
+    # terms first and the vector is in term order, so both rankings sum the
+    # same products in the same order
+    vector = heapq.nlargest(RELATED_TERMS_PER_POST, vector)
+    norm = math.sqrt(sum(weight * weight for weight, _ in vector))
+    return {term: weight / norm for weight, term in sorted(vector, key=lambda item: item[1])} if norm else {}
+
+def related_doc_freq(term_weights):
+    """Return {term: number of posts whose term weights hold it}"""
+    doc_freq = {}
+    for weights in term_weights:
+        for term in weights:
+            doc_freq[term] = doc_freq.get(term, 0) + 1
+    return doc_freq
+
+def related_post_vectors(term_weights):
+    """Return an L2-normalized TF-IDF vector, {term: weight}, per post"""
+    idf = related_idf(related_doc_freq(term_weights), len(term_weights))
+    log_tf = {}
+    return [related_post_vector(weights, idf, log_tf) for weights in term_weights]
+
+def related_postings(vectors):
+    """Return the inverted index {term: {index: weight}} of the vectors"""
+    postings = {}
+    for index, vector in enumerate(vectors):
+        for term, weight in vector.items():
+            postings.setdefault(term, {})[index] = weight
+    return postings
+
+def _rank_related_rows(vectors, postings, count, indexes):
+    """Return the indexes of the most similar vectors to each of vectors[indexes], best first"""
+    ranked = []
+    for index in indexes:
+        vector = vectors[index]
+        scores = {}
+        for term, weight in vector.items():
+            for other, other_weight in postings[term].items():
+                scores[other] = scores.get(other, 0.0) + weight * other_weight
+        scores.pop(index, None)
+        best = heapq.nsmallest(count, scores.items(), key=lambda item: (-item[1], item[0]))
+        ranked.append([other for other, score in best if score > 0])
+    return ranked
+
+def _rank_related_python(vectors, count):
+    """Return the indexes of each vector's most similar vectors, best first"""
+    return _rank_related_rows(vectors, related_postings(vectors), count, range(len(vectors)))
+
+def related_post_matrix(term_weights):
+    """Vectorized related_post_vectors(), as a SciPy sparse matrix with a row per post"""
+    post_count = len(term_weights)
+    lengths, terms, weights = [], [], []
+    for post_weights in term_weights:
+        lengths.append(len(post_weights))
+        terms.extend(post_weights)
+        weights.extend(post_weights.values())
+    # Columns in term order, so ties can be broken the way nlargest() does
+    vocabulary = {term: column for column, term in enumerate(sorted(set(terms)))}
+    columns = numpy.fromiter(map(vocabulary.__getitem__, terms), dtype=numpy.int64, count=len(terms))
+    rows = numpy.repeat(numpy.arange(post_count), lengths)
     
-    # Get recent posts
-    recent_posts = all_posts[:recent_count] if len(all_posts) >= recent_count else all_posts
+    doc_freq = numpy.bincount(columns, minlength=len(vocabulary))
+    max_doc_freq = max(2, RELATED_MAX_DOC_FREQUENCY * post_count)
+    keep = (doc_freq[columns] > 1) & (doc_freq[columns] <= max_doc_freq)
+    rows, columns = rows[keep], columns[keep]
+    # Logarithms come from math.log(), as in related_post_vector(), since
+    # numpy.log() can differ from it in the last bit
+    levels, inverse = numpy.unique(numpy.array(weights, dtype=numpy.float64)[keep], return_inverse=True)
+    log_tf = numpy.array([1 + math.log(weight) for weight in levels.tolist()])[inverse.reshape(-1)]
+    levels, inverse = numpy.unique(doc_freq[columns], return_inverse=True)
+    values = log_tf * numpy.array([math.log(post_count / count) for count in levels.tolist()])[inverse.reshape(-1)]
     
-    # Get all unique categories
-    all_categories = set()
+    # Order each post's terms by weight, then term, both descending; one
+    # integer key sorts much faster than lexsort() with three
+    value_levels, value_ranks = numpy.unique(-values, return_inverse=True)
+    term_count = len(vocabulary)
+    if post_count * len(value_levels) * term_count < 2 ** 63:
+        keys = (rows * len(value_levels) + value_ranks.reshape(-1)) * term_count + (term_count - 1 - columns)
+        order = numpy.argsort(keys, kind='stable')
+    else:
+        order = numpy.lexsort((-columns, -values, rows))
+    rows, columns, values = rows[order], columns[order], values[order]
+    keep = numpy.arange(len(rows)) - numpy.searchsorted(rows, rows) < RELATED_TERMS_PER_POST
+    rows, columns, values = rows[keep], columns[keep], values[keep]
+    # Terms in every post weigh nothing; a post left with only those gets an
+    # empty row, as in related_post_vectors(), instead of dividing 0 by 0
+    keep = values != 0
+    rows, columns, values = rows[keep], columns[keep], values[keep]
+    values /= numpy.sqrt(numpy.bincount(rows, weights=values * values, minlength=post_count))[rows]
+    return sparse.csr_matrix((values, (rows, columns)), shape=(post_count, max(1, len(vocabulary))))
+
+def _rank_related_sparse(matrix, count):
+    """Vectorized _rank_related_python(), scoring a block of posts per matrix product"""
+    transposed = matrix.T.tocsc()
+    
+    ranked = []
+    for start in range(0, matrix.shape[0], RELATED_BLOCK_ROWS):
+        similarities = (matrix[start:start + RELATED_BLOCK_ROWS] @ transposed).tocsr()
+        block_size = similarities.shape[0]
+        lengths = numpy.diff(similarities.indptr)
+        rows = numpy.repeat(numpy.arange(block_size), lengths)
+        similarities.data[similarities.indices == start + rows] = 0
+        # Pack each row's scores to the left of a dense array, which is only
+        # as wide as the row with the most nonzero scores
+        width = max(count, lengths.max(initial=0))
+        scores = numpy.zeros((block_size, width))
+        scores.reshape(-1)[rows * width + numpy.arange(similarities.nnz) - similarities.indptr[rows]] = similarities.data
+        
+        # Keep each row's top `count` scores, breaking ties at the cut-off by
+        # index like the pure-Python ranking does
+        cutoff = -numpy.partition(-scores, count - 1, axis=1)[:, count - 1]
+        rows, columns = numpy.nonzero((scores >= cutoff[:, None]) & (scores > 0))
+        top_scores = scores[rows, columns]
+        top_others = similarities.indices[similarities.indptr[rows] + columns]
+        order = numpy.lexsort((top_others, -top_scores, rows))
+        rows, top_others = rows[order], top_others[order]
+        keep = numpy.arange(len(rows)) - numpy.searchsorted(rows, rows) < count
+        rows, top_others = rows[keep], top_others[keep].tolist()
+        bounds = numpy.searchsorted(rows, numpy.arange(block_size + 1)).tolist()
+        ranked.extend(top_others[bounds[row]:bounds[row + 1]] for row in range(block_size))
+    return ranked
+
+def compute_related_posts(posts, term_weights, count=RELATED_POST_COUNT):
+    """Return {slug: [slug, ...]} of each post's most similar posts
+    
+    term_weights holds the search_term_weights() of each post, in the same
+    order as posts.
+    """
+    if not posts or count < 1:
+        return {post.slug: [] for post in posts}
+    if sparse is not None:
+        ranked = _rank_related_sparse(related_post_matrix(term_weights), count)
+    else:
+        ranked = _rank_related_python(related_post_vectors(term_weights), count)
+    return {post.slug: [posts[other].slug for other in ranked[index]] for index, post in enumerate(posts)}
+
+# Share of the posts above which update_related_index() ranks every post
+# again in one go rather than a row at a time
+RELATED_RERANK_SHARE = 0.2
+
+def _related_score(vector, other_vector):
+    """Return the similarity of two vectors, summed in the same order as _rank_related_rows()"""
+    score = 0.0
+    for term, weight in vector.items():
+        other_weight = other_vector.get(term)
+        if other_weight is not None:
+            score += weight * other_weight
+    return score
+
+def new_related_index(posts, term_weights, count=RELATED_POST_COUNT):
+    """Rank related posts like compute_related_posts(), keeping the state update_related_index() needs"""
+    term_weights = list(term_weights)
+    doc_freq = related_doc_freq(term_weights)
+    idf = related_idf(doc_freq, len(term_weights))
+    log_tf = {}
+    vectors = [related_post_vector(weights, idf, log_tf) for weights in term_weights]
+    related = compute_related_posts(posts, term_weights, count)
+    positions = {post.slug: index for index, post in enumerate(posts)}
+    return {
+        'slugs': [post.slug for post in posts],
+        'weights': term_weights,
+        'doc_freq': doc_freq,
+        'idf': idf,
+        'log_tf': log_tf,
+        'vectors': vectors,
+        'postings': related_postings(vectors),
+        'ranked': [[positions[slug] for slug in related[post.slug]] for post in posts],
+        'related': related,
+        # Slugs whose list the last ranking changed
+        'updated': set(related),
+        'count': count
+    }
+
+def update_related_index(index, posts, term_weights):
+    """Re-rank related posts after the term weights of some posts changed
+    
+    Returns {slug: [slug, ...]}, equal to what compute_related_posts()
+    returns for the same posts. A post's terms feed the IDF of every post
+    holding them, so an edit re-derives the vectors of those posts. Only
+    the posts whose vectors changed, and those whose lists held one of them
+    that now scores lower, are ranked again in full; the other posts
+    sharing a term with a changed post weigh it against their current
+    lists. Adding, removing or reordering posts ranks them all again, as do
+    edits that would rank more than RELATED_RERANK_SHARE of them in full.
+    """
+    count = index['count']
+    if [post.slug for post in posts] != index['slugs']:
+        index.update(new_related_index(posts, term_weights, count))
+        return index['related']
+    
+    # Move the document frequencies of the terms that edited posts gained or
+    # lost, then the IDF of those terms
+    old_weights, doc_freq, idf = index['weights'], index['doc_freq'], index['idf']
+    edited = set()
+    terms = set()
+    for row, weights in enumerate(term_weights):
+        old = old_weights[row]
+        if weights is old or weights == old:
+            continue
+        edited.add(row)
+        for term in old.keys() - weights.keys():
+            doc_freq[term] -= 1
+            if not doc_freq[term]:
+                del doc_freq[term]
+            terms.add(term)
+        for term in weights.keys() - old.keys():
+            doc_freq[term] = doc_freq.get(term, 0) + 1
+            terms.add(term)
+        old_weights[row] = weights
+    if not edited:
+        index['updated'] = set()
+        return index['related']
+    new_idf = related_idf({term: doc_freq[term] for term in terms if term in doc_freq}, len(posts))
+    terms = {term for term in terms if idf.get(term) != new_idf.get(term)}
+    for term in terms:
+        if term in new_idf:
+            idf[term] = new_idf[term]
+        else:
+            del idf[term]
+    
+    # Re-derive the vectors of the edited posts and of the posts holding a
+    # term whose IDF moved
+    vectors, postings = index['vectors'], index['postings']
+    rows = edited | {row for row, weights in enumerate(old_weights) if terms and not terms.isdisjoint(weights)}
+    old_vectors = {}
+    for row in rows:
+        vector = related_post_vector(old_weights[row], idf, index['log_tf'])
+        if list(vector.items()) == list(vectors[row].items()):
+            continue
+        for term in vectors[row]:
+            del postings[term][row]
+            if not postings[term]:
+                del postings[term]
+        for term, weight in vector.items():
+            postings.setdefault(term, {})[row] = weight
+        old_vectors[row], vectors[row] = vectors[row], vector
+    changed = set(old_vectors)
+    
+    # A list that held a changed post which now scores lower may have to
+    # take in a post that was not on it, so it is ranked again in full
+    ranked = index['ranked']
+    rerank = set(changed)
+    for row, others in enumerate(ranked):
+        if row in changed or changed.isdisjoint(others):
+            continue
+        vector = vectors[row]
+        if any(_related_score(vector, vectors[other]) < _related_score(vector, old_vectors[other])
+               for other in others if other in changed):
+            rerank.add(row)
+    if len(rerank) > RELATED_RERANK_SHARE * len(posts):
+        related = compute_related_posts(posts, old_weights, count)
+        positions = {post.slug: row for row, post in enumerate(posts)}
+        index['ranked'] = [[positions[slug] for slug in related[post.slug]] for post in posts]
+        index['updated'] = {slug for slug, others in related.items() if others != index['related'][slug]}
+        index['related'] = related
+        return related
+    
+    rows = sorted(rerank)
+    updates = dict(zip(rows, _rank_related_rows(vectors, postings, count, rows)))
+    # The other posts sharing a term with a changed post: their scores against
+    # everything else stand, so the changed posts only compete with their
+    # current lists
+    contenders = {}
+    for row in changed:
+        for term in vectors[row]:
+            for other in postings[term]:
+                if other not in rerank:
+                    contenders.setdefault(other, set()).add(row)
+    for row, others in contenders.items():
+        scores = [(other, _related_score(vectors[row], vectors[other])) for other in others.union(ranked[row])]
+        best = heapq.nsmallest(count, scores, key=lambda item: (-item[1], item[0]))
+        updates[row] = [other for other, score in best if score > 0]
+    
+    related = index['related'] = dict(index['related'])
+    updated = index['updated'] = set()
+    for row, others in updates.items():
+        if others != ranked[row]:
+            ranked[row] = others
+            related[posts[row].slug] = [posts[other].slug for other in others]
+            updated.add(posts[row].slug)
+    return related
+
+def render_related_posts(post_data, context):
+    """Render the related posts sidebar section of a post page, if it has any"""
+    related = context['related'].get(post_data.slug)
+    if not related:
+        return ''
+    items = ''.join(render_recent_post_item(context['posts'][context['positions'][slug]]) for slug in related)
+    return f'''<div class="sidebar-section">
+                        <h3 class="sidebar-title">Related Posts</h3>
+                        <ul class="recent-posts-list">{items}
+                        </ul>
+                    </div>'''
+
+def build_site_context(all_posts, recent_count=5, related=None):
+    """Precompute everything post pages share, once per build
+    
+    Rendering a page then only does work proportional to that page instead
+    of rescanning all_posts: the slug index gives prev/next in O(1), and the
+    recent posts and categories sidebars are rendered a single time. The
+    recent posts list omits the page's own post, so a variant is prepared
+    for each of the (at most recent_count) posts that appear in it. related
+    is the result of compute_related_posts(), if any.
+    """
+    # Inverted tag index, built in one pass; each list stays in post order
+    tag_posts = {}
     for post in all_posts:
-        if 'tags' in post['metadata']:
-            all_categories.update(post['metadata']['tags'])
-    all_categories = sorted(list(all_categories))
+        for tag in post.metadata.get('tags', []):
+            tag_posts.setdefault(tag, []).append(post)
+    categories = sorted(tag_posts)
     
-    # Load the template
-    template = generate_blog_html_template()
+    # Give every tag a unique file name, even if two tags slugify alike
+    tag_slugs = {}
+    used_slugs = set()
+    for tag in categories:
+        tag_slug = slugify(tag) or 'tag'
+        candidate, suffix = tag_slug, 2
+        while candidate in used_slugs:
+            candidate, suffix = f'{tag_slug}-{suffix}', suffix + 1
+        used_slugs.add(candidate)
+        tag_slugs[tag] = candidate
     
-    # Replace placeholders
-    html_content = template.replace('{{TITLE}}', post_data['metadata']['title'])
-    html_content = html_content.replace('{{DESCRIPTION}}', post_data['metadata']['description'])
-    html_content = html_content.replace('{{{CONTENT}}}', post_data['content'])
-    html_content = html_content.replace('{{SLUG}}', post_data['slug'])
+    context = {
+        'posts': all_posts,
+        'related': related or {},
+        'positions': {post.slug: index for index, post in enumerate(all_posts)},
+        'categories': categories,
+        'tag_posts': tag_posts,
+        'tag_slugs': tag_slugs,
+        'categories_html_by_root': {},
+        **_site_context_pages(all_posts, recent_count)
+    }
+    context['categories_html'] = render_categories(context)
+    return context
+
+def update_site_context(context, all_posts, edited, recent_count=5, related=None):
+    """Return build_site_context() of all_posts from the context of the posts they were edited from
     
-    # Handle og:image - use image from frontmatter if provided, otherwise default
-    og_image = post_data['metadata'].get('image', 'https://tselven.com/thamilselven.jpg')
-    html_content = html_content.replace('{{OG_IMAGE}}', og_image)
+    edited maps slugs to the posts in context that all_posts replaced. Each
+    edit must keep the post's date and tags, as the dev server checks, so
+    the positions and categories stand and only the tag lists holding an
+    edited post are copied to take in the new object.
+    """
+    tag_posts = dict(context['tag_posts'])
+    for slug, previous_post in edited.items():
+        post = all_posts[context['positions'][slug]]
+        for tag in post.metadata.get('tags', []):
+            posts = tag_posts[tag] = list(tag_posts[tag])
+            posts[posts.index(previous_post)] = post
+    return {
+        **context,
+        'posts': all_posts,
+        'related': related or {},
+        'tag_posts': tag_posts,
+        **_site_context_pages(all_posts, recent_count)
+    }
+
+def _site_context_pages(all_posts, recent_count):
+    """Return the recent posts sidebar and the templates of a site context"""
+    recent_items = [(post.slug, render_recent_post_item(post)) for post in all_posts[:recent_count]]
+    return {
+        'recent_posts_html': ''.join(item_html for _, item_html in recent_items),
+        'recent_posts_html_without': {
+            slug: ''.join(item_html for other_slug, item_html in recent_items if other_slug != slug)
+            for slug, _ in recent_items
+        },
+        'post_template': load_template('post.html'),
+        'index_template': load_template('index.html'),
+        'post_template_hash': hash_text(generate_blog_html_template()),
+        'index_template_hash': hash_text(generate_blog_index_template())
+    }
+
+def slugify(text):
+    """Turn text into a lowercase, hyphen-separated file name"""
+    return re.sub(r'[^a-z0-9]+', '-', str(text).lower()).strip('-')
+
+def render_categories(context, root=''):
+    """Render the categories sidebar for a page `root` levels below blog/
     
-    # Format date
-    formatted_date = simple_format_date(post_data['metadata']['date'])
-    html_content = html_content.replace('{{DATE}}', formatted_date)
+    Each distinct root is rendered once per build and then reused.
+    """
+    cached = context['categories_html_by_root'].get(root)
+    if cached is None:
+        cached = ''.join([
+            f'<a href="{root}tags/{context["tag_slugs"][cat]}.html" class="category-link">{escape_html(cat)}</a>'
+            for cat in context['categories']
+        ])
+        context['categories_html_by_root'][root] = cached
+    return cached
+
+def render_blog_post(post_data, all_posts, recent_count=5, current_index=None, context=None):
+    """Render the HTML page for a single blog post
     
-    # Handle tags
-    if 'tags' in post_data['metadata'] and post_data['metadata']['tags']:
-        tags_html = ''.join([f'<span class="blog-tag">{tag}</span>' for tag in post_data['metadata']['tags']])
-        html_content = html_content.replace('<!-- TAGS_PLACEHOLDER -->', f'<div class="blog-tags">{tags_html}</div>')
-    else:
-        html_content = html_content.replace('<!-- TAGS_PLACEHOLDER -->', '')
-    
-    # Insert recent posts
-    recent_posts_html = ''
-    for post in recent_posts:
-        if post != post_data:  # Don't include current post in recent posts
-            post_date = simple_format_date(post['metadata']['date'])
-            recent_posts_html += f'''
-        <li class="recent-post-item">
-            <a href="{post['slug']}.html" class="recent-post-link">{post['metadata']['title']}</a>
-            <span class="recent-post-date">{post_date}</span>
-        </li>'''
+    The post's body is converted by ensure_post_content() if it has not been
+    yet; other posts only need their metadata. Pass the context
+    from build_site_context() when rendering many posts; without one it is
+    built here, which costs O(len(all_posts)).
+    """
+    if context is None:
+        context = build_site_context(all_posts, recent_count)
     
-    html_content = html_content.replace('<!-- RECENT_POSTS_PLACEHOLDER -->', recent_posts_html)
+    # Find previous and next posts
+    if current_index is None:
+        current_index = context['positions'][post_data.slug]
+    previous_post = all_posts[current_index + 1] if current_index + 1 < len(all_posts) else None
+    next_post = all_posts[current_index - 1] if current_index > 0 else None
     
-    # Insert categories
-    categories_html = ''.join([f'<a href="#" class="category-link">{cat}</a>' for cat in all_categories])
-    html_content = html_content.replace('<!-- CATEGORIES_PLACEHOLDER -->', categories_html)
+    metadata = post_data.metadata
+    
+    # Handle tags
+    tags_html = ''
+    if 'tags' in metadata and metadata['tags']:
+        tags_html = ''.join([f'<span class="blog-tag">{escape_html(tag)}</span>' for tag in metadata['tags']])
+        tags_html = f'<div class="blog-tags">{tags_html}</div>'
     
     # Handle post navigation
     prev_html = ''
     if previous_post:
-        prev_html = f'''<a href="{previous_post['slug']}.html" class="nav-link prev-link">
+        prev_html = f'''<a href="{escape_html(previous_post.slug)}.html" class="nav-link prev-link">
             <i class="fas fa-arrow-left"></i>
-            <span>{previous_post['metadata']['title']}</span>
+            <span>{escape_html(previous_post.metadata['title'])}</span>
         </a>'''
     
     next_html = ''
     if next_post:
-        next_html = f'''<a href="{next_post['slug']}.html" class="nav-link next-link">
-            <span>{next_post['metadata']['title']}</span>
+        next_html = f'''<a href="{escape_html(next_post.slug)}.html" class="nav-link next-link">
+            <span>{escape_html(next_post.metadata['title'])}</span>
             <i class="fas fa-arrow-right"></i>
         </a>'''
     
-    html_content = html_content.replace('<!-- PREVIOUS_POST_PLACEHOLDER -->', prev_html)
-    html_content = html_content.replace('<!-- NEXT_POST_PLACEHOLDER -->', next_html)
+    return finish_page(render_template(context['post_template'], {
+        'TITLE': metadata['title'],
+        'DESCRIPTION': metadata['description'],
+        'SLUG': post_data.slug,
+        # Use image from frontmatter if provided, otherwise default
+        'OG_IMAGE': og_image_url(metadata.get('image', DEFAULT_OG_IMAGE)),
+        'DATE': simple_format_date(metadata['date']),
+        'READING_TIME': str(post_data.reading_time),
+        'TAGS': tags_html,
+        'CONTENT': ensure_post_content(post_data),
+        # Recent posts leave out the current post
+        'RELATED_POSTS': render_related_posts(post_data, context),
+        'RECENT_POSTS': context['recent_posts_html_without'].get(post_data.slug, context['recent_posts_html']),
+        'CATEGORIES': context['categories_html'],
+        'PREVIOUS_POST': prev_html,
+        'NEXT_POST': next_html,
+        **_ASSETS['urls']
+    }), 'post.html')
+
+def write_blog_post(output_dir, post_data, html_content):
+    """Write a rendered blog post page to the output directory"""
+    output_file = os.path.join(output_dir, f"{post_data.slug}.html")
+    with profile_stage('write', post_data.slug):
+        written = write_output(output_file, html_content)
     
-    # Replace Disqus placeholder (this would be configured in production)
-    html_content = html_content.replace('{{DISQUS_SHORTNAME}}', 'your-disqus-shortname')
+    if written:
+        print(f"Generated blog post: {output_file}")
+
+def generate_blog_post(output_dir, post_data, all_posts, recent_count=5, context=None):
+    """Generate HTML for a single blog post"""
+    ensure_post_content(post_data)
+    with profile_stage('render', post_data.slug):
+        html_content = render_blog_post(post_data, all_posts, recent_count, context=context)
+    write_blog_post(output_dir, post_data, html_content)
+    if post_data.raw_content is None:
+        post_data.content = None
+
+# Site context shared with render workers, built once per worker process
+_RENDER_CONTEXT = None
+
+def _init_render_worker(posts, related=None):
+    """Process pool initializer for _render_blog_post_task()"""
+    global _RENDER_CONTEXT
+    _RENDER_CONTEXT = build_site_context(posts, related=related)
+
+def _render_blog_post_task(task):
+    """Process pool entry point: read, convert and render one post
     
-    # Write the output file
-    output_file = os.path.join(output_dir, f"{post_data['slug']}.html")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    The body and its HTML are dropped again afterwards, so serial builds
+    hold only one post's body at a time as well.
+    """
+    current_index, post_data = task
+    try:
+        ensure_post_content(post_data)
+        with profile_stage('render', post_data.slug):
+            return render_blog_post(post_data, _RENDER_CONTEXT['posts'], current_index=current_index,
+                                    context=_RENDER_CONTEXT)
+    finally:
+        if post_data.raw_content is None:
+            post_data.content = None
+
+DEFAULT_PAGE_SIZE = 10
+
+def listing_page_path(base, page_number):
+    """Return the path, relative to blog/, of one page of a post listing
     
-    print(f"Generated blog post: {output_file}")
+    base is 'index' for the main listing or 'tags/<slug>' for a tag; the
+    first page is '<base>.html' and later ones '<base-dir>/page/N.html'.
+    """
+    if page_number == 1:
+        return f'{base}.html'
+    if base == 'index':
+        return f'page/{page_number}.html'
+    return f'{base}/page/{page_number}.html'
 
-def generate_blog_index(output_dir, all_posts):
-    """Generate the main blog index page"""
-    # Get all unique categories
-    all_categories = set()
-    for post in all_posts:
-        if 'tags' in post['metadata']:
-            all_categories.update(post['metadata']['tags'])
-    all_categories = sorted(list(all_categories))
+def listing_page_spec(context, tag, page_number, page_size=DEFAULT_PAGE_SIZE):
+    """Return the spec of one page of the main listing (tag None) or of a tag's listing"""
+    if tag is None:
+        base, posts = 'index', context['posts']
+        title, heading = 'Blog', 'My Blog'
+        subtitle = 'Sharing insights, tutorials, and thoughts on software engineering'
+    else:
+        base, posts = f"tags/{context['tag_slugs'][tag]}", context['tag_posts'][tag]
+        title, heading = f'{tag} - Blog', f'Posts tagged "{tag}"'
+        subtitle = f"{len(posts)} post{'s' if len(posts) != 1 else ''} tagged \"{tag}\""
+    page_count = max(1, -(-len(posts) // page_size))
+    return {
+        'path': listing_page_path(base, page_number),
+        'base': base,
+        'tag': tag,
+        'posts': posts[(page_number - 1) * page_size:page_number * page_size],
+        'post_count': len(posts),
+        'page_number': page_number,
+        'page_count': page_count,
+        'title': title if page_number == 1 else f'{title} (Page {page_number})',
+        'heading': heading,
+        'subtitle': subtitle
+    }
+
+def plan_listing_pages(context, page_size=DEFAULT_PAGE_SIZE):
+    """Return a spec for every page of the main and per-tag post listings
     
-    # Load the template
-    template = generate_blog_index_template()
+    Every listing is sliced straight from the post list or the inverted tag
+    index, so planning and rendering a listing is O(its posts).
+    """
+    specs = []
+    for tag in [None, *context['categories']]:
+        post_count = len(context['posts'] if tag is None else context['tag_posts'][tag])
+        for page_number in range(1, max(1, -(-post_count // page_size)) + 1):
+            specs.append(listing_page_spec(context, tag, page_number, page_size))
+    return specs
+
+def replan_listing_pages(context, posts, page_size=DEFAULT_PAGE_SIZE):
+    """Return the specs of the listing pages that show one of posts"""
+    specs = {}
+    for post in posts:
+        for tag in [None, *post.metadata.get('tags', [])]:
+            position = context['positions'][post.slug] if tag is None else context['tag_posts'][tag].index(post)
+            spec = listing_page_spec(context, tag, position // page_size + 1, page_size)
+            specs[spec['path']] = spec
+    return list(specs.values())
+
+def render_post_card(post, root=''):
+    """Render the summary card of a post shown in listings"""
+    post_date = simple_format_date(post.metadata['date'])
     
-    # Generate posts HTML
-    posts_html = ''
-    for post in all_posts:
-        post_date = simple_format_date(post['metadata']['date'])
-        
-        tags_html = ''
-        if 'tags' in post['metadata'] and post['metadata']['tags']:
-            tags_html = ''.join([f'<span class="blog-tag">{tag}</span>' for tag in post['metadata']['tags']])
-        
-        post_html = f'''
+    tags_html = ''
+    if 'tags' in post.metadata and post.metadata['tags']:
+        tags_html = ''.join([f'<span class="blog-tag">{escape_html(tag)}</span>' for tag in post.metadata['tags']])
+    
+    href = root + escape_html(post.slug) + '.html'
+    return f'''
         <article class="blog-post-card">
             <h2 class="blog-post-card-title">
-                <a href="{post['slug']}.html">{post['metadata']['title']}</a>
+                <a href="{href}">{escape_html(post.metadata['title'])}</a>
             </h2>
             <div class="blog-post-meta">
                 <span class="blog-date"><i class="far fa-calendar"></i> {post_date}</span>
+                <span class="blog-reading-time"><i class="far fa-clock"></i> {post.reading_time} min read</span>
                 {f'<div class="blog-tags">{tags_html}</div>' if tags_html else ''}
             </div>
-            <p class="blog-post-excerpt">{post['metadata']['description']}</p>
-            <a href="{post['slug']}.html" class="read-more-link">Read More <i class="fas fa-arrow-right"></i></a>
+            <p class="blog-post-excerpt">{escape_html(post.metadata['description'])}</p>
+            <a href="{href}" class="read-more-link">Read More <i class="fas fa-arrow-right"></i></a>
         </article>'''
-        posts_html += post_html
+
+def render_pagination(spec, root):
+    """Render the newer/older links between pages of one listing"""
+    if spec['page_count'] == 1:
+        return ''
+    
+    links = []
+    if spec['page_number'] > 1:
+        href = root + listing_page_path(spec['base'], spec['page_number'] - 1)
+        links.append(f'<a href="{href}" class="pagination-link pagination-prev">'
+                     f'<i class="fas fa-arrow-left"></i> Newer posts</a>')
+    links.append(f'<span class="pagination-status">Page {spec["page_number"]} of {spec["page_count"]}</span>')
+    if spec['page_number'] < spec['page_count']:
+        href = root + listing_page_path(spec['base'], spec['page_number'] + 1)
+        links.append(f'<a href="{href}" class="pagination-link pagination-next">'
+                     f'Older posts <i class="fas fa-arrow-right"></i></a>')
+    return f'<nav class="pagination" aria-label="Pages">{"".join(links)}</nav>'
+
+def render_listing_page(spec, context):
+    """Render one page of a post listing planned by plan_listing_pages()"""
+    root = '../' * spec['path'].count('/')
+    return finish_page(render_template(context['index_template'], {
+        'PAGE_TITLE': spec['title'],
+        'PAGE_PATH': spec['path'],
+        'HEADING': spec['heading'],
+        'SUBTITLE': spec['subtitle'],
+        'BLOG_ROOT': root,
+        'POSTS': ''.join([render_post_card(post, root) for post in spec['posts']]),
+        'PAGINATION': render_pagination(spec, root),
+        'CATEGORIES': render_categories(context, root),
+        **_ASSETS['urls']
+    }), 'index.html')
+
+def listing_page_key(spec, context):
+    """Hash every input of one listing page, for the build manifest"""
+    return hash_text(
+        BUILDER_VERSION, context['index_template_hash'], asset_settings_key(), spec['path'], str(spec['page_count']),
+        str(spec['post_count']), spec['title'], spec['heading'], spec['subtitle'],
+        json.dumps(context['categories'], default=str),
+        *[post_fingerprint(post) for post in spec['posts']]
+    )
+
+def write_listing_page(output_dir, spec, html_content):
+    """Write a rendered listing page, creating its directory as needed"""
+    output_file = os.path.join(output_dir, spec['path'])
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    if write_output(output_file, html_content):
+        print(f"Generated listing page: {output_file}")
+
+def generate_blog_index(output_dir, all_posts, context=None, page_size=DEFAULT_PAGE_SIZE):
+    """Generate the paginated blog index and the per-tag listing pages"""
+    if context is None:
+        context = build_site_context(all_posts)
     
-    # Generate categories HTML
-    categories_html = ''
-    if all_categories:
-        categories_html = ''.join([f'<a href="#" class="category-link">{cat}</a>' for cat in all_categories])
+    for spec in plan_listing_pages(context, page_size):
+        write_listing_page(output_dir, spec, render_listing_page(spec, context))
+
+# Static JSON API under blog/api/, written in the same passes as the post
+# and listing pages: post/<slug>.json per post, and posts/page-N.json and
+# tags/<slug>/page-N.json holding the same pages as the HTML listings.
+# Files are compact and their bytes depend only on their content, and
+# index.json lists the content hash of every listing page, so clients can
+# tell which pages changed without fetching them.
+API_DIR = 'api'
+API_VERSION = 1
+# Hex digits of the content hashes in the API
+API_HASH_LENGTH = 16
+
+def api_post_path(slug):
+    """Return the path, relative to blog/, of a post's file in the API"""
+    return f'{API_DIR}/post/{slug}.json'
+
+def api_listing_path(base, page_number):
+    """Return the path, relative to blog/, of one page of a listing in the API"""
+    if base == 'index':
+        return f'{API_DIR}/posts/page-{page_number}.json'
+    return f'{API_DIR}/{base}/page-{page_number}.json'
+
+def dump_api_json(value):
+    """Serialize an API document compactly and deterministically"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str)
+
+def api_hash(document):
+    """Return the content hash of an API document, usable as its ETag"""
+    return hash_text(document)[:API_HASH_LENGTH]
+
+def api_date(value):
+    """Return a frontmatter date as YYYY-MM-DD, or as given if it is not a date"""
+    date = parse_date(value)
+    return date.strftime('%Y-%m-%d') if date is not None else str(value)
+
+def api_post_fields(post):
+    """Return the metadata of a post that the API publishes"""
+    metadata = post.metadata
+    return {
+        'slug': post.slug,
+        'url': f'/blog/{post.slug}.html',
+        'title': metadata['title'],
+        'date': api_date(metadata['date']),
+        'tags': metadata.get('tags', []),
+        'excerpt': metadata['description'],
+        'reading_time': post.reading_time,
+        'word_count': post.word_count
+    }
+
+def render_api_post(post):
+    """Render a post's file in the API"""
+    return dump_api_json(api_post_fields(post))
+
+def api_listing_entry(document, content_hash):
+    """Return a post's entry in API listings from its file's document and hash
     
-    # Replace placeholders
-    html_content = template
-    html_content = html_content.replace('<!-- POSTS_PLACEHOLDER -->', posts_html)
-    html_content = html_content.replace('<!-- CATEGORIES_PLACEHOLDER -->', categories_html)
+    The entry is the post's own fields plus the content hash of its file, so
+    a client holding that file can tell whether it is still current. It is
+    spliced from the document rather than serialized again, since a post
+    appears on several listings.
+    """
+    return f'{document[:-1]},"hash":"{content_hash}"}}'
+
+def render_api_listing(spec, entries):
+    """Render one page of a listing in the API from the api_listing_entry() of its posts"""
+    base, page_number = spec['base'], spec['page_number']
+    header = dump_api_json({
+        'tag': spec['tag'],
+        'page': page_number,
+        'pages': spec['page_count'],
+        'total': spec['post_count'],
+        'prev': posixpath.basename(api_listing_path(base, page_number - 1)) if page_number > 1 else None,
+        'next': posixpath.basename(api_listing_path(base, page_number + 1))
+                if page_number < spec['page_count'] else None
+    })
+    return header[:-1] + ',"posts":[' + ','.join(entries[post.slug] for post in spec['posts']) + ']}'
+
+def render_api_index(context, page_size, page_hashes):
+    """Render index.json: the listings of the API and the content hash of each page
     
-    # Write the output file
-    output_file = os.path.join(output_dir, 'index.html')
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    page_hashes maps each listing's base ('index' or 'tags/<slug>') to the
+    hashes of its pages in order.
+    """
+    return dump_api_json({
+        'version': API_VERSION,
+        'page_size': page_size,
+        'posts': {'total': len(context['posts']), 'pages': page_hashes['index']},
+        'tags': [{
+            'name': tag,
+            'slug': context['tag_slugs'][tag],
+            'total': len(context['tag_posts'][tag]),
+            'pages': page_hashes[f"tags/{context['tag_slugs'][tag]}"]
+        } for tag in context['categories']]
+    })
+
+def write_api_file(output_dir, path, document):
+    """Write one file of the API, creating its directory as needed"""
+    output_file = os.path.join(output_dir, path)
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    return write_output(output_file, document)
+
+SITEMAP_MAX_URLS = 50000
+RSS_ITEM_COUNT = 10
+
+# Main site pages listed in the sitemap: (path, changefreq, priority)
+SITEMAP_STATIC_PAGES = [
+    ('index.html', 'daily', '1.0'),
+    ('privacy.html', 'yearly', '0.5'),
+    ('terms.html', 'yearly', '0.5'),
+    ('resources.html', 'weekly', '0.7')
+]
+
+def parse_date(value):
+    """Return value as a datetime, or None if it is not a recognizable date"""
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            return datetime.strptime(value[:19], '%Y-%m-%dT%H:%M:%S')
+        except ValueError:
+            return None
+
+def post_lastmod(post):
+    """Return the YYYY-MM-DD date a post's page last changed
     
-    print(f"Generated blog index: {output_file}")
+    The latest of its publication date, an 'updated' or 'lastmod' frontmatter
+    value, and the day the build manifest first saw its current source.
+    """
+    metadata = post.metadata
+    candidates = [parse_date(metadata['date']), parse_date(metadata.get('updated')),
+                  parse_date(metadata.get('lastmod')), parse_date(post.modified)]
+    return max(date.strftime('%Y-%m-%d') for date in candidates if date is not None)
 
-def generate_sitemap(posts, base_url="https://tselven.com"):
-    """Generate sitemap.xml for blog posts and main site pages"""
-    sitemap_content = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    sitemap_content += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+def track_static_pages(manifest, site_dir='.'):
+    """Return {path: {'hash', 'modified'}} for the SITEMAP_STATIC_PAGES
     
-    # Add main site pages
-    sitemap_content += f'  <url>\n    <loc>{base_url}/index.html</loc>\n    <lastmod>{datetime.now().strftime("%Y-%m-%d")}</lastmod>\n    <changefreq>daily</changefreq>\n    <priority>1.0</priority>\n  </url>\n'
+    A page keeps the modification date recorded in the manifest while its
+    content hash is unchanged; new or changed pages take their file's mtime.
+    """
+    previous = manifest.get('static', {})
+    tracked = {}
+    for path, _, _ in SITEMAP_STATIC_PAGES:
+        file_path = os.path.join(site_dir, path)
+        try:
+            with open(file_path, 'rb') as f:
+                content_hash = hashlib.sha256(f.read()).hexdigest()
+            mtime = datetime.fromtimestamp(os.stat(file_path).st_mtime)
+        except OSError:
+            continue
+        entry = previous.get(path, {})
+        if entry.get('hash') == content_hash and entry.get('modified'):
+            tracked[path] = entry
+        else:
+            tracked[path] = {'hash': content_hash, 'modified': mtime.strftime('%Y-%m-%d')}
+    return tracked
+
+def sitemap_entries(posts, static_pages=None, base_url="https://tselven.com", listing_specs=None):
+    """Yield (loc, lastmod, changefreq, priority) for every sitemap URL
     
-    sitemap_content += f'  <url>\n    <loc>{base_url}/privacy.html</loc>\n    <lastmod>{datetime.now().strftime("%Y-%m-%d")}</lastmod>\n    <changefreq>yearly</changefreq>\n    <priority>0.5</priority>\n  </url>\n'
+    listing_specs are the pages plan_listing_pages() planned for posts; each
+    listing page's lastmod is that of the newest post on it.
+    """
+    today = datetime.now().strftime('%Y-%m-%d')
+    for path, changefreq, priority in SITEMAP_STATIC_PAGES:
+        lastmod = static_pages[path]['modified'] if static_pages and path in static_pages else today
+        yield f'{base_url}/{path}', lastmod, changefreq, priority
     
-    sitemap_content += f'  <url>\n    <loc>{base_url}/terms.html</loc>\n    <lastmod>{datetime.now().strftime("%Y-%m-%d")}</lastmod>\n    <changefreq>yearly</changefreq>\n    <priority>0.5</priority>\n  </url>\n'
+    post_lastmods = {post.slug: post_lastmod(post) for post in posts}
+    yield f'{base_url}/blog/index.html', max(post_lastmods.values(), default=today), 'weekly', '0.8'
+    if listing_specs is None:
+        listing_specs = plan_listing_pages(build_site_context(posts))
+    for spec in listing_specs:
+        # The first page of the main listing is blog/index.html, listed above
+        if spec['path'] != 'index.html':
+            lastmod = max((post_lastmods[post.slug] for post in spec['posts']), default=today)
+            yield f"{base_url}/blog/{spec['path']}", lastmod, 'weekly', '0.5'
+    for post in posts:
+        yield f'{base_url}/blog/{post.slug}.html', post_lastmods[post.slug], 'monthly', '0.6'
+
+def _write_xml_element(writer, indent, name, text, attrs=None):
+    """Write <name>text</name> on its own indented line"""
+    writer.ignorableWhitespace(indent)
+    writer.startElement(name, attrs or {})
+    writer.characters(text)
+    writer.endElement(name)
+    writer.ignorableWhitespace('\n')
+
+def stream_urlset(out, entries):
+    """Stream a sitemap <urlset> for entries to a text file object"""
+    writer = XMLGenerator(out, encoding='UTF-8', short_empty_elements=True)
+    writer.startDocument()
+    writer.startElement('urlset', {'xmlns': 'http://www.sitemaps.org/schemas/sitemap/0.9'})
+    writer.ignorableWhitespace('\n')
+    for loc, lastmod, changefreq, priority in entries:
+        writer.ignorableWhitespace('  ')
+        writer.startElement('url', {})
+        writer.ignorableWhitespace('\n')
+        _write_xml_element(writer, '    ', 'loc', loc)
+        _write_xml_element(writer, '    ', 'lastmod', lastmod)
+        _write_xml_element(writer, '    ', 'changefreq', changefreq)
+        _write_xml_element(writer, '    ', 'priority', priority)
+        writer.ignorableWhitespace('  ')
+        writer.endElement('url')
+        writer.ignorableWhitespace('\n')
+    writer.endElement('urlset')
+    writer.endDocument()
+
+def write_sitemap(sitemap_path, entries, base_url="https://tselven.com", max_urls=SITEMAP_MAX_URLS):
+    """Write the sitemap, splitting it when it exceeds max_urls
     
-    sitemap_content += f'  <url>\n    <loc>{base_url}/resources.html</loc>\n    <lastmod>{datetime.now().strftime("%Y-%m-%d")}</lastmod>\n    <changefreq>weekly</changefreq>\n    <priority>0.7</priority>\n  </url>\n'
+    Up to max_urls entries go straight into sitemap_path. Beyond that, the
+    entries are written to sitemap-1.xml, sitemap-2.xml, ... next to it and
+    sitemap_path becomes a sitemap index pointing at them. Returns the list
+    of child sitemap paths (empty when no split was needed).
+    """
+    directory = os.path.dirname(sitemap_path) or '.'
+    stem, extension = os.path.splitext(os.path.basename(sitemap_path))
+    entries = iter(entries)
     
-    # Add main blog page
-    sitemap_content += f'  <url>\n    <loc>{base_url}/blog/index.html</loc>\n    <lastmod>{datetime.now().strftime("%Y-%m-%d")}</lastmod>\n    <changefreq>weekly</changefreq>\n    <priority>0.8</priority>\n  </url>\n'
+    # Look one entry past the first max_urls to see whether a split is needed
+    chunk = list(itertools.islice(entries, max_urls))
+    following = next(entries, None)
+    children = []
+    if following is not None:
+        entries = itertools.chain(chunk, [following], entries)
+        # Render one child sitemap at a time, only ever holding max_urls entries
+        while True:
+            chunk = list(itertools.islice(entries, max_urls))
+            if not chunk:
+                break
+            child_path = os.path.join(directory, f'{stem}-{len(children) + 1}{extension}')
+            buffer = io.StringIO()
+            stream_urlset(buffer, chunk)
+            write_output(child_path, buffer.getvalue())
+            children.append((child_path, max(entry[1] for entry in chunk)))
     
-    # Add each blog post
-    for post in posts:
-        lastmod = post['metadata']['date'].strftime('%Y-%m-%d')
-        sitemap_content += f'  <url>\n    <loc>{base_url}/blog/{post["slug"]}.html</loc>\n    <lastmod>{lastmod}</lastmod>\n    <changefreq>monthly</changefreq>\n    <priority>0.6</priority>\n  </url>\n'
+    # Drop child sitemaps left over from a previous, larger build
+    index = len(children) + 1
+    while os.path.exists(os.path.join(directory, f'{stem}-{index}{extension}')):
+        remove_output(os.path.join(directory, f'{stem}-{index}{extension}'))
+        index += 1
     
-    sitemap_content += '</urlset>'
+    buffer = io.StringIO()
+    if not children:
+        stream_urlset(buffer, chunk)
+        write_output(sitemap_path, buffer.getvalue())
+        return []
     
-    return sitemap_content
+    writer = XMLGenerator(buffer, encoding='UTF-8', short_empty_elements=True)
+    writer.startDocument()
+    writer.startElement('sitemapindex', {'xmlns': 'http://www.sitemaps.org/schemas/sitemap/0.9'})
+    writer.ignorableWhitespace('\n')
+    for child_path, lastmod in children:
+        writer.ignorableWhitespace('  ')
+        writer.startElement('sitemap', {})
+        writer.ignorableWhitespace('\n')
+        _write_xml_element(writer, '    ', 'loc', f'{base_url}/{os.path.basename(child_path)}')
+        _write_xml_element(writer, '    ', 'lastmod', lastmod)
+        writer.ignorableWhitespace('  ')
+        writer.endElement('sitemap')
+        writer.ignorableWhitespace('\n')
+    writer.endElement('sitemapindex')
+    writer.endDocument()
+    write_output(sitemap_path, buffer.getvalue())
+    return [child_path for child_path, _ in children]
 
-def generate_rss_feed(posts, base_url="https://tselven.com"):
-    """Generate RSS feed for blog posts"""
-    rss_content = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    rss_content += '<rss version="2.0">\n'
-    rss_content += '  <channel>\n'
-    rss_content += '    <title>Thamilselven - Blog</title>\n'
-    rss_content += '    <description>Latest articles and insights from Thamilselven\'s software engineering journey</description>\n'
-    rss_content += f'    <link>{base_url}/blog/</link>\n'
-    rss_content += f'    <pubDate>{datetime.now().strftime("%a, %d %b %Y %H:%M:%S %z")}</pubDate>\n'
-    rss_content += f'    <lastBuildDate>{datetime.now().strftime("%a, %d %b %Y %H:%M:%S %z")}</lastBuildDate>\n'
-    rss_content += '    <language>en-US</language>\n'
-    
-    # Add each blog post
-    for post in posts[:10]:  # Limit to 10 most recent posts
-        pub_date = post['metadata']['date'].strftime("%a, %d %b %Y %H:%M:%S %z")
-        description = post['metadata']['description']
-        link = f"{base_url}/blog/{post['slug']}.html"
-        
-        rss_content += '    <item>\n'
-        rss_content += f'      <title><![CDATA[{post["metadata"]["title"]}]]></title>\n'
-        rss_content += f'      <description><![CDATA[{description}]]></description>\n'
-        rss_content += f'      <link>{link}</link>\n'
-        rss_content += f'      <guid isPermaLink="true">{link}</guid>\n'
-        rss_content += f'      <pubDate>{pub_date}</pubDate>\n'
-        rss_content += '    </item>\n'
+def sitemap_files(sitemap_path):
+    """Return sitemap_path followed by the child sitemaps currently next to it"""
+    directory = os.path.dirname(sitemap_path) or '.'
+    stem, extension = os.path.splitext(os.path.basename(sitemap_path))
+    files = [sitemap_path]
+    while os.path.exists(os.path.join(directory, f'{stem}-{len(files)}{extension}')):
+        files.append(os.path.join(directory, f'{stem}-{len(files)}{extension}'))
+    return files
+
+def generate_sitemap(posts, base_url="https://tselven.com", listing_specs=None):
+    """Generate sitemap.xml for blog posts, listings and main site pages as one string"""
+    out = io.StringIO()
+    stream_urlset(out, sitemap_entries(posts, base_url=base_url, listing_specs=listing_specs))
+    return out.getvalue()
+
+def format_rfc822_date(date_obj):
+    """Format a datetime for RSS; naive datetimes are taken as local time"""
+    if date_obj.tzinfo is None:
+        date_obj = date_obj.astimezone()
+    return email.utils.format_datetime(date_obj)
+
+def stream_rss_feed(out, posts, base_url="https://tselven.com", item_count=RSS_ITEM_COUNT):
+    """Stream the RSS feed of the most recent posts to a text file object"""
+    writer = XMLGenerator(out, encoding='UTF-8', short_empty_elements=True)
+    writer.startDocument()
+    writer.startElement('rss', {'version': '2.0'})
+    writer.ignorableWhitespace('\n  ')
+    writer.startElement('channel', {})
+    writer.ignorableWhitespace('\n')
+    _write_xml_element(writer, '    ', 'title', 'Thamilselven - Blog')
+    _write_xml_element(writer, '    ', 'description',
+                       "Latest articles and insights from Thamilselven's software engineering journey")
+    _write_xml_element(writer, '    ', 'link', f'{base_url}/blog/')
+    if posts:
+        _write_xml_element(writer, '    ', 'pubDate', format_rfc822_date(posts[0].metadata['date']))
+    _write_xml_element(writer, '    ', 'lastBuildDate', format_rfc822_date(datetime.now()))
+    _write_xml_element(writer, '    ', 'language', 'en-US')
     
-    rss_content += '  </channel>\n'
-    rss_content += '</rss>'
+    for post in posts[:item_count]:
+        link = f"{base_url}/blog/{post.slug}.html"
+        writer.ignorableWhitespace('    ')
+        writer.startElement('item', {})
+        writer.ignorableWhitespace('\n')
+        _write_xml_element(writer, '      ', 'title', str(post.metadata['title']))
+        _write_xml_element(writer, '      ', 'description', str(post.metadata['description']))
+        _write_xml_element(writer, '      ', 'link', link)
+        _write_xml_element(writer, '      ', 'guid', link, {'isPermaLink': 'true'})
+        _write_xml_element(writer, '      ', 'pubDate', format_rfc822_date(post.metadata['date']))
+        writer.ignorableWhitespace('    ')
+        writer.endElement('item')
+        writer.ignorableWhitespace('\n')
     
-    return rss_content
+    writer.ignorableWhitespace('  ')
+    writer.endElement('channel')
+    writer.ignorableWhitespace('\n')
+    writer.endElement('rss')
+    writer.endDocument()
+
+def write_rss_feed(rss_path, posts, base_url="https://tselven.com"):
+    """Write the RSS feed to disk if it changed"""
+    buffer = io.StringIO()
+    stream_rss_feed(buffer, posts, base_url)
+    write_output(rss_path, buffer.getvalue())
+
+def generate_rss_feed(posts, base_url="https://tselven.com"):
+    """Generate RSS feed for blog posts as one string"""
+    out = io.StringIO()
+    stream_rss_feed(out, posts, base_url)
+    return out.getvalue()
 
 def generate_robots_txt(base_url="https://tselven.com"):
     """Generate robots.txt file"""
     robots_content = f"User-agent: *\nDisallow:\n\nSitemap: {base_url}/sitemap.xml"
     return robots_content
 
-def main():
+# Client-side search: a sharded inverted index under blog/search/, read by
+# blog/search.js. index.json describes the layout; terms/N.json maps each
+# term whose FNV-1a hash falls in shard N to its posting list, flattened as
+# [id gap, weight, id gap, weight, ...] with ids in ascending order; and
+# docs/N.json lists [slug, title, date, description] for SEARCH_DOCS_PER_SHARD
+# document ids. The loader only fetches the shards a query needs.
+SEARCH_INDEX_VERSION = 1
+SEARCH_DOCS_PER_SHARD = 500
+SEARCH_SHARD_TARGET_BYTES = 32 * 1024
+SEARCH_MAX_SHARDS = 4096
+SEARCH_TOKEN_RE = re.compile(r'[^\W_]+')
+SEARCH_MARKUP_RE = re.compile(r'\]\([^)]*\)|<[^>]+>')
+# Term weights by where the term appears in the post
+SEARCH_FIELD_WEIGHTS = {'title': 5, 'tags': 3, 'description': 2, 'body': 1}
+SEARCH_STOPWORDS = frozenset(
+    'a an and are as at be but by for from has have if in into is it its of on or '
+    'so that the their then there these this to was were will with you your'.split()
+)
+
+def search_tokens(text):
+    """Split text into lowercase search terms, as search.js does for queries"""
+    return [token for token in SEARCH_TOKEN_RE.findall(text.lower())
+            if 2 <= len(token) <= 32 and token not in SEARCH_STOPWORDS]
+
+def search_term_weights(title, description, tags, md_content):
+    """Return {term: weight} for one post, weighting terms by field"""
+    weights = {}
+    fields = [
+        ('title', title), ('tags', ' '.join(tags)), ('description', description),
+        ('body', SEARCH_MARKUP_RE.sub(' ', md_content))
+    ]
+    for field, text in fields:
+        weight = SEARCH_FIELD_WEIGHTS[field]
+        for token in search_tokens(text):
+            weights[token] = weights.get(token, 0) + weight
+    return weights
+
+def _search_term_weights_task(post):
+    """Process pool entry point: search_term_weights() of one post, read back from disk"""
+    metadata = post.metadata
+    return search_term_weights(metadata['title'], metadata['description'], metadata['tags'], read_post_body(post))
+
+def search_term_shard(term, shard_count):
+    """Return the shard of a term: 32-bit FNV-1a over its code points"""
+    value = 0x811c9dc5
+    for char in term:
+        value = ((value ^ ord(char)) * 0x01000193) & 0xffffffff
+    return value % shard_count
+
+def search_index_key(posts):
+    """Hash every input of the search index"""
+    return hash_text(str(SEARCH_INDEX_VERSION), *[post.slug + '|' + post.source_hash for post in posts])
+
+def new_search_cache():
+    """Return an empty search cache"""
+    return {'version': SEARCH_INDEX_VERSION, 'ids': {}, 'next_id': 0, 'posts': {}}
+
+def load_search_cache(cache_path):
+    """Load the term weights and document ids of the previous index build"""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = None
+    if not isinstance(cache, dict) or cache.get('version') != SEARCH_INDEX_VERSION:
+        return new_search_cache()
+    return cache
+
+def save_search_cache(cache_path, cache):
+    """Write the search cache, replacing the old one atomically"""
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, separators=(',', ':'))
+    os.replace(tmp_path, cache_path)
+
+def update_search_cache(cache, posts, jobs=1):
+    """Bring the cache up to date with posts; only changed posts are tokenized
+    
+    Document ids stay fixed for as long as a post exists, so adding or
+    removing a post leaves the other document shards untouched.
+    """
+    current = {post.slug for post in posts}
+    for slug in list(cache['ids']):
+        if slug not in current:
+            del cache['ids'][slug]
+            cache['posts'].pop(slug, None)
+    
+    changed = [post for post in posts if cache['posts'].get(post.slug, [None])[0] != post.source_hash]
+    for post, weights in zip(changed, imap_in_pool(_search_term_weights_task, changed, jobs)):
+        cache['posts'][post.slug] = [post.source_hash, weights]
+    
+    for post in posts:
+        if post.slug not in cache['ids']:
+            cache['ids'][post.slug] = cache['next_id']
+            cache['next_id'] += 1
+    return len(changed)
+
+def build_search_index(cache, posts):
+    """Return {relative path: JSON text} of every file of the search index"""
+    # Posting lists, built in ascending id order so gaps are never negative
+    postings = {}
+    for post in sorted(posts, key=lambda post: cache['ids'][post.slug]):
+        doc_id = cache['ids'][post.slug]
+        for term, weight in cache['posts'][post.slug][1].items():
+            postings.setdefault(term, []).append((doc_id, weight))
+    
+    # Enough term shards to keep each one around SEARCH_SHARD_TARGET_BYTES
+    estimated_bytes = sum(len(term) + 8 * len(entries) for term, entries in postings.items())
+    shard_count = 1
+    while estimated_bytes / shard_count > SEARCH_SHARD_TARGET_BYTES and shard_count < SEARCH_MAX_SHARDS:
+        shard_count *= 2
+    
+    term_shards = [{} for _ in range(shard_count)]
+    for term in sorted(postings):
+        flat = []
+        previous_id = 0
+        for doc_id, weight in postings[term]:
+            flat += [doc_id - previous_id, weight]
+            previous_id = doc_id
+        term_shards[search_term_shard(term, shard_count)][term] = flat
+    
+    doc_shard_count = (cache['next_id'] + SEARCH_DOCS_PER_SHARD - 1) // SEARCH_DOCS_PER_SHARD
+    doc_shards = [[None] * SEARCH_DOCS_PER_SHARD for _ in range(doc_shard_count)]
+    for post in posts:
+        doc_id = cache['ids'][post.slug]
+        metadata = post.metadata
+        doc_shards[doc_id // SEARCH_DOCS_PER_SHARD][doc_id % SEARCH_DOCS_PER_SHARD] = [
+            post.slug, metadata['title'], simple_format_date(metadata['date']), metadata['description']
+        ]
+    
+    def dump(value):
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+    
+    files = {'index.json': dump({
+        'version': SEARCH_INDEX_VERSION,
+        'documents': len(posts),
+        'term_shards': shard_count,
+        'docs_per_shard': SEARCH_DOCS_PER_SHARD,
+        'stopwords': sorted(SEARCH_STOPWORDS)
+    })}
+    for shard, terms in enumerate(term_shards):
+        files[f'terms/{shard}.json'] = dump(terms)
+    for shard, docs in enumerate(doc_shards):
+        files[f'docs/{shard}.json'] = dump(docs)
+    return files
+
+def write_search_index(search_dir, files):
+    """Write the index files, removing shards a previous build left behind"""
+    for path, content in files.items():
+        os.makedirs(os.path.dirname(os.path.join(search_dir, path)), exist_ok=True)
+        write_output(os.path.join(search_dir, path), content)
+    for file_path in search_index_files(search_dir):
+        if os.path.relpath(file_path, search_dir).replace(os.sep, '/') not in files:
+            remove_output(file_path)
+
+def search_index_files(search_dir):
+    """Return the paths of the index files currently in search_dir"""
+    return sorted(str(path) for path in Path(search_dir).rglob('*.json'))
+
+# Hand-written pages with regions rendered from the site's JSON data, so
+# their content is in the HTML instead of arriving through fetch(). Each
+# region sits between <!-- prerender:NAME --> and <!-- /prerender:NAME -->
+# and is replaced on every build; the page scripts then take over from the
+# embedded data. The markup mirrors what script.js and resources.html
+# render, including which fields they insert as HTML rather than text.
+PRERENDERED_PAGES = ['index.html', 'resources.html']
+SITE_DATA_FILES = {'projects': 'projects.json', 'reviews': 'reviews.json', 'resources': 'resources.json'}
+PRERENDER_REGION_RE = re.compile(r'(<!-- prerender:([a-z-]+) -->)(.*?)(<!-- /prerender:\2 -->)', re.DOTALL)
+
+# Cards shown before the "See More" button, as in script.js
+PREVIEW_CARD_COUNT = 4
+
+def load_site_data(site_dir='.'):
+    """Return {name: parsed JSON} for the SITE_DATA_FILES that could be read"""
+    data = {}
+    for name, path in SITE_DATA_FILES.items():
+        try:
+            with open(os.path.join(site_dir, path), 'r', encoding='utf-8') as f:
+                data[name] = json.load(f)
+        except OSError:
+            continue
+        except ValueError as e:
+            print(f"Warning: could not parse {path}: {e}")
+    return data
+
+def embed_json(element_id, value):
+    """Return a <script> element carrying value as JSON for the page scripts"""
+    payload = json.dumps(value, ensure_ascii=False).replace('</', '<\\/')
+    return f'<script type="application/json" id="{element_id}">{payload}</script>'
+
+def render_see_more_button(total):
+    """Render the collapsed "See More" button shown under PREVIEW_CARD_COUNT cards"""
+    if total <= PREVIEW_CARD_COUNT:
+        return ''
+    return (f'<button class="see-more-btn"><i class="fas fa-chevron-down"></i> '
+            f'See More ({total - PREVIEW_CARD_COUNT} more)</button>')
+
+def render_project_filters(projects):
+    """Render the project category filter buttons"""
+    categories = ['all'] + list(dict.fromkeys(project['category'] for project in projects))
+    return '\n'.join(
+        f'<button class="filter-btn{" active" if index == 0 else ""}" data-filter="{escape_html(category)}">'
+        f'{escape_html(category[:1].upper() + category[1:])}</button>'
+        for index, category in enumerate(categories)
+    )
+
+def render_project_card(project):
+    """Render one project card"""
+    tags = ''.join(f'<span class="project-tag">{tag}</span>' for tag in project.get('tags', []))
+    links = ''
+    if project.get('github'):
+        links += f'<a href="{project["github"]}" class="project-link" target="_blank"><i class="fab fa-github"></i> Code</a>'
+    if project.get('demo'):
+        links += f'<a href="{project["demo"]}" class="project-link" target="_blank"><i class="fas fa-external-link-alt"></i> Demo</a>'
+    return f'''<div class="project-card">
+    <div class="project-header">
+        <div class="project-icon"><i class="{project.get('icon', '')}"></i></div>
+        <h3 class="project-title">{project.get('title', '')}</h3>
+    </div>
+    <p class="project-description">{project.get('description', '')}</p>
+    <div class="project-tags">{tags}</div>
+    <div class="project-links">{links}</div>
+</div>'''
+
+def render_testimonial_card(review):
+    """Render one testimonial card"""
+    platform_icon = 'fab fa-linkedin' if review.get('platform') == 'linkedin' else 'fab fa-google'
+    stars = '<i class="fas fa-star"></i>' * int(review.get('rating', 0))
+    return f'''<div class="testimonial-card">
+    <div class="testimonial-header">
+        <div class="testimonial-avatar">{review.get('avatar', '')}</div>
+        <div class="testimonial-info">
+            <div class="testimonial-name">{review.get('name', '')}</div>
+            <div class="testimonial-position">{review.get('position', '')}</div>
+        </div>
+        <div class="testimonial-platform"><i class="{platform_icon}"></i></div>
+    </div>
+    <div class="testimonial-rating">{stars}</div>
+    <p class="testimonial-content">"{review.get('content', '')}"</p>
+</div>'''
+
+def render_resource_card(item):
+    """Render one resource card"""
+    parts = ['<div class="resource-card">']
+    if item.get('image'):
+        parts.append(f'<div class="resource-image"><img src="{item["image"]}" alt="{item.get("title", "")}" loading="lazy"></div>')
+    parts.append(f'<h3 class="resource-title">{item.get("title", "")} </h3>')
+    if item.get('author'):
+        parts.append(f'<p class="resource-author">By: {item["author"]}</p>')
+    if item.get('creator'):
+        parts.append(f'<p class="resource-creator">Creator: {item["creator"]}</p>')
+    if item.get('note'):
+        parts.append(f'<p class="resource-note">{item["note"]}</p>')
+    badge = '<span class="affiliate-badge">AFFILIATE</span>' if item.get('affiliate') else ''
+    parts.append(f'<div class="resource-link-container"><a href="{item.get("link", "")}" class="resource-link" '
+                 f'target="_blank">Visit Resource {badge}</a></div>')
+    parts.append('</div>')
+    return '\n'.join(parts)
+
+def render_resource_sections(categories):
+    """Render every resource category with its items"""
+    sections = []
+    for category in categories:
+        if not category.get('items'):
+            continue
+        cards = '\n'.join(render_resource_card(item) for item in category['items'])
+        sections.append(f'''<section class="category-section">
+<h2 class="category-title">{escape_html(category.get('title', ''))}</h2>
+<p class="category-description">{escape_html(category.get('description', ''))}</p>
+<div class="resources-grid">
+{cards}
+</div>
+</section>''')
+    return '\n'.join(sections) or '<p>No resources match your search.</p>'
+
+def render_prerender_regions(data):
+    """Return {region name: HTML} for every region the available data can fill"""
+    regions = {}
+    projects = data.get('projects')
+    if isinstance(projects, list):
+        regions['project-filters'] = render_project_filters(projects)
+        regions['projects'] = '\n'.join(
+            [render_project_card(project) for project in projects[:PREVIEW_CARD_COUNT]] +
+            [render_see_more_button(len(projects))]
+        )
+    reviews = data.get('reviews')
+    if isinstance(reviews, list):
+        regions['testimonials'] = '\n'.join(
+            [render_testimonial_card(review) for review in reviews[:PREVIEW_CARD_COUNT]] +
+            [render_see_more_button(len(reviews))]
+        )
+    if isinstance(projects, list) and isinstance(reviews, list):
+        regions['site-data'] = embed_json('projectsData', projects) + embed_json('reviewsData', reviews)
+    resources = data.get('resources')
+    if isinstance(resources, dict):
+        categories = resources.get('categories', [])
+        regions['resource-filters'] = '\n'.join(
+            ['<button class="filter-btn active">All</button>'] +
+            [f'<button class="filter-btn">{escape_html(category.get("title", ""))}</button>' for category in categories]
+        )
+        regions['resources'] = render_resource_sections(categories)
+        regions['resources-data'] = embed_json('resourcesData', resources)
+    return regions
+
+def prerender_page(page_html, regions):
+    """Fill the prerender regions of a page; regions without data are left as they are"""
+    def fill(match):
+        content = regions.get(match.group(2))
+        if content is None:
+            return match.group(0)
+        return f'{match.group(1)}\n{content}\n{match.group(4)}'
+    return PRERENDER_REGION_RE.sub(fill, page_html)
+
+def prerender_site_pages(site_dir='.'):
+    """Return {path: HTML} of the PRERENDERED_PAGES with their regions filled"""
+    regions = render_prerender_regions(load_site_data(site_dir))
+    pages = {}
+    for path in PRERENDERED_PAGES:
+        try:
+            with open(os.path.join(site_dir, path), 'r', encoding='utf-8') as f:
+                pages[path] = prerender_page(f.read(), regions)
+        except OSError:
+            continue
+    return pages
+
+# Hand-maintained text files at the site root that are precompressed along
+# with the generated pages
+PRECOMPRESS_STATIC_FILES = [
+    'index.html', 'privacy.html', 'terms.html', 'resources.html',
+    'style.css', 'script.js', 'blog/blog.css', 'blog/search.js',
+    'projects.json', 'reviews.json', 'resources.json'
+]
+PRECOMPRESSED_EXTENSIONS = ['.gz', '.br']
+
+def compressed_variants(data):
+    """Return {extension: bytes} of data compressed as small as possible"""
+    # mtime=0 keeps the .gz bytes identical between builds
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, mode=brotli.MODE_TEXT, quality=11)
+    return variants
+
+def precompress_file(path):
+    """Write the .gz (and .br) variants of one file; return (written, unchanged)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    written = unchanged = 0
+    produced = set()
+    for extension, compressed in compressed_variants(data).items():
+        # Variants no smaller than the original are not worth serving
+        if len(compressed) < len(data):
+            produced.add(extension)
+            if write_output(path + extension, compressed):
+                written += 1
+            else:
+                unchanged += 1
+    # Drop variants this call did not write, e.g. a .br left from a build
+    # that had brotli, so the server never serves a stale one
+    for extension in PRECOMPRESSED_EXTENSIONS:
+        if extension not in produced and os.path.exists(path + extension):
+            os.remove(path + extension)
+    return written, unchanged
+
+def precompress_outputs(paths, previous, jobs=1):
+    """Precompress the files among paths that changed since they were last compressed
+    
+    previous is the 'compressed' section of the last build manifest, holding
+    an (mtime, size, brotli) signature per file. write_output() leaves the
+    mtime of unchanged files alone, so a matching signature means the
+    variants on disk are current. Returns (signatures, paths compressed).
+    """
+    signatures = {}
+    tasks = []
+    for path in paths:
+        path = os.path.normpath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        signatures[path] = [stat.st_mtime_ns, stat.st_size, brotli is not None]
+        if previous.get(path) != signatures[path]:
+            tasks.append(path)
+    # Workers count their writes in their own process, so total them here
+    stats = dict(_OUTPUT_STATS)
+    results = map_in_pool(precompress_file, tasks, jobs)
+    _OUTPUT_STATS['written'] = stats['written'] + sum(written for written, _ in results)
+    _OUTPUT_STATS['unchanged'] = stats['unchanged'] + sum(unchanged for _, unchanged in results)
+    return signatures, tasks
+
+# Link checking: every generated page is scanned for the links, assets and
+# element ids it contains, and each internal reference is resolved against
+# the files in the site and the ids of its target page.
+LINK_CHECK_SKIPPED_DIRS = {'.git', '.blog-cache', 'node_modules', '__pycache__'}
+# Attributes that reference another file, per tag
+LINK_ATTRIBUTES = {
+    'a': ['href'], 'area': ['href'], 'link': ['href'], 'img': ['src', 'srcset'], 'source': ['src', 'srcset'],
+    'script': ['src'], 'iframe': ['src'], 'embed': ['src'], 'video': ['src', 'poster'], 'audio': ['src'],
+    'track': ['src'], 'object': ['data'], 'meta': ['content']
+}
+# <meta> tags whose content is a URL
+LINK_META_PROPERTIES = {'og:image', 'og:url', 'twitter:image'}
+# Comments and script/style bodies are skipped; everything else is a tag
+LINK_CHECK_TAG_RE = re.compile(r'<!--.*?-->|<(script|style)\b([^>]*)>.*?</\1\s*>|<([a-zA-Z][\w:-]*)\b([^>]*)>',
+                               re.DOTALL | re.IGNORECASE)
+LINK_CHECK_ID_RE = re.compile(r'(?<![\w-])id\s*=', re.IGNORECASE)
+# Only the attributes the checker reads are extracted
+LINK_CHECK_ATTR_RE = re.compile(r'(?<![\w-])(href|src|srcset|poster|data|content|id|name|property)\s*=\s*'
+                                r'(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.IGNORECASE)
+LINK_CHECK_XML_URL_RE = re.compile(r'<(loc|link|guid)\b[^>]*>([^<]*)</\1>')
+
+def list_site_files(site_dir):
+    """Return the set of every file under site_dir, as '/'-separated relative paths"""
+    files = set()
+    for root, dirs, names in os.walk(site_dir):
+        dirs[:] = [name for name in dirs if name not in LINK_CHECK_SKIPPED_DIRS]
+        relative_root = os.path.relpath(root, site_dir).replace(os.sep, '/')
+        for name in names:
+            files.add(name if relative_root == '.' else f'{relative_root}/{name}')
+    return files
+
+def scan_page_links(page_html):
+    """Return (ids, [(tag, url), ...]) for the tags of one HTML page"""
+    ids = set()
+    links = []
+    for block_tag, block_attrs, tag, attrs in LINK_CHECK_TAG_RE.findall(page_html):
+        if block_tag:
+            tag, attrs = block_tag, block_attrs
+        elif not tag:
+            continue
+        tag = tag.lower()
+        # Most tags carry neither an id nor a reference; skip them cheaply
+        if tag not in LINK_ATTRIBUTES and ('id' not in attrs or not LINK_CHECK_ID_RE.search(attrs)):
+            continue
+        values = {}
+        for name, double, single, bare in LINK_CHECK_ATTR_RE.findall(attrs):
+            value = double or single or bare
+            values.setdefault(name.lower(), html.unescape(value) if '&' in value else value)
+        if values.get('id'):
+            ids.add(values['id'])
+        if tag == 'a' and values.get('name'):
+            ids.add(values['name'])
+        if tag == 'meta' and (values.get('property') or values.get('name')) not in LINK_META_PROPERTIES:
+            continue
+        for attr in LINK_ATTRIBUTES.get(tag, []):
+            value = values.get(attr, '').strip()
+            if not value:
+                continue
+            if attr == 'srcset':
+                links.extend((tag, candidate.split()[0]) for candidate in value.split(',') if candidate.strip())
+            else:
+                links.append((tag, value))
+    return ids, links
+
+def resolve_site_link(page, url, files, base_url):
+    """Resolve a link found on page to (target file, fragment), or None if not internal
+    
+    The target is None when no file matches. Like a static host, a directory
+    resolves to its index.html and an extensionless path to '<path>.html'.
+    """
+    if url == base_url or url.startswith(base_url + '/'):
+        url = url[len(base_url):] or '/'
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc:
+        return None
+    path = unquote(parts.path)
+    if not path:
+        return page, parts.fragment
+    if not path.startswith('/'):
+        path = posixpath.dirname('/' + page) + '/' + path
+    target = posixpath.normpath(path).lstrip('/')
+    candidates = [f'{target}/index.html' if target else 'index.html'] if path.endswith('/') else [
+        target, f'{target}/index.html', f'{target}.html']
+    for candidate in candidates:
+        if candidate in files:
+            return candidate, parts.fragment
+    return None, parts.fragment
+
+# Site file index shared with link check workers
+_LINK_CHECK_SITE = None
+
+def _init_link_check_worker(site_dir, files, base_url):
+    """Process pool initializer for _check_page_task()"""
+    global _LINK_CHECK_SITE
+    _LINK_CHECK_SITE = {'dir': site_dir, 'files': files, 'base_url': base_url, 'resolved': {}}
+
+def _check_page_task(page):
+    """Process pool entry point: check one page's links against the file index
+    
+    Returns (page, ids, problems, fragments), where fragments are the
+    (target page, fragment, url) links into other pages, which can only be
+    checked once every page's ids are known.
+    """
+    site = _LINK_CHECK_SITE
+    with profile_stage('check_page'):
+        with open(os.path.join(site['dir'], page), 'r', encoding='utf-8', errors='replace') as f:
+            ids, links = scan_page_links(f.read())
+        problems = []
+        fragments = []
+        directory = posixpath.dirname(page)
+        for tag, url in links:
+            # Pages share most of their links (navigation, sidebars), so
+            # resolutions are remembered per directory
+            if url[:1] in ('#', '?'):
+                resolved = resolve_site_link(page, url, site['files'], site['base_url'])
+            else:
+                key = (directory, url)
+                resolved = site['resolved'].get(key, False)
+                if resolved is False:
+                    resolved = site['resolved'][key] = resolve_site_link(page, url, site['files'], site['base_url'])
+            if resolved is None:
+                continue
+            target, fragment = resolved
+            if target is None:
+                problems.append((page, url, 'missing page' if tag in ('a', 'area') else 'missing asset'))
+            elif fragment and target == page:
+                if fragment not in ids:
+                    problems.append((page, url, 'missing anchor'))
+            elif fragment and target.endswith('.html'):
+                fragments.append((target, fragment, url))
+    return page, ids, problems, fragments
+
+def check_site_links(site_dir='.', sitemap_path=None, rss_path=None, jobs=1, base_url="https://tselven.com"):
+    """Check every HTML page in site_dir, the sitemap and the feed for broken internal links
+    
+    Returns (pages checked, [(page, url, problem), ...]).
+    """
+    files = list_site_files(site_dir)
+    # Templates are HTML too, but their links are still {{SLOTS}}
+    templates = os.path.relpath(TEMPLATES_DIR, site_dir).replace(os.sep, '/') + '/'
+    pages = sorted(path for path in files if path.endswith('.html') and not path.startswith(templates))
+    anchors = {}
+    problems = []
+    fragments = []
+    for page, ids, page_problems, page_fragments in imap_in_pool(
+            _check_page_task, pages, jobs, initializer=_init_link_check_worker,
+            initargs=(site_dir, files, base_url)):
+        anchors[page] = ids
+        problems.extend(page_problems)
+        fragments.extend((page, *fragment) for fragment in page_fragments)
+    for page, target, fragment, url in fragments:
+        if fragment not in anchors.get(target, ()):
+            problems.append((page, url, 'missing anchor'))
+    
+    # Every URL the sitemap and feed advertise must be a page of the site
+    feeds = (sitemap_files(sitemap_path) if sitemap_path else []) + ([rss_path] if rss_path else [])
+    for path in feeds:
+        if not os.path.exists(path):
+            continue
+        page = os.path.relpath(path, site_dir).replace(os.sep, '/')
+        with open(path, 'r', encoding='utf-8') as f:
+            for tag, url in LINK_CHECK_XML_URL_RE.findall(f.read()):
+                url = html.unescape(url.strip())
+                if tag != 'loc' and not url.startswith(base_url):
+                    continue
+                resolved = resolve_site_link(page, url, files, base_url)
+                if resolved is not None and resolved[0] is None:
+                    problems.append((page, url, 'missing page'))
+    return len(pages), problems
+
+def print_link_problems(page_count, problems, limit=200):
+    """Print the broken links found by check_site_links()"""
+    if not problems:
+        print(f"Checked {page_count} pages: no broken internal links")
+        return
+    print(f"Checked {page_count} pages: {len(problems)} broken internal links")
+    for page, url, problem in sorted(problems)[:limit]:
+        print(f"  {page}: {problem}: {url}")
+    if len(problems) > limit:
+        print(f"  ... and {len(problems) - limit} more")
+
+def new_build_manifest():
+    """Return an empty build manifest"""
+    return {'builder_version': BUILDER_VERSION, 'posts': {}, 'pages': {}, 'listings': {}, 'compressed': {},
+            'assets': {}, 'related': {}, 'images': {}, 'api': {}}
+
+def load_build_manifest(manifest_path):
+    """Load the build manifest written by the previous run
+    
+    A missing or unreadable manifest, or one written by another builder
+    version, yields an empty manifest so that everything is rebuilt.
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return new_build_manifest()
+    
+    if not isinstance(manifest, dict) or manifest.get('builder_version') != BUILDER_VERSION:
+        return new_build_manifest()
+    
+    manifest.setdefault('posts', {})
+    manifest.setdefault('pages', {})
+    manifest.setdefault('listings', {})
+    manifest.setdefault('compressed', {})
+    manifest.setdefault('assets', {})
+    manifest.setdefault('related', {})
+    manifest.setdefault('images', {})
+    manifest.setdefault('api', {})
+    return manifest
+
+def save_build_manifest(manifest_path, manifest):
+    """Write the build manifest, replacing the old one atomically"""
+    os.makedirs(os.path.dirname(manifest_path) or '.', exist_ok=True)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def post_manifest_entry(post, page_key, api_hash):
+    """Return what the build manifest records about a post whose page has page_key"""
+    return {
+        'source_hash': post.source_hash,
+        'page_key': page_key,
+        'api_hash': api_hash,
+        'modified': post.modified or post_lastmod(post),
+        # Lets the next build load the post without reading it
+        'stat': post.stat,
+        'word_count': post.word_count,
+        'image_refs': post.image_refs,
+        'metadata': frontmatter.dump_metadata(post.metadata)
+    }
+
+# Sharded builds: `--shard I/N` renders only the posts whose slug hashes to
+# shard I and records them in its own manifest under .blog-cache/shards/,
+# so shards can run at once in separate processes or on hosts sharing the
+# output directory; `--merge` then builds the listings, feeds and search
+# index from those records.
+SHARDS_DIR = 'shards'
+# Seconds of rendering between checkpoints of the manifest
+CHECKPOINT_INTERVAL = 5
+
+def parse_shard(value):
+    """argparse type for --shard: 'I/N' to (I, N), shards numbered from 1"""
+    match = re.fullmatch(r'\s*(\d+)\s*/\s*(\d+)\s*', value)
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise argparse.ArgumentTypeError(f"expected I/N with 1 <= I <= N, e.g. 2/8, not {value!r}")
+    return int(match.group(1)), int(match.group(2))
+
+def post_shard(slug, shard_count):
+    """Return the shard (1 to shard_count) a post belongs to, the same on every host"""
+    return int(hash_text(slug)[:8], 16) % shard_count + 1
+
+def shard_manifest_path(cache_dir, shard):
+    """Return the path of the manifest that shard (I, N) records its posts in"""
+    return os.path.join(cache_dir, SHARDS_DIR, f'{shard[0]}-of-{shard[1]}.json')
+
+def new_shard_manifest(shard):
+    """Return an empty shard manifest"""
+    return {'builder_version': BUILDER_VERSION, 'shard': list(shard), 'complete': False, 'posts': {}, 'images': {}}
+
+def load_shard_manifest(path, shard):
+    """Load the manifest an earlier (maybe interrupted) run of shard wrote, or an empty one"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return new_shard_manifest(shard)
+    if (not isinstance(manifest, dict) or manifest.get('builder_version') != BUILDER_VERSION or
+            manifest.get('shard') != list(shard)):
+        return new_shard_manifest(shard)
+    return manifest
+
+def load_finished_shards(cache_dir):
+    """Load the manifests of every shard of the last sharded build for --merge
+    
+    Exits with a message naming the shards to (re)run unless all N shards of
+    the same N have finished with this builder version. Returns (shard
+    count, merged post entries, merged image records, manifest paths).
+    """
+    shards_dir = os.path.join(cache_dir, SHARDS_DIR)
+    paths = sorted(os.path.join(shards_dir, name) for name in os.listdir(shards_dir)
+                   if name.endswith('.json')) if os.path.isdir(shards_dir) else []
+    manifests = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifests.append(json.load(f))
+        except (OSError, ValueError):
+            sys.exit(f"Cannot merge: unreadable shard manifest {path}")
+    if not manifests:
+        sys.exit(f"Cannot merge: no shard manifests in {shards_dir}; run the --shard builds first")
+    counts = {manifest['shard'][1] for manifest in manifests}
+    if len(counts) != 1:
+        sys.exit(f"Cannot merge: {shards_dir} holds shards of builds split {sorted(counts)} ways; "
+                 f"remove it and run the shards again")
+    shard_count = counts.pop()
+    finished = {manifest['shard'][0] for manifest in manifests
+                if manifest.get('complete') and manifest.get('builder_version') == BUILDER_VERSION}
+    unfinished = [f'{index}/{shard_count}' for index in range(1, shard_count + 1) if index not in finished]
+    if unfinished:
+        sys.exit(f"Cannot merge: shards {', '.join(unfinished)} have not finished; run them (again) first")
+    
+    posts = {}
+    image_records = {}
+    for manifest in manifests:
+        posts.update(manifest['posts'])
+        image_records.update(manifest['images'])
+    return shard_count, posts, image_records, paths
+
+def post_fingerprint(post):
+    """Serialize the parts of a post that other pages render (links, cards, feeds)
+    
+    Memoized on the post, since every page that shows the post asks for it.
+    """
+    if post is None:
+        return ''
+    if post.fingerprint is None:
+        post.fingerprint = json.dumps([post.slug, post.metadata, post.reading_time], sort_keys=True, default=str)
+    return post.fingerprint
+
+def post_page_shared_inputs(posts, recent_count=5, context=None):
+    """Return the key inputs every post page shares: versions, template, assets and sidebar"""
+    template_hash = context['post_template_hash'] if context else hash_text(generate_blog_html_template())
+    sidebar_hash = hash_text(
+        *[post_fingerprint(post) for post in posts[:recent_count]],
+        json.dumps(context['categories'] if context else collect_categories(posts), default=str)
+    )
+    return [MARKDOWN_CACHE_KEY, template_hash, asset_settings_key(), sidebar_hash]
+
+def compute_post_page_keys(posts, recent_count=5, context=None, indexes=None):
+    """Return {slug: key} where key hashes every input of that post's page
+    
+    A page only needs re-rendering when its key differs from the one stored
+    in the build manifest (or the render cache): its own source, the
+    templates, the builder and Markdown versions, its previous/next
+    neighbours, its related posts, the derivatives of its images, and the
+    sidebar shared by every post page (recent posts and categories). With
+    indexes, only the keys of those posts are computed.
+    """
+    shared = post_page_shared_inputs(posts, recent_count, context)
+    related = context['related'] if context else {}
+    
+    keys = {}
+    for index in range(len(posts)) if indexes is None else indexes:
+        post = posts[index]
+        previous_post = posts[index + 1] if index + 1 < len(posts) else None
+        next_post = posts[index - 1] if index > 0 else None
+        keys[post.slug] = hash_text(
+            *shared, post.source_hash, post_images_key(post),
+            post_fingerprint(post), post_fingerprint(previous_post), post_fingerprint(next_post),
+            *[post_fingerprint(posts[context['positions'][slug]]) for slug in related.get(post.slug, [])]
+        )
+    return keys
+
+def compute_site_page_keys(posts):
+    """Return the keys of the pages built from the whole post list"""
+    return {
+        'rss': hash_text(BUILDER_VERSION, *[post_fingerprint(post) for post in posts[:10]])
+    }
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Build the blog from Markdown posts.')
+    parser.add_argument('--full', action='store_true',
+                        help='ignore the build manifest and cached pages and re-render every page')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes for loading and rendering posts '
+                             '(0 = one per CPU, default: 1)')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, metavar='PATH',
+                        help='directory for the build manifest and the render cache, which can be '
+                             'restored between CI runs (default: %(default)s)')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE_MB, metavar='MB',
+                        help='evict the least recently used render cache entries beyond this size '
+                             '(default: %(default)s)')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help='posts per page of the blog index and tag listings '
+                             '(default: %(default)s)')
+    parser.add_argument('--watch', action='store_true',
+                        help='rebuild whenever posts, templates, stylesheets or data files change')
+    parser.add_argument('--serve', action='store_true',
+                        help='render into memory and serve the site with live reload '
+                             '(combine with --watch to re-render on changes)')
+    parser.add_argument('--port', type=int, default=8000,
+                        help='port for --serve (default: %(default)s)')
+    parser.add_argument('--poll-interval', type=float, default=0.05,
+                        help='seconds between checks for changed files with --watch '
+                             '(default: %(default)s)')
+    parser.add_argument('--minify', action='store_true',
+                        help='minify the generated pages and link them to minified, content-hashed '
+                             'copies of the stylesheets that can be cached forever')
+    parser.add_argument('--precompress', action='store_true',
+                        help='write gzip (and Brotli, if installed) variants of changed pages and '
+                             'static text files for the server to send as-is')
+    parser.add_argument('--critical-css', action='store_true',
+                        help='inline the style.css and blog.css rules each page uses and load the '
+                             'stylesheets without blocking rendering')
+    parser.add_argument('--images', action='store_true',
+                        help='generate resized AVIF/WebP/JPEG variants of the local images posts use and '
+                             'serve them through srcset (needs Pillow)')
+    parser.add_argument('--shard', type=parse_shard, metavar='I/N',
+                        help='build only the post pages of shard I of N (posts are assigned by slug '
+                             'hash), resuming from its checkpoint if it was interrupted')
+    parser.add_argument('--merge', action='store_true',
+                        help='after every --shard I/N build has finished, build the listings, feeds '
+                             'and search index from their records')
+    parser.add_argument('--check', action='store_true',
+                        help='after building, check every page for broken internal links and missing '
+                             'assets, and exit with status 1 if any are found')
+    parser.add_argument('--profile', action='store_true',
+                        help='report time and memory spent in each build stage and the slowest posts')
+    parser.add_argument('--profile-json', metavar='PATH',
+                        help='also write the --profile report to PATH as JSON (implies --profile)')
+    parser.add_argument('--cprofile', metavar='PATH',
+                        help='run the build under cProfile and dump its stats to PATH')
+    args = parser.parse_args(argv)
+    if args.page_size < 1:
+        parser.error('--page-size must be at least 1')
+    if args.jobs < 0:
+        parser.error('--jobs must be zero or positive')
+    if args.cache_size < 0:
+        parser.error('--cache-size must be zero or positive')
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    if args.profile_json:
+        args.profile = True
+    if (args.profile or args.cprofile) and (args.watch or args.serve):
+        parser.error('--profile and --cprofile cannot be combined with --watch or --serve')
+    if args.check and args.serve:
+        parser.error('--check cannot be combined with --serve, which does not write pages to disk')
+    if (args.shard or args.merge) and (args.watch or args.serve):
+        parser.error('--shard and --merge cannot be combined with --watch or --serve')
+    if args.shard and args.merge:
+        parser.error('--merge runs after the --shard builds, not as one of them')
+    if args.shard and (args.check or args.precompress):
+        parser.error('--check and --precompress apply to the whole site; pass them to --merge')
+    return args
+
+# Paths used by the build, relative to the repository root it runs from
+POSTS_DIR = './blog/posts'
+OUTPUT_DIR = './blog'
+SITEMAP_PATH = './sitemap.xml'
+RSS_PATH = './blog/rss.xml'
+CACHE_DIR = './.blog-cache'
+
+def build_site(args):
+    """Run one (incremental) build of the blog to disk
+    
+    With args.shard, only that shard's post pages are built; with args.merge,
+    the shards' records stand in for the post pages they rendered.
+    """
     # Define paths
-    posts_dir = './blog/posts'
-    output_dir = './blog'
-    sitemap_path = './sitemap.xml'
-    rss_path = './blog/rss.xml'
+    posts_dir = POSTS_DIR
+    output_dir = OUTPUT_DIR
+    sitemap_path = SITEMAP_PATH
+    rss_path = RSS_PATH
+    cache_dir = args.cache_dir
+    manifest_path = os.path.join(cache_dir, 'manifest.json')
+    search_cache_path = os.path.join(cache_dir, 'search.json')
     
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
+    reset_output_stats()
+    
+    # Persist highlighted code, converted Markdown and pages next to the manifest
+    configure_render_cache(cache_dir)
+    
+    # Load the manifest of the previous build to find unchanged pages; with
+    # --full it is only consulted to clean up files the last build wrote
+    previous_manifest = load_build_manifest(manifest_path)
+    manifest = new_build_manifest() if args.full else previous_manifest
+    
+    # A shard resumes from its own checkpoint; the merge takes every post
+    # page the shards rendered as built
+    shard = args.shard
+    shard_paths = []
+    if shard:
+        shard_path = shard_manifest_path(cache_dir, shard)
+        shard_manifest = new_shard_manifest(shard) if args.full else load_shard_manifest(shard_path, shard)
+        manifest['posts'] = {**manifest['posts'], **shard_manifest['posts']}
+        print(f"Building shard {shard[0]} of {shard[1]}")
+    elif args.merge:
+        shard_count, merged_posts, merged_images, shard_paths = load_finished_shards(cache_dir)
+        manifest['posts'] = {**manifest['posts'], **merged_posts}
+        previous_manifest['images'] = {**previous_manifest['images'], **merged_images}
+        print(f"Merging {shard_count} shards")
+    
+    # Minify the stylesheets under content-hashed names before any page
+    # that links to them is rendered. With --critical-css the pages depend
+    # on the stylesheets' content too, through the rules they inline
+    critical = hash_text(*stylesheet_sources()) if args.critical_css else None
+    if args.minify:
+        assets = build_fingerprinted_assets(previous_manifest['assets'])
+        configure_assets({slot: os.path.basename(path) for slot, path in assets.items()}, True, critical)
+    else:
+        assets = {}
+        remove_fingerprinted_assets(previous_manifest['assets'])
+        configure_assets({slot: os.path.basename(path) for slot, path in ASSET_SOURCES.items()}, False, critical)
     
     # Load all blog posts
     print("Loading blog posts...")
-    posts = load_blog_posts(posts_dir)
+    with profile_stage('load'):
+        posts = load_blog_posts(posts_dir, manifest, jobs=args.jobs)
     print(f"Loaded {len(posts)} blog posts")
-    
+
     if not posts:
         print("No blog posts found. Creating a sample post...")
         sample_post = """---
@@ -653,42 +2875,316 @@ Stay tuned for more content coming soon!
         with open(sample_path, 'w', encoding='utf-8') as f:
             f.write(sample_post)
         
-        posts = load_blog_posts(posts_dir)
+        posts = load_blog_posts(posts_dir, manifest, jobs=args.jobs)
     
-    # Generate blog index page
-    print("Generating blog index page...")
-    generate_blog_index(output_dir, posts)
+    # Resize the images posts use before any page that shows them is
+    # rendered, or drop the derivatives a previous --images build made
+    shard_posts = [post for post in posts if post_shard(post.slug, shard[1]) == shard[0]] if shard else posts
+    if args.images:
+        print("Generating responsive images...")
+        with profile_stage('images'):
+            image_records = build_image_derivatives(shard_posts, previous_manifest['images'], args.jobs,
+                                                    remove_unused=not shard)
+    elif shard:
+        image_records = {}
+    else:
+        image_records = {}
+        remove_image_derivatives(previous_manifest['images'])
+    configure_images(image_records)
     
-    # Generate individual blog posts
+    site_keys = compute_site_page_keys(posts)
+    previous_pages = manifest['pages']
+    
+    # Related posts are ranked from the search term weights, so the search
+    # cache is only loaded (and changed posts tokenized) when the post set
+    # differs from the last build
+    search_dir = os.path.join(output_dir, 'search')
+    site_keys['search'] = search_index_key(posts)
+    search_cache = None
+    if previous_pages.get('search') == site_keys['search'] and os.path.exists(os.path.join(search_dir, 'index.json')):
+        related = manifest['related']
+    else:
+        with profile_stage('search'):
+            search_cache = new_search_cache() if args.full else load_search_cache(search_cache_path)
+            tokenized = update_search_cache(search_cache, posts, args.jobs)
+        with profile_stage('related'):
+            related = compute_related_posts(posts, [search_cache['posts'][post.slug][1] for post in posts])
+    context = build_site_context(posts, related=related)
+    
+    # Generate individual blog posts, skipping pages whose inputs are unchanged.
+    # Each post's file in the JSON API is written in the same pass.
     print("Generating individual blog posts...")
-    for post in posts:
-        generate_blog_post(output_dir, post, posts)
+    page_keys = compute_post_page_keys(posts, context=context)
+    previous_posts = manifest['posts']
+    render_tasks = []
+    built_entries = {}
+    api_hashes = {}
+    api_entries = {}
+    cached_pages = 0
+    for index, post in enumerate(posts):
+        slug = post.slug
+        if shard and post_shard(slug, shard[1]) != shard[0]:
+            continue
+        previous = previous_posts.get(slug, {})
+        api_document = render_api_post(post)
+        api_hashes[slug] = api_hash(api_document)
+        api_entries[slug] = api_listing_entry(api_document, api_hashes[slug])
+        api_file = os.path.join(output_dir, api_post_path(slug))
+        if previous.get('api_hash') != api_hashes[slug] or not os.path.exists(api_file):
+            write_api_file(output_dir, api_post_path(slug), api_document)
+        output_file = os.path.join(output_dir, f"{slug}.html")
+        if previous.get('page_key') == page_keys[slug] and os.path.exists(output_file):
+            built_entries[slug] = post_manifest_entry(post, page_keys[slug], api_hashes[slug])
+            continue
+        # Pages with the same inputs may have been rendered by another
+        # build, e.g. an earlier CI run that left its cache behind
+        html_content = None if args.full else read_render_cache('page', page_keys[slug])
+        if html_content is None:
+            render_tasks.append((index, post))
+        else:
+            write_blog_post(output_dir, post, html_content)
+            built_entries[slug] = post_manifest_entry(post, page_keys[slug], api_hashes[slug])
+            cached_pages += 1
+    skipped = len(shard_posts) - len(render_tasks)
+    
+    # Completed pages are checkpointed to the manifest every few seconds,
+    # so an interrupted build resumes close to where it stopped
+    def save_checkpoint(complete=False):
+        if shard:
+            save_build_manifest(shard_path, {**new_shard_manifest(shard), 'complete': complete,
+                                             'posts': built_entries, 'images': image_records})
+        else:
+            save_build_manifest(manifest_path, {**previous_manifest,
+                                                'posts': {**manifest['posts'], **built_entries}})
     
-    # Generate sitemap
-    print("Generating sitemap...")
-    sitemap_content = generate_sitemap(posts)
-    with open(sitemap_path, 'w', encoding='utf-8') as f:
-        f.write(sitemap_content)
+    if shard:
+        save_checkpoint()
+    
+    # Rendering fans out to the pool; pages stream back in post order and
+    # are written from this process as they arrive, so output is identical
+    # for any --jobs value and only a few pages are held in memory at once
+    with profile_stage('render_posts'):
+        pages = imap_in_pool(_render_blog_post_task, render_tasks, args.jobs,
+                             initializer=_init_render_worker, initargs=(posts, context['related']))
+        last_checkpoint = time.perf_counter()
+        for rendered, ((index, post), html_content) in enumerate(zip(render_tasks, pages), 1):
+            write_blog_post(output_dir, post, html_content)
+            write_render_cache('page', page_keys[post.slug], html_content)
+            built_entries[post.slug] = post_manifest_entry(post, page_keys[post.slug], api_hashes[post.slug])
+            if time.perf_counter() - last_checkpoint >= CHECKPOINT_INTERVAL and rendered < len(render_tasks):
+                with profile_stage('checkpoint'):
+                    save_checkpoint()
+                last_checkpoint = time.perf_counter()
+    if skipped:
+        print(f"Skipped {skipped} unchanged blog posts ({cached_pages} of them from the render cache)"
+              if cached_pages else f"Skipped {skipped} unchanged blog posts")
+    
+    # A shard is done once its posts are; the merge builds everything else
+    if shard:
+        save_checkpoint(complete=True)
+        print(f"Shard {shard[0]} of {shard[1]} complete!")
+        print(f"- Generated {len(render_tasks)} of its {len(shard_posts)} blog posts ({skipped} unchanged)")
+        print(f"- Wrote {_OUTPUT_STATS['written']} changed files "
+              f"({_OUTPUT_STATS['unchanged']} identical files left untouched)")
+        trim_render_cache(args.cache_size)
+        print("Run the build with --merge once every shard has finished")
+        return 0
+    
+    # Generate the paginated blog index and per-tag listings, skipping
+    # pages whose posts, position and sidebar are unchanged. Their pages in
+    # the JSON API are recorded separately, under their content hash.
+    print("Generating blog index and tag pages...")
+    previous_listings = manifest['listings']
+    previous_api = manifest['api']
+    listing_keys = {}
+    api_keys = {}
+    listings_skipped = 0
+    api_page_hashes = {}
+    listing_specs = plan_listing_pages(context, args.page_size)
+    for spec in listing_specs:
+        api_path = api_listing_path(spec['base'], spec['page_number'])
+        api_document = render_api_listing(spec, api_entries)
+        api_keys[api_path] = api_hash(api_document)
+        api_page_hashes.setdefault(spec['base'], []).append(api_keys[api_path])
+        if previous_api.get(api_path) != api_keys[api_path] or \
+                not os.path.exists(os.path.join(output_dir, api_path)):
+            write_api_file(output_dir, api_path, api_document)
+        
+        key = listing_keys[spec['path']] = listing_page_key(spec, context)
+        if previous_listings.get(spec['path']) == key and os.path.exists(os.path.join(output_dir, spec['path'])):
+            listings_skipped += 1
+            continue
+        html_content = None if args.full else read_render_cache('page', key)
+        if html_content is None:
+            with profile_stage('render_listing'):
+                html_content = render_listing_page(spec, context)
+            write_render_cache('page', key, html_content)
+        with profile_stage('write_listing'):
+            write_listing_page(output_dir, spec, html_content)
+    if listings_skipped:
+        print(f"Skipped {listings_skipped} unchanged listing pages")
+    api_index_path = f'{API_DIR}/index.json'
+    api_document = render_api_index(context, args.page_size, api_page_hashes)
+    api_keys[api_index_path] = api_hash(api_document)
+    write_api_file(output_dir, api_index_path, api_document)
+    
+    # Remove listing pages and their API pages that are no longer produced.
+    # Manifests of earlier builds may list API pages among the listings.
+    for path in previous_listings:
+        stale_file = os.path.join(output_dir, path)
+        if path not in listing_keys and path not in api_keys and os.path.exists(stale_file):
+            remove_output(stale_file)
+            print(f"Removed stale listing page: {stale_file}")
+    for path in previous_api:
+        stale_file = os.path.join(output_dir, path)
+        if path not in api_keys and os.path.exists(stale_file):
+            remove_output(stale_file)
+            print(f"Removed stale API file: {stale_file}")
+    
+    # Remove pages of posts that no longer exist
+    current_slugs = {post.slug for post in posts}
+    for slug in previous_posts:
+        stale_file = os.path.join(output_dir, f"{slug}.html")
+        if slug not in current_slugs and os.path.exists(stale_file):
+            remove_output(stale_file)
+            print(f"Removed stale blog post: {stale_file}")
+        stale_file = os.path.join(output_dir, api_post_path(slug))
+        if slug not in current_slugs and os.path.exists(stale_file):
+            remove_output(stale_file)
+    
+    # Build the client-side search index from the term weights updated above
+    if search_cache is None:
+        print("Search index is up to date")
+    else:
+        print("Building search index...")
+        with profile_stage('search'):
+            write_search_index(search_dir, build_search_index(search_cache, posts))
+            save_search_cache(search_cache_path, search_cache)
+        print(f"Indexed {len(posts)} posts for search ({tokenized} re-tokenized)")
+    
+    # Render the JSON data files into the main site pages
+    print("Prerendering site data into the main pages...")
+    with profile_stage('prerender'):
+        for path, page_html in prerender_site_pages().items():
+            if write_output(path, page_html):
+                print(f"Prerendered data into {path}")
+    
+    # Generate sitemap, with per-page lastmod dates
+    static_pages = track_static_pages(manifest)
+    entries = list(sitemap_entries(posts, static_pages, listing_specs=listing_specs))
+    site_keys['sitemap'] = hash_text(BUILDER_VERSION, str(SITEMAP_MAX_URLS), *['|'.join(entry) for entry in entries])
+    if previous_pages.get('sitemap') == site_keys['sitemap'] and os.path.exists(sitemap_path):
+        print("Sitemap is up to date")
+    else:
+        print("Generating sitemap...")
+        with profile_stage('sitemap'):
+            children = write_sitemap(sitemap_path, entries)
+        if children:
+            print(f"Split sitemap into {len(children)} child sitemaps")
     
     # Generate RSS feed
-    print("Generating RSS feed...")
-    rss_content = generate_rss_feed(posts)
-    with open(rss_path, 'w', encoding='utf-8') as f:
-        f.write(rss_content)
+    if previous_pages.get('rss') == site_keys['rss'] and os.path.exists(rss_path):
+        print("RSS feed is up to date")
+    else:
+        print("Generating RSS feed...")
+        with profile_stage('rss'):
+            write_rss_feed(rss_path, posts)
     
     # Generate robots.txt
     print("Generating robots.txt...")
     robots_path = './robots.txt'
-    robots_content = generate_robots_txt()
-    with open(robots_path, 'w', encoding='utf-8') as f:
-        f.write(robots_content)
+    write_output(robots_path, generate_robots_txt())
+    
+    # Precompress changed output for the server, or drop variants that
+    # would otherwise go stale
+    compressed = {}
+    if args.precompress:
+        outputs = [os.path.join(output_dir, f"{post.slug}.html") for post in posts]
+        outputs += [os.path.join(output_dir, api_post_path(post.slug)) for post in posts]
+        outputs += [os.path.join(output_dir, path) for path in listing_keys]
+        outputs += [os.path.join(output_dir, path) for path in api_keys]
+        outputs += sitemap_files(sitemap_path) + [rss_path, robots_path] + list(assets.values())
+        outputs += search_index_files(search_dir)
+        outputs += PRECOMPRESS_STATIC_FILES
+        with profile_stage('precompress'):
+            compressed, changed = precompress_outputs(outputs, manifest['compressed'], args.jobs)
+        print(f"Precompressed {len(changed)} changed files ({len(compressed) - len(changed)} unchanged)")
+    else:
+        for path in previous_manifest['compressed']:
+            for extension in PRECOMPRESSED_EXTENSIONS:
+                if os.path.exists(path + extension):
+                    os.remove(path + extension)
+    
+    # Record what was built so the next run can skip unchanged pages
+    manifest = new_build_manifest()
+    manifest['pages'] = site_keys
+    manifest['listings'] = listing_keys
+    manifest['api'] = api_keys
+    manifest['static'] = static_pages
+    manifest['compressed'] = compressed
+    manifest['assets'] = assets
+    manifest['related'] = related
+    manifest['images'] = image_records
+    manifest['posts'] = built_entries
+    with profile_stage('manifest'):
+        save_build_manifest(manifest_path, manifest)
+    # The shards' records now live in the manifest
+    for path in shard_paths:
+        os.remove(path)
     
     print("Blog generation complete!")
-    print(f"- Generated {len(posts)} blog posts")
-    print(f"- Created blog index at {os.path.join(output_dir, 'index.html')}")
+    print(f"- Generated {len(posts) - skipped} blog posts ({skipped} unchanged)")
+    print(f"- Created blog index at {os.path.join(output_dir, 'index.html')} "
+          f"({len(listing_keys)} listing pages, {listings_skipped} unchanged)")
     print(f"- Created sitemap at {sitemap_path}")
     print(f"- Created RSS feed at {rss_path}")
     print(f"- Created robots.txt at {robots_path}")
+    print(f"- Wrote {_OUTPUT_STATS['written']} changed files ({_OUTPUT_STATS['unchanged']} identical files left untouched)")
+    trim_render_cache(args.cache_size)
+    
+    # Check the links of the whole site as it now is on disk
+    if not args.check:
+        return 0
+    print("Checking internal links...")
+    with profile_stage('check'):
+        page_count, problems = check_site_links('.', sitemap_path, rss_path, args.jobs)
+    print_link_problems(page_count, problems)
+    return len(problems)
+
+def profile_build(args):
+    """Run build_site() with --profile stage timings and/or under cProfile; return its result"""
+    if args.profile:
+        enable_profiling()
+    started = time.perf_counter()
+    if args.cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        result = profiler.runcall(build_site, args)
+        profiler.dump_stats(args.cprofile)
+        print(f"Wrote cProfile stats to {args.cprofile} (worker processes are not included)")
+    else:
+        result = build_site(args)
+    total_wall = time.perf_counter() - started
+    
+    if args.profile:
+        print_profile_report(_PROFILE, total_wall)
+        if args.profile_json:
+            write_profile_json(args.profile_json, _PROFILE, total_wall, args.jobs)
+            print(f"Wrote profile to {args.profile_json}")
+    return result
+
+def main(argv=None):
+    args = parse_args(argv)
+    
+    if args.watch or args.serve:
+        # The dev server drives this module directly rather than importing a
+        # second copy of it under the name build_blog
+        import dev_server
+        dev_server.run(sys.modules[__name__], args)
+    else:
+        broken_links = profile_build(args) if args.profile or args.cprofile else build_site(args)
+        if broken_links:
+            sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
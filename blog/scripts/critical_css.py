@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Critical CSS for the blog's generated pages
+Finds the rules of the site's stylesheets that apply to the elements a page
+contains and inlines them in a <style> block, while the stylesheets
+themselves are loaded without blocking the first paint.
+
+Matching is deliberately generous: a rule is left out only when its
+selectors certainly match nothing on the page, since an extra rule costs a
+few bytes but a missing one makes the page flash unstyled. Sibling
+combinators and structural pseudo-classes are assumed to match, rules that
+need :hover or :focus are left to the full stylesheets, and selectors this
+module cannot parse are always kept. Match results are memoized by the
+element and its ancestors, so pages from one template share the work.
+"""
+
+import html
+import re
+
+# Pseudo-classes that never apply when a page first paints
+USER_ACTION_PSEUDO_CLASSES = {'hover', 'focus', 'focus-visible', 'focus-within', 'active', 'visited', 'target'}
+# Attributes that page scripts set on load; conditions on them always match
+DYNAMIC_ATTRIBUTES = {'data-theme'}
+# At-rules whose blocks hold rules that are filtered like top-level ones
+GROUPING_AT_RULES = ('@media', '@supports', '@layer', '@container')
+
+COMMENT_RE = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.DOTALL)
+BLOCK_TOKEN_RE = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|[{};]')
+# A compound selector: brackets and parentheses are kept whole, so
+# combinator characters inside them do not split it
+COMPOUND_RE = re.compile(r'(?:\[[^\]]*\]|\((?:[^()]|\([^()]*\))*\)|[^\s>+~\[(])+')
+SIMPLE_SELECTOR_RE = re.compile(
+    r'(\*|[a-zA-Z][\w-]*)'
+    r'|#([\w-]+)'
+    r'|\.([\w-]+)'
+    r'|\[\s*([\w:-]+)\s*(?:([~|^$*]?=)\s*("[^"]*"|\'[^\']*\'|[^\]\s]+)\s*[iIsS]?\s*)?\]'
+    r'|(::?)([\w-]+)(\((?:[^()]|\([^()]*\))*\))?'
+)
+KEYFRAMES_NAME_RE = re.compile(r'animation(?:-name)?\s*:\s*([^;}]*)', re.IGNORECASE)
+# Relative url()s would resolve against the page instead of the stylesheet
+RELATIVE_URL_RE = re.compile(r'url\(\s*["\']?(?![a-z][\w+.-]*:|/|#)', re.IGNORECASE)
+
+# Elements of a page, skipping comments and the contents of scripts and styles
+PAGE_TAG_RE = re.compile(r'<!--.*?-->|<(script|style)\b[^>]*>.*?</\1\s*>'
+                         r'|<(/?)([a-zA-Z][\w:-]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>',
+                         re.DOTALL | re.IGNORECASE)
+ATTR_RE = re.compile(r'([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track',
+                 'wbr'}
+
+STYLESHEET_LINK_RE = re.compile(r'<link\b[^>]*>', re.IGNORECASE)
+STYLESHEET_REL_RE = re.compile(r'\brel\s*=\s*(["\']?)stylesheet\1(?=[\s/>])', re.IGNORECASE)
+
+def strip_comments(css):
+    """Remove comments from a stylesheet, leaving strings alone"""
+    return COMMENT_RE.sub(lambda match: match.group(1) or ' ', css)
+
+def split_blocks(css):
+    """Split CSS into its top-level statements as (prelude, body) pairs
+
+    body is None for statements without a block, like @import.
+    """
+    blocks = []
+    start = depth = body_start = 0
+    prelude = ''
+    for match in BLOCK_TOKEN_RE.finditer(css):
+        token = match.group()
+        if token == '{':
+            if depth == 0:
+                prelude, body_start = css[start:match.start()].strip(), match.end()
+            depth += 1
+        elif token == '}':
+            if depth == 0:
+                # A stray brace; skip past it
+                start = match.end()
+                continue
+            depth -= 1
+            if depth == 0:
+                blocks.append((prelude, css[body_start:match.start()]))
+                start = match.end()
+        elif token == ';' and depth == 0:
+            if css[start:match.start()].strip():
+                blocks.append((css[start:match.start()].strip(), None))
+            start = match.end()
+    return blocks
+
+def parse_compound(text):
+    """Parse one compound selector, or return None if it uses syntax we do not know"""
+    compound = {'tag': None, 'id': None, 'classes': [], 'attrs': [], 'root': False, 'never': False}
+    position = 0
+    while position < len(text):
+        match = SIMPLE_SELECTOR_RE.match(text, position)
+        if not match:
+            return None
+        tag, element_id, class_name, attr, operator, value, colons, pseudo, _ = match.groups()
+        if tag:
+            compound['tag'] = None if tag == '*' else tag.lower()
+        elif element_id:
+            compound['id'] = element_id
+        elif class_name:
+            compound['classes'].append(class_name)
+        elif attr:
+            attr = attr.lower()
+            if attr not in DYNAMIC_ATTRIBUTES:
+                compound['attrs'].append((attr, operator, value.strip('"\'') if value is not None else None))
+        elif colons == ':' and pseudo.lower() in USER_ACTION_PSEUDO_CLASSES:
+            compound['never'] = True
+        elif colons == ':' and pseudo.lower() == 'root':
+            compound['root'] = True
+        # Other pseudo-classes and pseudo-elements are assumed to match
+        position = match.end()
+    return compound
+
+def parse_selector(text):
+    """Parse a complex selector into [compound, (combinator, compound), ...], rightmost first
+
+    Returns None if any part of it cannot be parsed.
+    """
+    steps = []
+    previous_end = None
+    for match in COMPOUND_RE.finditer(text):
+        compound = parse_compound(match.group())
+        if compound is None:
+            return None
+        if previous_end is None:
+            steps.append(compound)
+        else:
+            combinator = text[previous_end:match.start()].strip() or ' '
+            if combinator not in (' ', '>', '+', '~'):
+                return None
+            steps.append((combinator, compound))
+        previous_end = match.end()
+    if not steps or text[previous_end:].strip():
+        return None
+    # Reverse into rightmost-first order, keeping each combinator with the
+    # compound to its left
+    compounds = [steps[0]] + [compound for _, compound in steps[1:]]
+    combinators = [combinator for combinator, _ in steps[1:]]
+    result = [compounds[-1]]
+    for index in range(len(compounds) - 2, -1, -1):
+        result.append((combinators[index], compounds[index]))
+    return result
+
+def split_selector_list(prelude):
+    """Split a selector list at its top-level commas"""
+    selectors, depth, start = [], 0, 0
+    for index, char in enumerate(prelude):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(prelude[start:index].strip())
+            start = index + 1
+    selectors.append(prelude[start:].strip())
+    return selectors
+
+def new_matcher(stylesheets):
+    """Parse stylesheets (CSS texts, in the order pages link them) into a matcher
+
+    The matcher holds the rules and indexes their selectors by the id,
+    class or tag of their rightmost compound, so each element is only tested
+    against selectors that can apply to it. It also memoizes the results
+    for every element signature it has seen; keep one per page template.
+    """
+    matcher = {
+        'items': [],         # ('rule', [selector ids], text) / ('group', prelude, items) / ...
+        'selectors': [],     # selector id -> parsed selector, or None to always match
+        'by_id': {}, 'by_class': {}, 'by_tag': {}, 'universal': [],
+        'attrs': set(),      # attribute names any selector tests
+        'always': set(),     # selector ids that match whatever the page holds
+        'signatures': {},    # (tag, attribute key, parent signature) -> signature
+        'elements': [],      # signature -> (tag, id, classes, attributes, parent signature)
+        'matches': [],       # signature -> selector ids it matches
+        'texts': {}          # used selector ids -> critical CSS
+    }
+    for css in stylesheets:
+        matcher['items'] += _parse_items(matcher, split_blocks(strip_comments(css)))
+    return matcher
+
+def _parse_items(matcher, blocks):
+    items = []
+    for prelude, body in blocks:
+        if body is None:
+            # @import and @charset cannot be inlined; the full stylesheet has them
+            continue
+        lowered = prelude.lower()
+        if lowered.startswith(GROUPING_AT_RULES):
+            items.append(('group', prelude, _parse_items(matcher, split_blocks(body))))
+        elif re.match(r'@(?:-[a-z]+-)?keyframes\b', lowered):
+            items.append(('keyframes', prelude.split()[-1], f'{prelude} {{\n    {body.strip()}\n}}'))
+        elif prelude.startswith('@'):
+            items.append(('other', None, f'{prelude} {{\n    {body.strip()}\n}}'))
+        elif RELATIVE_URL_RE.search(body):
+            continue
+        else:
+            selector_ids = [_add_selector(matcher, text) for text in split_selector_list(prelude)]
+            items.append(('rule', selector_ids, f'{prelude} {{\n    {body.strip()}\n}}'))
+    return items
+
+def _add_selector(matcher, text):
+    """Index one selector of a rule; return its id"""
+    selector_id = len(matcher['selectors'])
+    selector = parse_selector(text)
+    matcher['selectors'].append(selector)
+    if selector is None:
+        matcher['always'].add(selector_id)
+        return selector_id
+    if selector[0]['never']:
+        return selector_id
+    for step in selector:
+        compound = step if isinstance(step, dict) else step[1]
+        matcher['attrs'].update(name for name, _, _ in compound['attrs'])
+    rightmost = selector[0]
+    if rightmost['id']:
+        matcher['by_id'].setdefault(rightmost['id'], []).append(selector_id)
+    elif rightmost['classes']:
+        matcher['by_class'].setdefault(rightmost['classes'][0], []).append(selector_id)
+    elif rightmost['tag'] or rightmost['root']:
+        matcher['by_tag'].setdefault(rightmost['tag'] or 'html', []).append(selector_id)
+    else:
+        matcher['universal'].append(selector_id)
+    return selector_id
+
+def _compound_matches(compound, element):
+    tag, element_id, classes, attributes, _ = element
+    if compound['never'] or (compound['root'] and tag != 'html'):
+        return False
+    if compound['tag'] and compound['tag'] != tag:
+        return False
+    if compound['id'] and compound['id'] != element_id:
+        return False
+    for class_name in compound['classes']:
+        if class_name not in classes:
+            return False
+    for name, operator, expected in compound['attrs']:
+        value = attributes.get(name)
+        if value is None:
+            return False
+        if operator is None:
+            continue
+        if not ((operator == '=' and value == expected)
+                or (operator == '~=' and expected in value.split())
+                or (operator == '|=' and (value == expected or value.startswith(expected + '-')))
+                or (operator == '^=' and expected and value.startswith(expected))
+                or (operator == '$=' and expected and value.endswith(expected))
+                or (operator == '*=' and expected and expected in value)):
+            return False
+    return True
+
+def _selector_matches(matcher, selector, position, signature):
+    """Match selector[position + 1:] against the context of the element at signature"""
+    if position == len(selector) - 1:
+        return True
+    elements = matcher['elements']
+    combinator, compound = selector[position + 1]
+    if combinator in ('+', '~'):
+        # Siblings are not tracked: assume one matches, and go on from here
+        # since a sibling shares this element's ancestors
+        return _selector_matches(matcher, selector, position + 1, signature)
+    ancestor = elements[signature][4]
+    while ancestor is not None:
+        if _compound_matches(compound, elements[ancestor]) and \
+                _selector_matches(matcher, selector, position + 1, ancestor):
+            return True
+        if combinator == '>':
+            return False
+        ancestor = elements[ancestor][4]
+    return False
+
+def _element_signature(matcher, tag, attr_text, parent):
+    """Return the signature of an element, matching it against the selectors if it is new"""
+    key = (tag, attr_text, parent)
+    signature = matcher['signatures'].get(key)
+    if signature is not None:
+        return signature
+
+    attributes = {}
+    for name, double, single, bare in ATTR_RE.findall(attr_text):
+        attributes.setdefault(name.lower(), html.unescape(double or single or bare))
+    classes = frozenset(attributes.get('class', '').split())
+    element = (tag, attributes.get('id'), classes,
+               {name: value for name, value in attributes.items() if name in matcher['attrs']}, parent)
+    signature = len(matcher['elements'])
+    matcher['signatures'][key] = signature
+    matcher['elements'].append(element)
+
+    candidates = matcher['universal'] + matcher['by_tag'].get(tag, []) + matcher['by_id'].get(element[1], [])
+    for class_name in classes:
+        candidates += matcher['by_class'].get(class_name, [])
+    matcher['matches'].append([
+        selector_id for selector_id in candidates
+        if _compound_matches(matcher['selectors'][selector_id][0], element)
+        and _selector_matches(matcher, matcher['selectors'][selector_id], 0, signature)
+    ])
+    return signature
+
+def used_selectors(matcher, page_html):
+    """Return the ids of the selectors that match an element of page_html"""
+    used = set(matcher['always'])
+    stack = []
+    for match in PAGE_TAG_RE.finditer(page_html):
+        tag = match.group(3)
+        if tag is None:
+            continue
+        tag = tag.lower()
+        if match.group(2):
+            # Close the element, and any left open inside it
+            for index in range(len(stack) - 1, -1, -1):
+                if stack[index][0] == tag:
+                    del stack[index:]
+                    break
+            continue
+        signature = _element_signature(matcher, tag, match.group(4), stack[-1][1] if stack else None)
+        used.update(matcher['matches'][signature])
+        if tag not in VOID_ELEMENTS and not match.group(4).rstrip().endswith('/'):
+            stack.append((tag, signature))
+    return used
+
+def _critical_items(items, used, keyframes):
+    """Return the CSS texts of the items with a used selector, noting the animations they run"""
+    texts = []
+    for kind, value, content in items:
+        if kind == 'rule' and used.intersection(value):
+            texts.append(content)
+            for names in KEYFRAMES_NAME_RE.findall(content):
+                keyframes.update(names.replace(',', ' ').split())
+        elif kind == 'group':
+            inner = _critical_items(content, used, keyframes)
+            if inner:
+                texts.append(f'{value} {{\n{"".join(inner)}\n}}')
+        elif kind == 'other':
+            texts.append(content)
+    return texts
+
+def _keyframes(items, names):
+    texts = []
+    for kind, value, content in items:
+        if kind == 'keyframes' and value in names:
+            texts.append(content)
+        elif kind == 'group':
+            inner = _keyframes(content, names)
+            if inner:
+                texts.append(f'{value} {{\n{"".join(inner)}\n}}')
+    return texts
+
+def critical_css(matcher, page_html):
+    """Return the rules of the matcher's stylesheets that apply to page_html, in their original order"""
+    used = frozenset(used_selectors(matcher, page_html))
+    text = matcher['texts'].get(used)
+    if text is None:
+        keyframes = set()
+        texts = _critical_items(matcher['items'], used, keyframes)
+        text = matcher['texts'][used] = '\n'.join(texts + _keyframes(matcher['items'], keyframes))
+    return text
+
+def defer_stylesheets(page_html):
+    """Turn the page's stylesheet links into ones that load without blocking rendering
+
+    Each link is preloaded and applied once it arrives, with a <noscript>
+    copy of the original for browsers without JavaScript.
+    """
+    def defer(match):
+        link = match.group()
+        if not STYLESHEET_REL_RE.search(link):
+            return link
+        preload = STYLESHEET_REL_RE.sub('rel="preload" as="style"', link, count=1)
+        preload = preload[:-1].rstrip('/ ') + ' onload="this.onload=null;this.rel=\'stylesheet\'">'
+        return f'{preload}<noscript>{link}</noscript>'
+
+    head_end = page_html.find('</head>')
+    if head_end == -1:
+        return page_html
+    return STYLESHEET_LINK_RE.sub(defer, page_html[:head_end]) + page_html[head_end:]
+
+def inline_critical_css(page_html, matcher):
+    """Inline the page's critical CSS ahead of its stylesheets, and defer the stylesheets"""
+    first_link = next((match for match in STYLESHEET_LINK_RE.finditer(page_html)
+                       if STYLESHEET_REL_RE.search(match.group())), None)
+    head_end = page_html.find('</head>')
+    if first_link is None or head_end == -1 or first_link.start() > head_end:
+        return page_html
+    style = f'<style>\n{critical_css(matcher, page_html)}\n</style>\n    '
+    return defer_stylesheets(page_html[:first_link.start()] + style + page_html[first_link.start():])
@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+"""
+Blog Development Server
+Re-renders the pages affected by each source change into memory and serves
+them, with live reload, without touching the generated files on disk.
+Started through `build_blog.py --serve [--watch]` or `build_blog.py --watch`.
+"""
+
+import os
+import mimetypes
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+LIVE_RELOAD_PATH = '/__livereload'
+LIVE_RELOAD_SCRIPT = (b"<script>new EventSource('" + LIVE_RELOAD_PATH.encode() +
+                      b"').onmessage = function () { location.reload(); };</script>\n")
+
+# Files outside the posts and templates directories that trigger a rebuild
+WATCHED_FILES = ['style.css', 'blog/blog.css', 'projects.json', 'reviews.json', 'resources.json',
+                 'index.html', 'resources.html']
+
+def _scan_tree(directory, snapshot):
+    """Add {path: (mtime_ns, size)} for every file under directory"""
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_dir():
+            _scan_tree(entry.path, snapshot)
+        elif entry.is_file():
+            stat = entry.stat()
+            snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+
+def scan_sources(builder):
+    """Return {path: (mtime_ns, size)} for every file the site is built from"""
+    snapshot = {}
+    _scan_tree(builder.POSTS_DIR, snapshot)
+    _scan_tree(str(builder.TEMPLATES_DIR), snapshot)
+    for path in WATCHED_FILES:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+def diff_sources(builder, old, new):
+    """Split the differences between two snapshots by what they affect
+
+    Returns (changed_posts, removed_posts, templates_changed, assets_changed).
+    """
+    changed = {path for path in new if old.get(path) != new[path]}
+    removed = set(old) - set(new)
+    templates_dir = str(builder.TEMPLATES_DIR)
+
+    def is_post(path):
+        return path.endswith('.md') and path.startswith(builder.POSTS_DIR)
+
+    changed_posts = {path for path in changed if is_post(path)}
+    removed_posts = {path for path in removed if is_post(path)}
+    templates_changed = any(path.startswith(templates_dir) for path in changed | removed)
+    assets_changed = any(path in WATCHED_FILES for path in changed | removed)
+    return changed_posts, removed_posts, templates_changed, assets_changed
+
+def reload_templates(builder):
+    """Forget the template files cached by the builder"""
+    builder.load_template_text.cache_clear()
+    builder.load_template.cache_clear()
+
+def create_memory_site(page_size):
+    """Return the state of an in-memory build"""
+    return {
+        'posts': {},       # source path -> post
+        'order': [],       # source paths in load_blog_posts() order
+        'pages': {},       # URL path -> rendered bytes
+        'keys': {},        # URL path -> key of the inputs it was rendered from
+        'term_weights': {},  # slug -> (source hash, search term weights)
+        'related': None,   # build_blog.new_related_index() state
+        'search': {'ids': {}, 'next_id': 0, 'posts': {}},  # search cache, as in build_blog
+        'search_pending': None,  # (posts, term weights) to index on the next search request
+        'search_urls': set(),
+        'search_lock': threading.Lock(),
+        'slugs': [],       # slugs in the order of the last render
+        'rendered_posts': {},  # slug -> post, as of the last render
+        'api_entries': {},  # slug -> entry in the JSON API listings
+        # Page keys by the inputs they were computed from; posts are replaced
+        # when they are reloaded, so unchanged inputs are the same objects
+        'post_keys': {},   # slug -> ((post, previous, next, related slugs), key)
+        'post_keys_shared': None,  # post_page_shared_inputs() the post keys were computed with
+        'listings': {},    # listing path -> (spec, JSON API URL, its hash)
+        'listings_shared': None,  # inputs every listing page shares
+        'api_page_hashes': {},  # listing base -> hashes of its JSON API pages
+        'context': None,   # build_site_context() of the last render
+        'lastmods': {},    # slug -> post_lastmod()
+        'page_size': page_size,
+        'generation': 0,   # bumped whenever served content changes
+        'condition': threading.Condition()
+    }
+
+def render_memory_site(builder, site, previous_posts=None):
+    """Re-render the pages whose inputs changed
+
+    previous_posts maps the source paths loaded again since the last render
+    to the posts they replaced. Returns ({URL path: (key, bytes)}, URL paths
+    that no longer exist). Uses the same page keys as the build manifest, so
+    a change re-renders the edited post, its neighbours and the listings it
+    appears on. Edits that keep every post's date and tags leave the order
+    and the listings as they were, so only the keys of the pages that show
+    an edited post are computed again; after any other change, every page's
+    inputs are compared with those of its last render.
+    """
+    # Posts edited in place, by slug: the posts they replaced and the reloaded ones
+    edited, changed = None, {}
+    if site['context'] is not None and len(site['order']) == len(site['posts']):
+        edited = {}
+        for path, previous_post in (previous_posts or {}).items():
+            post = site['posts'][path]
+            if (previous_post is None or post.metadata['date'] != previous_post.metadata['date']
+                    or post.metadata.get('tags', []) != previous_post.metadata.get('tags', [])):
+                edited = None
+                break
+            if post is not previous_post:
+                edited[post.slug], changed[post.slug] = previous_post, post
+
+    if edited is not None:
+        positions = site['context']['positions']
+        posts = list(site['context']['posts'])
+        for slug, post in changed.items():
+            posts[positions[slug]] = post
+        slugs, order_changed, removed = site['slugs'], False, set()
+        site['rendered_posts'].update(changed)
+    else:
+        # Same order as load_blog_posts(): by path, then stable-sorted by
+        # date. Posts are replaced when they are reloaded, so the posts that
+        # are not the objects of the last render are the changed ones
+        if len(site['order']) != len(site['posts']):
+            site['order'] = sorted(site['posts'], key=Path)
+        posts = [site['posts'][path] for path in site['order']]
+        posts.sort(key=lambda x: x.metadata['date'], reverse=True)
+        slugs = [post.slug for post in posts]
+        order_changed = slugs != site['slugs']
+        current_posts = dict(zip(slugs, posts))
+        changed = {slug: post for slug, post in current_posts.items() if site['rendered_posts'].get(slug) is not post}
+        removed = site['rendered_posts'].keys() - current_posts.keys()
+        site['slugs'], site['rendered_posts'] = slugs, current_posts
+    stale = set()
+    for slug in removed:
+        stale.update([f"/blog/{slug}.html", f"/blog/{builder.api_post_path(slug)}"])
+
+    # Related posts, re-ranked only where an edit can change them. The term
+    # weights are copied before they change, since a queued search index
+    # rebuild may still hold them
+    term_weights = site['term_weights']
+    search_changed = order_changed
+    if changed or removed:
+        term_weights = dict(term_weights)
+        for slug in removed:
+            del term_weights[slug]
+        for slug, post in changed.items():
+            cached = term_weights.get(slug)
+            if cached is None or cached[0] != post.source_hash:
+                metadata = post.metadata
+                term_weights[slug] = (post.source_hash, builder.search_term_weights(
+                    metadata['title'], metadata['description'], metadata['tags'], post.raw_content))
+                search_changed = True
+        site['term_weights'] = term_weights
+    weights = [term_weights[slug][1] for slug in slugs]
+    if site['related'] is None:
+        site['related'] = builder.new_related_index(posts, weights)
+        related = site['related']['related']
+    else:
+        related = builder.update_related_index(site['related'], posts, weights)
+    if edited is not None:
+        context = builder.update_site_context(site['context'], posts, edited, related=related)
+    else:
+        context = builder.build_site_context(posts, related=related)
+    site['context'] = context
+    known_keys = site['keys']
+    rendered = {}
+
+    # Indexing the whole blog would slow down every edit, so the search
+    # index is only rebuilt once a search asks for it
+    if search_changed:
+        site['search_pending'] = (posts, term_weights)
+
+    # Post page keys, computed again only for the posts whose own, neighbour
+    # or related posts changed, unless an input every page shares did. Any
+    # other page was rendered with its current key already. After in-place
+    # edits, those are the edited posts, their neighbours, the posts whose
+    # related list changed and, if an edited post shows differently, the
+    # posts listing it
+    shared = builder.post_page_shared_inputs(posts, context=context)
+    if site['post_keys_shared'] != shared:
+        site['post_keys'], site['post_keys_shared'] = {}, shared
+    post_keys = site['post_keys']
+    for slug in removed:
+        post_keys.pop(slug, None)
+    if edited is not None and post_keys:
+        positions = context['positions']
+        candidates = {positions[slug] for slug in site['related']['updated']}
+        for slug in changed:
+            candidates.update(range(max(positions[slug] - 1, 0), min(positions[slug] + 2, len(posts))))
+        restyled = {slug for slug, post in changed.items()
+                    if builder.post_fingerprint(post) != builder.post_fingerprint(edited[slug])}
+        if restyled:
+            candidates.update(positions[slug] for slug, others in related.items() if not restyled.isdisjoint(others))
+    else:
+        candidates = range(len(posts))
+    dirty = {}
+    for index in candidates:
+        post = posts[index]
+        others = related.get(post.slug, [])
+        signature = (post, posts[index + 1] if index + 1 < len(posts) else None,
+                     posts[index - 1] if index else None, others)
+        cached = post_keys.get(post.slug)
+        if cached is None or cached[0] != signature or not changed.keys().isdisjoint(others):
+            dirty[index] = signature
+    computed = builder.compute_post_page_keys(posts, context=context, indexes=dirty)
+    for index, signature in dirty.items():
+        post = posts[index]
+        key = computed[post.slug]
+        post_keys[post.slug] = (signature, key)
+        url = f"/blog/{post.slug}.html"
+        if known_keys.get(url) != key:
+            builder.ensure_post_content(post)
+            html_content = builder.render_blog_post(post, posts, current_index=index, context=context)
+            rendered[url] = (key, html_content)
+
+    # The JSON API, whose files are keyed by their content hash; a post's
+    # file and listing entry only change with the post
+    api_entries = site['api_entries']
+    for slug in removed:
+        del api_entries[slug]
+    for slug, post in changed.items():
+        document = builder.render_api_post(post)
+        key = builder.api_hash(document)
+        api_entries[slug] = builder.api_listing_entry(document, key)
+        url = f"/blog/{builder.api_post_path(slug)}"
+        if known_keys.get(url) != key:
+            rendered[url] = (key, document)
+
+    # Listing pages: only those whose spec or posts changed are keyed and
+    # rendered to JSON again, unless an input every listing shares changed.
+    # In-place edits only change the pages that show an edited post
+    shared = (context['index_template_hash'], builder.asset_settings_key(), context['categories'])
+    listings = site['listings']
+    if edited is not None and site['listings_shared'] == shared:
+        listing_specs = None
+        replanned = builder.replan_listing_pages(context, changed.values(), site['page_size'])
+    else:
+        listing_specs = builder.plan_listing_pages(context, site['page_size'])
+        cached_listings = listings if site['listings_shared'] == shared else {}
+        listings = {}
+        replanned = []
+        for spec in listing_specs:
+            cached = cached_listings.get(spec['path'])
+            if cached is None or cached[0] != spec:
+                replanned.append(spec)
+            else:
+                listings[spec['path']] = cached
+    api_changed = listing_specs is not None
+    for spec in replanned:
+        document = builder.render_api_listing(spec, api_entries)
+        api_url = f"/blog/{builder.api_listing_path(spec['base'], spec['page_number'])}"
+        api_key = builder.api_hash(document)
+        cached = listings.get(spec['path'])
+        if cached is not None and cached[2] != api_key:
+            site['api_page_hashes'][spec['base']][spec['page_number'] - 1] = api_key
+            api_changed = True
+        listings[spec['path']] = (spec, api_url, api_key)
+        key = builder.listing_page_key(spec, context)
+        url = f"/blog/{spec['path']}"
+        if known_keys.get(url) != key:
+            rendered[url] = (key, builder.render_listing_page(spec, context))
+        if known_keys.get(api_url) != api_key:
+            rendered[api_url] = (api_key, document)
+    if listing_specs is not None:
+        for path in site['listings'].keys() - listings.keys():
+            stale.update([f"/blog/{path}", site['listings'][path][1]])
+        # Kept in plan order, which the sitemap lists them in
+        listings = {spec['path']: listings[spec['path']] for spec in listing_specs}
+        site['api_page_hashes'] = {}
+        for spec in listing_specs:
+            site['api_page_hashes'].setdefault(spec['base'], []).append(listings[spec['path']][2])
+    site['listings'], site['listings_shared'] = listings, shared
+    if api_changed:
+        document = builder.render_api_index(context, site['page_size'], site['api_page_hashes'])
+        key = builder.api_hash(document)
+        index_url = f"/blog/{builder.API_DIR}/index.json"
+        if known_keys.get(index_url) != key:
+            rendered[index_url] = (key, document)
+
+    feed_key = builder.compute_site_page_keys(posts)['rss']
+    if known_keys.get('/blog/rss.xml') != feed_key:
+        rendered['/blog/rss.xml'] = (feed_key, builder.generate_rss_feed(posts))
+    # The sitemap lists every post and listing page with its lastmod, which
+    # only moves with a post's lastmod, the order or the listing plan
+    lastmods = site['lastmods']
+    sitemap_changed = order_changed or listing_specs is not None or '/sitemap.xml' not in known_keys
+    for slug in removed:
+        del lastmods[slug]
+    for slug, post in changed.items():
+        lastmod = builder.post_lastmod(post)
+        if lastmods.get(slug) != lastmod:
+            lastmods[slug] = lastmod
+            sitemap_changed = True
+    if sitemap_changed:
+        specs = [cached[0] for cached in listings.values()]
+        entries = builder.sitemap_entries(posts, listing_specs=specs)
+        sitemap_key = builder.hash_text(*['|'.join(entry) for entry in entries])
+        if known_keys.get('/sitemap.xml') != sitemap_key:
+            rendered['/sitemap.xml'] = (sitemap_key, builder.generate_sitemap(posts, listing_specs=specs))
+
+    # The main pages with the site's JSON data rendered in
+    for path, page_html in builder.prerender_site_pages().items():
+        url = f'/{path}'
+        key = builder.hash_text(page_html)
+        if known_keys.get(url) != key:
+            rendered[url] = (key, page_html)
+    return rendered, stale - rendered.keys()
+
+def render_memory_search_index(builder, site):
+    """Rebuild the in-memory search index if posts changed since it was built
+
+    Uses the term weights of the last render; document ids stay fixed for as
+    long as a post exists, as in the disk build's search cache.
+    """
+    with site['search_lock']:
+        pending = site['search_pending']
+        if pending is None:
+            return
+        posts, term_weights = pending
+        search = site['search']
+        for slug in list(search['ids']):
+            if slug not in term_weights:
+                del search['ids'][slug]
+        for post in posts:
+            if post.slug not in search['ids']:
+                search['ids'][post.slug] = search['next_id']
+                search['next_id'] += 1
+        search['posts'] = term_weights
+        files = {f'/blog/search/{path}': content.encode('utf-8')
+                 for path, content in builder.build_search_index(search, posts).items()}
+
+        with site['condition']:
+            for url in site['search_urls'] - set(files):
+                site['pages'].pop(url, None)
+            site['pages'].update(files)
+            site['search_urls'] = set(files)
+            # A newer render may have queued another rebuild meanwhile
+            if site['search_pending'] is pending:
+                site['search_pending'] = None
+
+def refresh_memory_site(builder, site, changed_posts=(), removed_posts=(),
+                        templates_changed=False, assets_changed=False):
+    """Apply source changes to the in-memory site; return the pages re-rendered"""
+    previous_posts = {path: site['posts'].get(path) for path in changed_posts}
+    if removed_posts or set(changed_posts) - set(site['posts']):
+        site['order'] = []
+    for path in removed_posts:
+        site['posts'].pop(path, None)
+    for path in changed_posts:
+        try:
+            site['posts'][path] = builder.load_blog_post(path, keep_body=True)
+        except OSError:
+            # Deleted again before we got to it; the next scan drops it
+            site['posts'].pop(path, None)
+            site['order'] = []
+    if templates_changed:
+        reload_templates(builder)
+
+    rendered, stale = render_memory_site(builder, site, previous_posts)
+
+    with site['condition']:
+        for url, (key, content) in rendered.items():
+            body = content.encode('utf-8')
+            if url.endswith('.html'):
+                body = body.replace(b'</body>', LIVE_RELOAD_SCRIPT + b'</body>', 1)
+            site['pages'][url] = body
+            site['keys'][url] = key
+        stale &= site['pages'].keys()
+        for url in stale:
+            del site['pages'][url]
+            del site['keys'][url]
+        if rendered or stale or assets_changed:
+            site['generation'] += 1
+            site['condition'].notify_all()
+    return len(rendered)
+
+class DevRequestHandler(SimpleHTTPRequestHandler):
+    """Serves rendered pages from memory and every other file from disk"""
+
+    def __init__(self, *args, site=None, builder=None, **kwargs):
+        self.site = site
+        self.builder = builder
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == LIVE_RELOAD_PATH:
+            self.stream_reload_events()
+            return
+        if path.endswith('/'):
+            path += 'index.html'
+        if path.startswith('/blog/search/'):
+            render_memory_search_index(self.builder, self.site)
+
+        body = self.site['pages'].get(path)
+        if body is None:
+            super().do_GET()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', mimetypes.guess_type(path)[0] or 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_reload_events(self):
+        """Hold a server-sent events stream open, sending one event per rebuild"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+
+        condition = self.site['condition']
+        with condition:
+            generation = self.site['generation']
+        try:
+            while True:
+                with condition:
+                    condition.wait_for(lambda: self.site['generation'] != generation, timeout=15)
+                    changed = self.site['generation'] != generation
+                    generation = self.site['generation']
+                # Comments keep idle connections from timing out
+                self.wfile.write(b'data: reload\n\n' if changed else b': ping\n\n')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        if not self.path.startswith(LIVE_RELOAD_PATH):
+            super().log_message(format, *args)
+
+def watch_and_build(builder, args):
+    """Run a disk build, then an incremental rebuild after every change"""
+    builder.build_site(args)
+    snapshot = scan_sources(builder)
+    print(f"Watching for changes every {args.poll_interval}s (Ctrl+C to stop)...")
+    try:
+        while True:
+            time.sleep(args.poll_interval)
+            new_snapshot = scan_sources(builder)
+            if new_snapshot == snapshot:
+                continue
+            templates_changed = diff_sources(builder, snapshot, new_snapshot)[2]
+            snapshot = new_snapshot
+            if templates_changed:
+                reload_templates(builder)
+            builder.build_site(args)
+    except KeyboardInterrupt:
+        print("Stopped watching")
+
+def serve(builder, args):
+    """Render the site into memory and serve it, re-rendering on changes with --watch"""
+    builder.configure_render_cache(args.cache_dir)
+    site = create_memory_site(args.page_size)
+
+    snapshot = scan_sources(builder)
+    started = time.perf_counter()
+    posts = [path for path in snapshot if path.endswith('.md') and path.startswith(builder.POSTS_DIR)]
+    count = refresh_memory_site(builder, site, changed_posts=posts)
+    print(f"Rendered {count} pages into memory in {time.perf_counter() - started:.2f}s")
+
+    handler = partial(DevRequestHandler, site=site, builder=builder, directory=os.getcwd())
+    server = ThreadingHTTPServer(('localhost', args.port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving on http://localhost:{args.port}/blog/ (Ctrl+C to stop)")
+
+    try:
+        while True:
+            time.sleep(args.poll_interval)
+            if not args.watch:
+                continue
+            new_snapshot = scan_sources(builder)
+            if new_snapshot == snapshot:
+                continue
+            started = time.perf_counter()
+            changes = diff_sources(builder, snapshot, new_snapshot)
+            snapshot = new_snapshot
+            count = refresh_memory_site(builder, site, *changes)
+            print(f"Re-rendered {count} pages in {(time.perf_counter() - started) * 1000:.0f} ms")
+    except KeyboardInterrupt:
+        print("Stopping server")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def run(builder, args):
+    """Entry point used by build_blog.main() for --watch and --serve"""
+    if args.serve:
+        serve(builder, args)
+    else:
+        watch_and_build(builder, args)
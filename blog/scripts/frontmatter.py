@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Frontmatter parser for blog posts
+Reads the YAML block between the leading `---` lines of a post, without
+reading the rest of the file. Supports the subset of YAML posts need:
+
+- `key: value` pairs, with nested mappings by indentation
+- plain, "double-quoted" (with escapes) and 'single-quoted' strings
+- true/false, null/~ and unquoted ISO 8601 dates, which become datetimes
+- inline `[a, "b, c"]` and block `- item` lists of scalars
+- `|` and `>` block strings, and `#` comments
+
+Numbers are kept as strings, since every field the blog uses is text.
+"""
+
+import io
+import re
+from datetime import datetime
+
+FRONTMATTER_DELIMITER = '---'
+# Stop looking for the closing delimiter after this many characters
+FRONTMATTER_MAX_CHARS = 64 * 1024
+
+KEY_RE = re.compile(r'^([^\s#\'"][^:#]*?|"[^"]*"|\'[^\']*\')\s*:(?:\s+|$)(.*)$')
+DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}(?:[Tt ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?\s*(?:Z|[+-]\d{2}:?\d{2})?)?$')
+COMMENT_RE = re.compile(r'\s+#.*$')
+DOUBLE_QUOTED_RE = re.compile(r'"((?:[^"\\]|\\.)*)"')
+SINGLE_QUOTED_RE = re.compile(r"'((?:[^']|'')*)'")
+DOUBLE_QUOTED_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '0': '\0', '"': '"', '\\': '\\', '/': '/', ' ': ' '}
+
+def read_frontmatter(f, max_chars=FRONTMATTER_MAX_CHARS):
+    """Read and parse the frontmatter at the start of an open text file
+
+    Only the frontmatter lines are consumed, so the caller can go on to read
+    the body from f. Returns (metadata, header): metadata is None when the
+    file has no (terminated) frontmatter within max_chars, in which case
+    header holds the text read so far and belongs to the body.
+    """
+    header = f.readline()
+    if header.rstrip('\r\n') != FRONTMATTER_DELIMITER:
+        return None, header
+    lines = []
+    while len(header) <= max_chars:
+        line = f.readline()
+        if not line:
+            break
+        header += line
+        if line.rstrip() in (FRONTMATTER_DELIMITER, '...'):
+            return parse_frontmatter(''.join(lines)), header
+        lines.append(line)
+    return None, header
+
+def split_frontmatter(content, max_chars=FRONTMATTER_MAX_CHARS):
+    """Split a post's text into (metadata, body); metadata is None without frontmatter"""
+    f = io.StringIO(content, newline='')
+    metadata, _ = read_frontmatter(f, max_chars)
+    return (metadata, f.read()) if metadata is not None else (None, content)
+
+def parse_frontmatter(text):
+    """Parse the YAML subset of a frontmatter block into a dict
+
+    Lines that are not valid in that subset are skipped rather than failing
+    the whole post.
+    """
+    lines = [line.rstrip() for line in text.expandtabs(2).splitlines()]
+    metadata, _ = _parse_mapping(lines, 0, 0)
+    return metadata
+
+def _indent(line):
+    return len(line) - len(line.lstrip(' '))
+
+def _is_blank(line):
+    stripped = line.strip()
+    return not stripped or stripped.startswith('#')
+
+def _parse_mapping(lines, index, indent):
+    """Parse the `key: value` lines at exactly `indent`; return (dict, next index)"""
+    mapping = {}
+    while index < len(lines):
+        line = lines[index]
+        if _is_blank(line):
+            index += 1
+            continue
+        if _indent(line) < indent:
+            break
+        match = KEY_RE.match(line.strip()) if _indent(line) == indent else None
+        if not match:
+            index += 1
+            continue
+        key, value = match.group(1).strip('"\''), match.group(2).strip()
+        index += 1
+        if value[:1] in ('|', '>'):
+            mapping[key], index = _parse_block_string(lines, index, indent, value)
+            continue
+        if value and not value.startswith('#'):
+            mapping[key] = parse_value(value)
+            continue
+        # A bare key: a nested mapping or block list may follow
+        next_index = index
+        while next_index < len(lines) and _is_blank(lines[next_index]):
+            next_index += 1
+        if next_index < len(lines):
+            child = lines[next_index]
+            child_indent = _indent(child)
+            if child.strip().startswith('- ') or child.strip() == '-':
+                if child_indent >= indent:
+                    mapping[key], index = _parse_list(lines, next_index, child_indent)
+                    continue
+            elif child_indent > indent:
+                mapping[key], index = _parse_mapping(lines, next_index, child_indent)
+                continue
+        mapping[key] = None
+    return mapping, index
+
+def _parse_list(lines, index, indent):
+    """Parse the `- item` lines at `indent`; return (list, next index)"""
+    items = []
+    while index < len(lines):
+        line = lines[index]
+        if _is_blank(line):
+            index += 1
+            continue
+        stripped = line.strip()
+        if _indent(line) != indent or not (stripped.startswith('- ') or stripped == '-'):
+            break
+        items.append(parse_value(stripped[1:].strip()))
+        index += 1
+    return items, index
+
+def _parse_block_string(lines, index, indent, indicator):
+    """Parse a `|` (literal) or `>` (folded) block string; return (str, next index)"""
+    block = []
+    block_indent = None
+    while index < len(lines):
+        line = lines[index]
+        if line.strip():
+            if block_indent is None:
+                block_indent = _indent(line)
+            if _indent(line) < block_indent or block_indent <= indent:
+                break
+        block.append(line[block_indent:] if block_indent is not None else '')
+        index += 1
+    while block and not block[-1]:
+        block.pop()
+
+    if indicator.startswith('|'):
+        text = '\n'.join(block)
+    else:
+        # Folded: lines join with spaces, blank lines become line breaks
+        paragraphs = [[]]
+        for line in block:
+            if line:
+                paragraphs[-1].append(line)
+            else:
+                paragraphs.append([])
+        text = '\n'.join(' '.join(paragraph) for paragraph in paragraphs)
+    if '-' not in indicator:
+        text += '\n'
+    return text, index
+
+def _split_inline_list(text):
+    """Split the inside of `[...]` at commas that are not within quotes"""
+    items, current, quote, escaped = [], '', None, False
+    for char in text:
+        if quote:
+            current += char
+            if escaped:
+                escaped = False
+            elif char == '\\' and quote == '"':
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+            current += char
+        elif char == ',':
+            items.append(current.strip())
+            current = ''
+        else:
+            current += char
+    if current.strip():
+        items.append(current.strip())
+    return items
+
+def _unquote_double(text):
+    """Resolve the escapes of a double-quoted string's contents"""
+    result = []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == '\\' and index + 1 < len(text):
+            escape = text[index + 1]
+            if escape == 'u' and re.match(r'[0-9a-fA-F]{4}$', text[index + 2:index + 6]):
+                result.append(chr(int(text[index + 2:index + 6], 16)))
+                index += 6
+                continue
+            result.append(DOUBLE_QUOTED_ESCAPES.get(escape, '\\' + escape))
+            index += 2
+            continue
+        result.append(char)
+        index += 1
+    return ''.join(result)
+
+def parse_value(value):
+    """Convert one scalar or inline list to its Python value"""
+    value = value.strip()
+    if value.startswith('"'):
+        match = DOUBLE_QUOTED_RE.match(value)
+        return _unquote_double(match.group(1) if match else value[1:])
+    if value.startswith("'"):
+        match = SINGLE_QUOTED_RE.match(value)
+        return (match.group(1) if match else value[1:]).replace("''", "'")
+    if value.startswith('['):
+        end = value.rfind(']')
+        inner = value[1:end] if end != -1 else value[1:]
+        return [parse_value(item) for item in _split_inline_list(inner) if item]
+
+    value = COMMENT_RE.sub('', value)
+    lowered = value.lower()
+    if lowered in ('true', 'false'):
+        return lowered == 'true'
+    if lowered in ('', 'null', '~'):
+        return None
+    if DATE_RE.match(value):
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00').replace('z', '+00:00'))
+        except ValueError:
+            pass
+    return value
+
+def dump_metadata(metadata):
+    """Return metadata as JSON-safe data for a cache; load_metadata() reverses it"""
+    if isinstance(metadata, datetime):
+        return {'$datetime': metadata.isoformat()}
+    if isinstance(metadata, dict):
+        return {key: dump_metadata(value) for key, value in metadata.items()}
+    if isinstance(metadata, list):
+        return [dump_metadata(value) for value in metadata]
+    return metadata
+
+def load_metadata(data):
+    """Rebuild metadata saved with dump_metadata()"""
+    if isinstance(data, dict):
+        if len(data) == 1 and '$datetime' in data:
+            return datetime.fromisoformat(data['$datetime'])
+        return {key: load_metadata(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [load_metadata(value) for value in data]
+    return data
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Responsive images for the blog
+Resizes and re-encodes the local images that posts use into a few widths
+and formats, named after the source's content hash, and rewrites <img>
+tags into <picture> elements that let the browser pick the smallest file
+that fits. Needs Pillow; without it images are left as they are.
+"""
+
+import hashlib
+import html
+import os
+import posixpath
+import re
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    # Optional: without it no derivatives are generated
+    Image = ImageOps = None
+
+# Widths derivatives are generated at; images are never scaled up, so a
+# narrower source gets the widths below its own plus its own width
+IMAGE_WIDTHS = (480, 960, 1440)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.avif')
+# Output formats, best compression first, with their encoder options.
+# JPEG comes last and is what <img> itself falls back to.
+IMAGE_FORMATS = {
+    'AVIF': {'quality': 55, 'speed': 6},
+    'WEBP': {'quality': 80, 'method': 6},
+    'JPEG': {'quality': 82, 'optimize': True, 'progressive': True}
+}
+IMAGE_FORMAT_EXTENSIONS = {'AVIF': '.avif', 'WEBP': '.webp', 'JPEG': '.jpg'}
+IMAGE_MIME_TYPES = {'AVIF': 'image/avif', 'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+
+# Image references in Markdown: ![alt](src), [ref]: src definitions and raw <img> tags
+MARKDOWN_IMAGE_RE = re.compile(r'!\[[^\]]*\]\(\s*<?([^)\s>]+)'
+                               r'|^\s{0,3}\[[^\]]+\]:\s*<?(\S+?)>?(?:\s|$)'
+                               r'|<img\b[^>]*?\ssrc\s*=\s*["\']?([^"\'\s>]+)', re.MULTILINE | re.IGNORECASE)
+IMG_TAG_RE = re.compile(r'<img\b([^>]*?)\s*/?>', re.IGNORECASE)
+ATTR_RE = re.compile(r'([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+
+def image_formats():
+    """Return the output formats this Pillow build can encode, or [] without Pillow"""
+    if Image is None:
+        return []
+    Image.init()
+    return [name for name in IMAGE_FORMATS if name in Image.SAVE]
+
+def find_image_references(md_content):
+    """Return the image URLs a post's Markdown refers to, in order, without duplicates"""
+    references = []
+    for match in MARKDOWN_IMAGE_RE.finditer(md_content):
+        url = next(group for group in match.groups() if group is not None)
+        if url.lower().endswith(IMAGE_EXTENSIONS) and url not in references:
+            references.append(url)
+    return references
+
+def resolve_image_source(url, page_dir, base_url):
+    """Return the local file an image URL on a page in page_dir points to, or None"""
+    if url == base_url or url.startswith(base_url + '/'):
+        url = url[len(base_url):]
+    if re.match(r'^[a-zA-Z][\w+.-]*:|^//', url):
+        return None
+    path = url.split('#', 1)[0].split('?', 1)[0]
+    if not path.lower().endswith(IMAGE_EXTENSIONS):
+        return None
+    if path.startswith('/'):
+        path = path.lstrip('/')
+    else:
+        path = posixpath.join(page_dir, path)
+    path = posixpath.normpath(path)
+    if path.startswith('../') or not os.path.isfile(path):
+        return None
+    return path
+
+def file_digest(path):
+    """Return the sha256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def derivative_widths(width):
+    """Return the widths to generate for a source image `width` pixels wide"""
+    widths = [candidate for candidate in IMAGE_WIDTHS if candidate < width]
+    if width <= IMAGE_WIDTHS[-1]:
+        widths.append(width)
+    return widths
+
+def derivative_path(output_dir, source, digest, width, image_format):
+    """Return where one derivative of source is written"""
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return posixpath.join(output_dir, f'{stem}-{digest[:10]}-{width}w{IMAGE_FORMAT_EXTENSIONS[image_format]}')
+
+def _encodable(image, image_format):
+    """Return image in a mode the format can encode, flattening transparency for JPEG"""
+    if image_format == 'JPEG':
+        if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            return background
+        return image.convert('RGB') if image.mode != 'RGB' else image
+    if image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    return image
+
+def generate_derivatives(source, digest, output_dir, formats):
+    """Write the resized derivatives of one source image
+
+    Derivatives are named after the source's digest, so files that already
+    exist are current and are not encoded again. Returns the image's record:
+    its display size and {format: [[width, path], ...]}.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with Image.open(source) as original:
+        # Apply the camera's orientation, since derivatives drop the EXIF data
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    width, height = image.size
+    variants = {}
+    for target_width in derivative_widths(width):
+        resized = None
+        for image_format in formats:
+            path = derivative_path(output_dir, source, digest, target_width, image_format)
+            variants.setdefault(image_format, []).append([target_width, path])
+            if os.path.exists(path):
+                continue
+            if resized is None:
+                target_height = max(1, round(height * target_width / width))
+                resized = image if target_width == width else image.resize((target_width, target_height),
+                                                                           Image.LANCZOS)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            try:
+                _encodable(resized, image_format).save(tmp_path, image_format, **IMAGE_FORMATS[image_format])
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+    return {'width': width, 'height': height, 'variants': variants}
+
+def _attributes(attrs):
+    """Parse a tag's attributes into an ordered {name: value} dict"""
+    values = {}
+    for name, double, single, bare in ATTR_RE.findall(attrs):
+        values.setdefault(name.lower(), html.unescape(double or single or bare))
+    return values
+
+def _srcset(variants, page_dir):
+    return ', '.join(f'{posixpath.relpath(path, page_dir)} {width}w' for width, path in variants)
+
+def render_picture(attributes, record, page_dir):
+    """Return a <picture> offering an image's derivatives, keeping the <img> attributes"""
+    largest = record['variants']['JPEG'][-1][0]
+    height = round(record['height'] * largest / record['width'])
+    sizes = f'(max-width: {largest}px) 100vw, {largest}px'
+    parts = ['<picture>']
+    for image_format, variants in record['variants'].items():
+        if image_format != 'JPEG':
+            parts.append(f'<source type="{IMAGE_MIME_TYPES[image_format]}" '
+                         f'srcset="{html.escape(_srcset(variants, page_dir))}" sizes="{sizes}">')
+    img = {name: value for name, value in attributes.items()
+           if name not in ('src', 'srcset', 'sizes', 'width', 'height', 'loading', 'decoding')}
+    img['src'] = posixpath.relpath(record['variants']['JPEG'][-1][1], page_dir)
+    img['srcset'] = _srcset(record['variants']['JPEG'], page_dir)
+    img['sizes'] = sizes
+    img['width'] = str(largest)
+    img['height'] = str(height)
+    img['loading'] = attributes.get('loading', 'lazy')
+    img['decoding'] = 'async'
+    parts.append('<img ' + ' '.join(f'{name}="{html.escape(value)}"' for name, value in img.items()) + '>')
+    parts.append('</picture>')
+    return ''.join(parts)
+
+def rewrite_images(page_html, records, page_dir, base_url):
+    """Replace the <img> tags of local images that have derivatives with <picture> elements
+
+    records maps source paths, as returned by resolve_image_source(), to the
+    records of generate_derivatives(). Images that already have a srcset or
+    sit in a <picture> are left alone.
+    """
+    if not records or '<img' not in page_html:
+        return page_html
+
+    def replace(match):
+        attributes = _attributes(match.group(1))
+        if 'srcset' in attributes or page_html.rfind('<picture', 0, match.start()) > \
+                page_html.rfind('</picture>', 0, match.start()):
+            return match.group(0)
+        source = resolve_image_source(attributes.get('src', ''), page_dir, base_url)
+        record = records.get(source)
+        if record is None or 'JPEG' not in record['variants']:
+            return match.group(0)
+        return render_picture(attributes, record, page_dir)
+
+    return IMG_TAG_RE.sub(replace, page_html)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Minifiers for the blog's generated pages and stylesheets
+Conservative by design: they drop comments and layout whitespace but never
+change what a browser renders, so <pre> blocks, strings and anything they
+cannot safely parse are left as they are.
+"""
+
+import re
+
+# Parts of a page whose whitespace matters or that need their own minifier
+HTML_RAW_RE = re.compile(
+    r'(<pre\b.*?</pre>|<textarea\b.*?</textarea>|<!--.*?-->)'
+    r'|(<script\b([^>]*)>)(.*?)(</script>)'
+    r'|(<style\b[^>]*>)(.*?)(</style>)',
+    re.DOTALL | re.IGNORECASE
+)
+# A type attribute that makes a <script> something other than JavaScript
+NON_JS_TYPE_RE = re.compile(r'\btype\s*=\s*(?!["\']?(?:text/javascript|module|application/javascript)\b)',
+                            re.IGNORECASE)
+
+CSS_TOKEN_RE = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.DOTALL)
+CSS_PLACEHOLDER_RE = re.compile('\0(\\d+)\0')
+
+def collapse_whitespace(text):
+    """Shrink each run of whitespace to one newline or space"""
+    return re.sub(r'\s+', lambda match: '\n' if '\n' in match.group() else ' ', text)
+
+def minify_css(source):
+    """Strip comments and whitespace from a stylesheet"""
+    strings = []
+
+    def protect(match):
+        if match.group(1) is None:
+            return ' '
+        strings.append(match.group(1))
+        return f'\0{len(strings) - 1}\0'
+
+    css = CSS_TOKEN_RE.sub(protect, source)
+    css = re.sub(r'\s+', ' ', css)
+    # No spaces are needed around these; '+' and '-' are left alone for calc()
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    css = css.replace(';}', '}')
+    return CSS_PLACEHOLDER_RE.sub(lambda match: strings[int(match.group(1))], css.strip())
+
+def minify_js(source):
+    """Drop indentation, blank lines and whole-line comments from a script
+
+    Scripts with template literals or line continuations are only trimmed,
+    since their indentation can be part of a string.
+    """
+    if '`' in source or re.search(r'\\\r?\n', source):
+        return source.strip()
+
+    lines = []
+    in_comment = False
+    for line in source.splitlines():
+        line = line.strip()
+        if in_comment:
+            if '*/' not in line:
+                continue
+            in_comment = False
+            line = line[line.index('*/') + 2:].strip()
+        elif line.startswith('/*'):
+            if '*/' not in line[2:]:
+                in_comment = True
+                continue
+            line = line[line.index('*/', 2) + 2:].strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines)
+
+def minify_html(source):
+    """Collapse layout whitespace and drop comments from an HTML page
+
+    Inline scripts and styles go through minify_js() and minify_css();
+    <pre> and <textarea> contents and conditional comments are kept as-is.
+    """
+    parts = []
+    position = 0
+    for match in HTML_RAW_RE.finditer(source):
+        parts.append(collapse_whitespace(source[position:match.start()]))
+        position = match.end()
+        raw, script_open, script_attrs, script, script_close, style_open, style, style_close = match.groups()
+        if raw is not None:
+            if not raw.startswith('<!--') or raw.startswith('<!--[if'):
+                parts.append(raw)
+            else:
+                # Drop the comment along with the line it leaves empty
+                parts[-1] = parts[-1].rstrip(' ')
+                if parts[-1].endswith('\n'):
+                    position += len(source[position:]) - len(source[position:].lstrip(' \t\r\n'))
+        elif script_open is not None:
+            if not NON_JS_TYPE_RE.search(script_attrs):
+                script = minify_js(script)
+            parts.append(collapse_whitespace(script_open) + script + script_close)
+        else:
+            parts.append(collapse_whitespace(style_open) + minify_css(style) + style_close)
+    parts.append(collapse_whitespace(source[position:]))
+    return ''.join(parts).strip() + '\n'
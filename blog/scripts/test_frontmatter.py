@@ -0,0 +1,16 @@
+"""Tests for the frontmatter parser's inline lists"""
+
+from frontmatter import parse_frontmatter, parse_value
+
+def test_inline_list_escaped_double_quote():
+    assert parse_value(r'["a\"b", c]') == ['a"b', 'c']
+
+def test_inline_list_escaped_backslash_before_quote():
+    assert parse_value(r'["a\\", b]') == ['a\\', 'b']
+
+def test_inline_list_doubled_single_quote():
+    assert parse_value("['it''s, fine', b]") == ["it's, fine", 'b']
+
+def test_tags_keep_items_after_escaped_quote():
+    metadata = parse_frontmatter('tags: ["q\\"x", b, c]\n')
+    assert metadata['tags'] == ['q"x', 'b', 'c']
@@ -0,0 +1,129 @@
+// Blog search: queries the sharded index that build_blog.py writes to
+// blog/search/, fetching only the term and document shards a query needs.
+const BlogSearch = (() => {
+    const shardCache = new Map();
+    let indexInfo = null;
+
+    function fetchJSON(url) {
+        if (!shardCache.has(url)) {
+            shardCache.set(url, fetch(url).then(response => {
+                if (!response.ok) {
+                    throw new Error(`Failed to load ${url}`);
+                }
+                return response.json();
+            }));
+        }
+        return shardCache.get(url);
+    }
+
+    // Same 32-bit FNV-1a over code points as search_term_shard()
+    function termShard(term, shardCount) {
+        let hash = 0x811c9dc5;
+        for (const char of term) {
+            hash = Math.imul(hash ^ char.codePointAt(0), 0x01000193) >>> 0;
+        }
+        return hash % shardCount;
+    }
+
+    // Same rules as search_tokens()
+    function tokenize(text, stopwords) {
+        const tokens = text.toLowerCase().match(/[\p{L}\p{N}]+/gu) || [];
+        return [...new Set(tokens.filter(token =>
+            token.length >= 2 && token.length <= 32 && !stopwords.has(token)))];
+    }
+
+    async function search(indexRoot, query, limit = 10) {
+        if (!indexInfo) {
+            indexInfo = await fetchJSON(`${indexRoot}index.json`);
+            indexInfo.stopwordSet = new Set(indexInfo.stopwords);
+        }
+        const terms = tokenize(query, indexInfo.stopwordSet);
+        if (terms.length === 0) {
+            return [];
+        }
+
+        // Score documents by tf-idf, ranking those that match more terms first
+        const scores = new Map();
+        await Promise.all(terms.map(async term => {
+            const shard = await fetchJSON(`${indexRoot}terms/${termShard(term, indexInfo.term_shards)}.json`);
+            const postings = shard[term];
+            if (!postings) {
+                return;
+            }
+            const idf = Math.log(1 + indexInfo.documents / (postings.length / 2));
+            let id = 0;
+            for (let i = 0; i < postings.length; i += 2) {
+                id += postings[i];
+                const entry = scores.get(id) || { matches: 0, score: 0 };
+                entry.matches += 1;
+                entry.score += postings[i + 1] * idf;
+                scores.set(id, entry);
+            }
+        }));
+
+        const ranked = [...scores.entries()]
+            .sort((a, b) => b[1].matches - a[1].matches || b[1].score - a[1].score)
+            .slice(0, limit);
+        return Promise.all(ranked.map(async ([id]) => {
+            const docs = await fetchJSON(`${indexRoot}docs/${Math.floor(id / indexInfo.docs_per_shard)}.json`);
+            const [slug, title, date, description] = docs[id % indexInfo.docs_per_shard];
+            return { slug, title, date, description };
+        }));
+    }
+
+    return { search, tokenize, termShard };
+})();
+
+// Wire up the search box on blog listing pages
+document.addEventListener('DOMContentLoaded', () => {
+    const input = document.getElementById('blogSearchInput');
+    const results = document.getElementById('blogSearchResults');
+    if (!input || !results) {
+        return;
+    }
+    const blogRoot = input.dataset.blogRoot || '';
+    let latestQuery = '';
+    let timer = null;
+
+    function renderResults(posts) {
+        results.innerHTML = '';
+        if (posts.length === 0) {
+            results.innerHTML = '<li class="recent-post-item sidebar-text">No posts found</li>';
+            return;
+        }
+        posts.forEach(post => {
+            const item = document.createElement('li');
+            item.className = 'recent-post-item';
+            const link = document.createElement('a');
+            link.className = 'recent-post-link';
+            link.href = `${blogRoot}${post.slug}.html`;
+            link.textContent = post.title;
+            const date = document.createElement('span');
+            date.className = 'recent-post-date';
+            date.textContent = post.date;
+            item.append(link, date);
+            results.appendChild(item);
+        });
+    }
+
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(async () => {
+            const query = input.value.trim();
+            latestQuery = query;
+            if (!query) {
+                results.innerHTML = '';
+                return;
+            }
+            try {
+                const posts = await BlogSearch.search(`${blogRoot}search/`, query);
+                // Drop answers to queries the reader has already typed past
+                if (query === latestQuery) {
+                    renderResults(posts);
+                }
+            } catch (error) {
+                console.error('Error searching posts:', error);
+            }
+        }, 150);
+    });
+});
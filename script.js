@@ -10,11 +10,20 @@ function toggleWA() {
     popup.style.display = popup.style.display === "block" ? "none" : "block";
 }
 
-// Load projects from external JSON
+// Read data the blog builder embedded in the page, if any
+function readEmbeddedData(id) {
+    const element = document.getElementById(id);
+    return element ? JSON.parse(element.textContent) : null;
+}
+
+// Load projects, from the embedded copy or the external JSON
 async function loadProjects() {
     try {
-        const response = await fetch('projects.json');
-        allProjects = await response.json();
+        allProjects = readEmbeddedData('projectsData');
+        if (!allProjects) {
+            const response = await fetch('projects.json');
+            allProjects = await response.json();
+        }
 
         // Generate dynamic filters from unique categories
         generateProjectFilters(allProjects);
@@ -50,11 +59,14 @@ function generateProjectFilters(projects) {
     });
 }
 
-// Load reviews from external JSON
+// Load reviews, from the embedded copy or the external JSON
 async function loadReviews() {
     try {
-        const response = await fetch('reviews.json');
-        allReviews = await response.json();
+        allReviews = readEmbeddedData('reviewsData');
+        if (!allReviews) {
+            const response = await fetch('reviews.json');
+            allReviews = await response.json();
+        }
         renderTestimonials(allReviews);
     } catch (error) {
         console.error('Error loading reviews:', error);